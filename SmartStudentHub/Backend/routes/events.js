@@ -18,6 +18,14 @@ const triggerModelRetrain = async () => {
     console.error('Error triggering model retraining:', error.message);
   }
 };
+const notifyInteraction = async (interaction) => {
+  try {
+    const interactionsUrl = process.env.ML_INTERACTIONS_URL || 'http://localhost:5003/interactions';
+    await axios.post(interactionsUrl, interaction);
+  } catch (error) {
+    console.error('Error sending interaction to ML service:', error.message);
+  }
+};
 router.get('/', async (req, res) => {
   try {
     const events = await Event.find()
@@ -238,7 +246,11 @@ router.post('/', authMiddleware, async (req, res) => {
     });
     await event.save();
     await event.populate('organization', 'name image');
-    await triggerModelRetrain();
+    await notifyInteraction({
+      type: 'new_event',
+      event_ref: event._id.toString(),
+      event_id: event.eventId,
+    });
     res.status(201).json(event);
   } catch (error) {
     console.error('Error creating event:', error.message);
@@ -323,7 +335,12 @@ router.post('/:id/register', authMiddleware, async (req, res) => {
     const user = await User.findById(req.user.id);
     user.registeredEvents.push(event._id);
     await user.save();
-    await triggerModelRetrain();
+    await notifyInteraction({
+      type: 'register',
+      user_id: user._id.toString(),
+      event_ref: event._id.toString(),
+      event_id: event.eventId,
+    });
     res.json({ message: 'Registered for the event successfully.' });
   } catch (error) {
     console.error('Error registering for event:', error.message);
@@ -369,7 +386,12 @@ router.post('/:id/withdraw', authMiddleware, async (req, res) => {
       (eventId) => eventId.toString() !== event._id.toString()
     );
     await user.save();
-    await triggerModelRetrain();
+    await notifyInteraction({
+      type: 'unregister',
+      user_id: user._id.toString(),
+      event_ref: event._id.toString(),
+      event_id: event.eventId,
+    });
     res.json({ message: 'Withdrawn from the event successfully.' });
   } catch (error) {
     console.error('Error withdrawing from event:', error.message);
@@ -0,0 +1,89 @@
+import argparse
+import glob
+import os
+import time
+
+from bench_scrape_hku_events import CATEGORIES, event_page
+from hku_event_parser import parse_event_page, parse_event_pages
+
+# Real detail pages carry a lot of layout around the few regions the parser reads.
+BOILERPLATE = (
+    '<head><title>HKU Events</title><link rel="stylesheet" href="/style.css">'
+    + "<script>var menu = {items: [1, 2, 3]};</script>" * 20 + "</head>"
+    + '<div class="nav"><ul>' + "".join(f'<li><a href="/page{i}.html">Link {i}</a></li>' for i in range(150))
+    + "</ul></div>"
+)
+
+
+def synthetic_pages(count):
+    pages = []
+    for i in range(count):
+        page = event_page(i).replace("<html><body>", "<html>" + BOILERPLATE + "<body>", 1)
+        if i % 4 == 0:
+            page = page.replace("<p>", "<p><b>Highlights:</b> &amp; more<br>", 1)
+        pages.append(page)
+    return pages
+
+
+def fixture_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def jobs_for(pages, fast=True):
+    return [
+        (page, CATEGORIES[i % len(CATEGORIES)], "01 Apr 2025 10:00-12:00", "Room 1", f"Event {i}", str(i), fast)
+        for i, page in enumerate(pages)
+    ]
+
+
+def time_per_page(jobs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for job in jobs:
+            parse_event_page(*job)
+        best = min(best, time.perf_counter() - started)
+    return best / len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time event page parsing, reference vs fast, on saved HTML.")
+    parser.add_argument("--fixtures", help="Directory of saved detail pages, e.g. .scrape_cache/pages.")
+    parser.add_argument("--pages", type=int, default=500, help="Synthetic pages when no fixtures are given.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    pages = fixture_pages(args.fixtures) if args.fixtures else synthetic_pages(args.pages)
+    if not pages:
+        raise SystemExit(f"No .html files in {args.fixtures}")
+    reference_jobs = jobs_for(pages, fast=False)
+    fast_jobs = jobs_for(pages)
+
+    mismatches = [
+        i for i, (reference, fast) in enumerate(zip(parse_event_pages(reference_jobs), parse_event_pages(fast_jobs)))
+        if reference != fast
+    ]
+
+    reference = time_per_page(reference_jobs, args.repeat)
+    fast = time_per_page(fast_jobs, args.repeat)
+    throughput = []
+    for workers in args.workers:
+        started = time.perf_counter()
+        parse_event_pages(fast_jobs, workers=workers)
+        throughput.append((workers, len(pages) / (time.perf_counter() - started)))
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.1f} KiB on average")
+    print(f"  reference (BeautifulSoup): {reference * 1e6:8.0f}us/page")
+    print(f"  fast (restricted regions): {fast * 1e6:8.0f}us/page  {reference / fast:.1f}x")
+    for workers, pages_per_second in throughput:
+        print(f"  parse_event_pages workers={workers:<3} {pages_per_second:8.0f} pages/s")
+    print(f"  mismatches vs reference:   {len(mismatches)}" + (f" (pages {mismatches[:10]})" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scrape_hku_events import Fetcher, PageCache, scrape_hku_events
+
+CATEGORIES = ["category_A", "category_B", "category_C", "category_E", "category_L",
+              "category_M", "category_SC", "category_SO", "category_SR", "category_O"]
+
+
+def category_page(events):
+    """A category.html look-alike with `events` rows spread over the categories."""
+    html = ["<html><body>"]
+    for c, category in enumerate(CATEGORIES):
+        html.append(f'<a name="{category}"></a><table><tr><th>Date</th><th>Venue</th><th></th><th>Event</th></tr>')
+        for i in range(c, events, len(CATEGORIES)):
+            html.append(
+                f"<tr><td>{1 + i % 28:02d} Apr 2025 10:00-12:00</td><td>Room {i}</td><td></td>"
+                f'<td><a href="event.aspx?id={i}">Fixture event {i}</a></td></tr>'
+            )
+        html.append("</table>")
+    html.append("</body></html>")
+    return "".join(html)
+
+
+def event_page(i):
+    return (
+        "<html><body>"
+        '<span class="UEViewHeader">Event Details</span>'
+        f"<p>Description of fixture event {i}, long enough to need a summary. " + "Lorem ipsum. " * 10 + "</p>"
+        '<span class="UEViewHeader">Other</span>'
+        f"<table><tr><td>Date/Time</td><td>{1 + i % 28:02d}/04/2025 10:00-12:00</td></tr>"
+        f"<tr><td>Venue</td><td>Room {i}, Main Building</td></tr></table>"
+        '<span class="UEViewOrganizer">organized by Fixture Society</span>'
+        "</body></html>"
+    )
+
+
+def serve_fixtures(events, latency, flaky_every=0, retry_after="0"):
+    """
+    Starts a threaded HTTP server for the fixture pages in the background.
+    Every response is delayed by `latency` seconds; with flaky_every, every
+    flaky_every-th event page fails with a 503 the first time it is asked for,
+    sending retry_after as its Retry-After header.
+    Event pages carry an ETag and answer a matching If-None-Match with a 304.
+    server.revision changes the content of every revision_every-th page.
+    """
+    failed = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path.startswith("/category.html"):
+                body = category_page(events)
+            elif self.path.startswith("/event.aspx?id="):
+                i = int(self.path.rsplit("=", 1)[1])
+                with lock:
+                    fail = flaky_every and i % flaky_every == 0 and i not in failed
+                    failed.add(i)
+                if fail:
+                    self.send_response(503)
+                    self.send_header("Retry-After", retry_after)
+                    self.end_headers()
+                    return
+                body = event_page(i)
+                if server.revision and i % server.revision_every == 0:
+                    body = body.replace("Lorem ipsum.", f"Revision {server.revision}.", 1)
+                etag = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            if self.path.startswith("/event.aspx"):
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.revision = 0
+    server.revision_every = 10
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def crawl(port, workers, rate, retries, output, cache=None):
+    # The listing and the detail pages go through different host names, so
+    # each gets its own bucket, as www.hku.hk and hkuems1.hku.hk do.
+    fetcher = Fetcher({"127.0.0.1": rate, "localhost": rate}, workers=workers, retries=retries, backoff=0.05)
+    started = time.monotonic()
+    try:
+        scraped = scrape_hku_events(
+            fetcher,
+            base_url=f"http://127.0.0.1:{port}/category.html",
+            detail_base_url=f"http://localhost:{port}/",
+            output=output,
+            cache=cache,
+            changes_output=f"{output}.changed.json"
+        )
+    finally:
+        fetcher.close()
+    return time.monotonic() - started, scraped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the scraper's fetch stage against local fixture pages.")
+    parser.add_argument("--events", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.25, help="Seconds the server waits before answering.")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests per second allowed per host.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--flaky-every", type=int, default=0, help="Make every n-th event page fail once.")
+    parser.add_argument("--revise-every", type=int, default=10,
+                        help="Share of pages changed between the two incremental runs: every n-th one.")
+    args = parser.parse_args()
+
+    server = serve_fixtures(args.events, args.latency, args.flaky_every)
+    port = server.server_address[1]
+    workdir = tempfile.mkdtemp(prefix="scrape-bench-")
+    results = []
+    incremental = []
+    try:
+        for workers in args.workers:
+            seconds, scraped = crawl(port, workers, args.rate, 3, os.path.join(workdir, f"events-{workers}.ndjson"))
+            results.append((workers, seconds, scraped))
+
+        # A first run fills the page cache; the second sees a few revised pages.
+        workers = max(args.workers)
+        cache_dir = os.path.join(workdir, "cache")
+        server.revision_every = args.revise_every
+        for revision in range(2):
+            server.revision = revision
+            output = os.path.join(workdir, f"incremental-{revision}.ndjson")
+            seconds, scraped = crawl(port, workers, args.rate, 3, output, PageCache(cache_dir))
+            with open(f"{output}.changed.json", encoding="utf-8") as f:
+                changed = len(json.load(f)["events"])
+            incremental.append((revision, seconds, scraped, changed))
+    finally:
+        server.shutdown()
+
+    pages = args.events + 1
+    print()
+    print(f"{pages} pages, {args.latency * 1000:.0f}ms latency, {args.rate:g} requests/s per host")
+    print(f"  sum of latencies:   {pages * args.latency:.2f}s")
+    print(f"  politeness bound:   {args.events / args.rate:.2f}s")
+    for workers, seconds, scraped in results:
+        print(f"  workers={workers:<3} crawl={seconds:.2f}s events={scraped}")
+    for revision, seconds, scraped, changed in incremental:
+        label = "incremental, cold cache" if revision == 0 else "incremental, warm cache"
+        print(f"  {label:<24} crawl={seconds:.2f}s events={scraped} parsed={changed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Writes scraped events straight into the events collection that the backend
+and ml_service/ml_recommender.py read, replacing the hkuEvents.js → Node
+seeder round trip.
+
+Every event document carries a contentHash of its scraped fields. A sync
+reads the stored hashes of a batch in one query and sends unordered bulk
+upserts for only the new and changed events, so rerunning it over an
+unchanged scrape writes nothing. Updates $set the scraped fields and
+updatedAt, which is what EventCatalog.refresh() polls for, and leave
+registeredUsers, capacity and price alone.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from scrape_hku_events import EVENTS_OUTPUT, batched, iter_events
+
+# The scraped fields stored on an event; organization is stored as the
+# ObjectId of the organization with that name, as the Node seeder did.
+EVENT_FIELDS = ["title", "image", "summary", "description", "date", "time", "organization", "type", "subtype",
+                "location"]
+CHANGES_OUTPUT = "events_sink.changed.json"
+
+
+def event_hash(event):
+    """Hash of the scraped fields of an event, independent of key order."""
+    content = json.dumps({field: event.get(field) for field in EVENT_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MongoEventSink:
+    """
+    Upserts scraped events into events_collection, resolving organization
+    names through organizations_collection. Takes collections rather than a
+    client, so a stand-in such as the fake in tests/test_events_sink.py
+    works; it needs find with $in and projections, and bulk_write.
+    """
+
+    def __init__(self, events_collection, organizations_collection, batch_size=500):
+        self.events_collection = events_collection
+        self.organizations_collection = organizations_collection
+        self.batch_size = batch_size
+        self.organization_ids = {
+            organization["name"]: organization["_id"]
+            for organization in organizations_collection.find({}, {"_id": 1, "name": 1})
+            if organization.get("name")
+        }
+
+    def sync(self, events):
+        """
+        Upserts the new and changed events. Returns a summary with the eventIds
+        that were inserted and updated, the number left unchanged and the
+        eventIds skipped because their organization is unknown or their write failed.
+        """
+        summary = {"inserted": [], "updated": [], "unchanged": 0, "skipped": []}
+        unknown_organizations = set()
+        # A page listed under two categories yields the same eventId twice;
+        # the first copy wins, so reruns do not flip between the two.
+        seen = set()
+        for batch in batched(events, self.batch_size):
+            unique = {}
+            for event in batch:
+                if event["eventId"] not in seen:
+                    unique.setdefault(event["eventId"], event)
+            seen.update(unique)
+            batch = unique
+            stored = {
+                document["eventId"]: document.get("contentHash")
+                for document in self.events_collection.find(
+                    {"eventId": {"$in": list(batch)}}, {"_id": 0, "eventId": 1, "contentHash": 1}
+                )
+            }
+
+            now = datetime.now(timezone.utc)
+            operations = []
+            event_ids = []
+            for event_id, event in batch.items():
+                organization_id = self.organization_ids.get(event.get("organization"))
+                if organization_id is None:
+                    unknown_organizations.add(event.get("organization"))
+                    summary["skipped"].append(event_id)
+                    continue
+                digest = event_hash(event)
+                if stored.get(event_id) == digest:
+                    summary["unchanged"] += 1
+                    continue
+
+                fields = {field: event.get(field) for field in EVENT_FIELDS}
+                fields.update(organization=organization_id, contentHash=digest, updatedAt=now)
+                operations.append(UpdateOne(
+                    {"eventId": event_id},
+                    {
+                        "$set": fields,
+                        "$setOnInsert": {"registeredUsers": [], "capacity": 0, "price": 0, "createdAt": now}
+                    },
+                    upsert=True
+                ))
+                event_ids.append(event_id)
+
+            if not operations:
+                continue
+            failed = set()
+            try:
+                self.events_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed.add(event_ids[error["index"]])
+                    print(f"  Error writing event ID {event_ids[error['index']]}: {error.get('errmsg')}")
+            for event_id in event_ids:
+                if event_id in failed:
+                    summary["skipped"].append(event_id)
+                elif event_id in stored:
+                    summary["updated"].append(event_id)
+                else:
+                    summary["inserted"].append(event_id)
+
+        if unknown_organizations:
+            print(f"Warning: Skipped events of unknown organizations: {sorted(map(str, unknown_organizations))}")
+        return summary
+
+
+def write_changes(summary, path=CHANGES_OUTPUT):
+    """Writes the changed eventIds for downstream consumers such as the vector store and the recommender."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "changed": summary["inserted"] + summary["updated"],
+            "inserted": summary["inserted"],
+            "updated": summary["updated"]
+        }, f, indent=2)
+
+
+def sync_events(events, mongo_uri=None, database_name=None, batch_size=500, changes_output=CHANGES_OUTPUT):
+    """Syncs events into the configured database and writes the changed eventIds to changes_output."""
+    client = MongoClient(mongo_uri or os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    try:
+        db = client[database_name or os.getenv("DATABASE_NAME", "test")]
+        summary = MongoEventSink(db["events"], db["organizations"], batch_size).sync(events)
+    finally:
+        client.close()
+
+    write_changes(summary, changes_output)
+    print(f"Events: {len(summary['inserted'])} inserted, {len(summary['updated'])} updated, "
+          f"{summary['unchanged']} unchanged, {len(summary['skipped'])} skipped; "
+          f"changed eventIds saved to {changes_output}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert scraped events into the events collection.")
+    parser.add_argument("input", nargs="?", default=EVENTS_OUTPUT, help="NDJSON file written by scrape_hku_events.py.")
+    parser.add_argument("--mongo-uri", help="Defaults to $MONGO_URI.")
+    parser.add_argument("--database", help="Defaults to $DATABASE_NAME.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--changes-output", default=CHANGES_OUTPUT)
+    args = parser.parse_args()
+
+    sync_events(iter_events(args.input), args.mongo_uri, args.database, args.batch_size, args.changes_output)
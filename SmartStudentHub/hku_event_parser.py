@@ -0,0 +1,264 @@
+"""
+Turns an HKU event detail page into an event record.
+
+parse_event_page() is pure: it only looks at its arguments, so pages can be
+parsed in any order and in a process pool. It first tries a restricted parse
+that only tokenizes the three regions it needs (the "Event Details" section,
+the Date/Time and Venue table rows and the organizer line) and falls back to
+a full BeautifulSoup parse, the reference behaviour, whenever the markup in
+those regions is not simple enough to slice safely.
+"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+CATEGORY_NAMES = {
+    "category_A": "Architecture & Engineering",
+    "category_B": "Business & Economics",
+    "category_C": "Culture and Arts",
+    "category_E": "Education",
+    "category_L": "Law and Politics",
+    "category_M": "Medical & Health Care",
+    "category_SC": "Science & Technology",
+    "category_SO": "Social Development & Welfare",
+    "category_SR": "Sports and Recreation",
+    "category_O": "Others"
+}
+REQUIRED_FIELDS = ["title", "summary", "description", "date", "time", "organization", "type"]
+IMAGE_URL = "https://example.com/event5.jpg"
+
+NON_ASCII = re.compile(r"[^\x00-\x7F]+")
+TRAILING_DOTS = re.compile(r"\.+$")
+NUMERIC_DATE = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+TIME_RANGE = re.compile(r"(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})")
+LISTING_DATE_RANGE = re.compile(r"(\d{1,2}\s+[A-Za-z]{3}\s+-\s+\d{1,2}\s+[A-Za-z]{3}\s+\d{4})")
+LISTING_DATE = re.compile(r"(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})")
+ORGANIZED_BY = re.compile(r"organized by\s+(.+)")
+
+# Tag and attribute names are case-insensitive in HTML; class values and text are not.
+_CLASS = r"""\b(?i:class)\s*=\s*["']?[^"'>]*\b%s\b"""
+DETAILS_HEADER = re.compile(r"<(?i:span)\b[^>]*" + _CLASS % "UEViewHeader" + r"[^>]*>Event Details</(?i:span)\s*>")
+# The reference walk stops at the first span, or the next header, after "Event Details".
+DETAILS_END = re.compile(r"<(?i:span)\b|<[A-Za-z][^>]*" + _CLASS % "UEViewHeader")
+P_START = re.compile(r"<p\b", re.I)
+P_END = re.compile(r"</p\s*>", re.I)
+TR = re.compile(r"<tr\b[^>]*>(.*?)</tr\s*>", re.I | re.S)
+TR_TAG = re.compile(r"<tr\b", re.I)
+TD = re.compile(r"<td\b[^>]*>(.*?)</td\s*>", re.I | re.S)
+TD_TAG = re.compile(r"<td\b", re.I)
+NESTED_TABLE = re.compile(r"<table\b", re.I)
+ORGANIZER = re.compile(r"<(?i:span)\b[^>]*" + _CLASS % "UEViewOrganizer" + r"[^>]*>(.*?)</(?i:span)\s*>", re.S)
+SPAN_TAG = re.compile(r"<span\b", re.I)
+# Markup the reference parse never looks into: comments, and the raw text of <script> and <style>.
+OPAQUE = re.compile(r"<!--.*?(?:-->|\Z)|<(script|style)\b.*?(?:</\1\s*>|\Z)", re.I | re.S)
+
+
+class UnsupportedMarkup(Exception):
+    """The restricted parse cannot reproduce the reference result for this page."""
+
+
+class _TextExtractor(HTMLParser):
+    """Concatenates the text of a fragment the way BeautifulSoup's html.parser .text does."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def fragment_text(fragment):
+    extractor = _TextExtractor()
+    extractor.feed(fragment)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+def clean(text):
+    return NON_ASCII.sub("", text).strip()
+
+
+def format_clock(hours, minutes):
+    """"14", "05" -> "2:05 PM"."""
+    hours, minutes = int(hours), int(minutes)
+    am_pm = "AM" if hours < 12 else "PM"
+    if hours == 0:
+        hours = 12
+    elif hours > 12:
+        hours -= 12
+    return f"{hours}:{minutes:02d} {am_pm}"
+
+
+def format_time_range(text):
+    """The first "HH:MM-HH:MM" in text as "h:mm AM - h:mm PM", or ""."""
+    match = TIME_RANGE.search(text)
+    if not match:
+        return ""
+    start_hours, start_minutes, end_hours, end_minutes = match.groups()
+    return f"{format_clock(start_hours, start_minutes)} - {format_clock(end_hours, end_minutes)}"
+
+
+def format_date(text):
+    """The first one or two "DD/MM/YYYY" dates in text as "DD-MM-YYYY" or "DD-MM-YYYY to DD-MM-YYYY", or ""."""
+    dates = NUMERIC_DATE.findall(text)
+    if not dates:
+        return ""
+    formatted = [f"{day}-{month}-{year}" for day, month, year in dates[:2]]
+    return " to ".join(formatted)
+
+
+def _extract_regions_fast(page):
+    """(description text, Date/Time text or None, Venue text or None, organizer text or None) by slicing."""
+    description = ""
+    header = DETAILS_HEADER.search(page)
+    organizer = ORGANIZER.search(page)
+    # Every slice below starts at or after the first of these; a comment,
+    # script or style that is still open there could hide or fake any of them.
+    starts = [match.start() for match in (header, TR_TAG.search(page), organizer) if match]
+    if starts:
+        first = min(starts)
+        for opaque in OPAQUE.finditer(page):
+            if opaque.end() > first:
+                raise UnsupportedMarkup("comment, <script> or <style> among the parsed regions")
+
+    if header:
+        end = DETAILS_END.search(page, header.end())
+        region_end = end.start() if end else len(page)
+        position = header.end()
+        while True:
+            start = P_START.search(page, position, region_end)
+            if not start:
+                break
+            close = P_END.search(page, start.end())
+            if not close:
+                raise UnsupportedMarkup("unclosed <p>")
+            body = page[start.start():close.end()]
+            if len(P_START.findall(body)) > 1 or NESTED_TABLE.search(body):
+                raise UnsupportedMarkup("nested block in <p>")
+            description += fragment_text(body).strip() + " "
+            position = close.end()
+
+    date_time = venue = None
+    rows = TR.findall(page)
+    if len(rows) != len(TR_TAG.findall(page)):
+        raise UnsupportedMarkup("unclosed <tr>")
+    for row in rows:
+        if NESTED_TABLE.search(row) or TR_TAG.search(row):
+            raise UnsupportedMarkup("nested table")
+        cells = TD.findall(row)
+        if len(cells) != len(TD_TAG.findall(row)):
+            raise UnsupportedMarkup("unclosed <td>")
+        if len(cells) < 2:
+            continue
+        label = fragment_text(cells[0])
+        if "Date/Time" in label:
+            date_time = fragment_text(cells[1])
+        elif "Venue" in label:
+            venue = fragment_text(cells[1])
+
+    if organizer and SPAN_TAG.search(organizer.group(1)):
+        raise UnsupportedMarkup("nested <span> in organizer")
+    return description, date_time, venue, fragment_text(organizer.group(1)) if organizer else None
+
+
+def _extract_regions_soup(page):
+    """The same regions from a full html.parser tree: the scraper's original walk."""
+    soup = BeautifulSoup(page, "html.parser")
+
+    description = ""
+    header = soup.find("span", class_="UEViewHeader", string="Event Details")
+    if header:
+        element = header.find_next()
+        while element and element.name != "span" and "UEViewHeader" not in element.get("class", []):
+            if element.name == "p":
+                description += element.text.strip() + " "
+            element = element.find_next()
+
+    date_time = venue = None
+    for tr in soup.find_all("tr"):
+        cells = tr.find_all("td")
+        if len(cells) >= 2:
+            if "Date/Time" in cells[0].text:
+                date_time = cells[1].text
+            elif "Venue" in cells[0].text:
+                venue = cells[1].text
+
+    organizer = soup.find("span", class_="UEViewOrganizer")
+    return description, date_time, venue, organizer.text if organizer else None
+
+
+def parse_event_page(page, category, listing_date_time, listing_venue, title, event_id, fast=True):
+    """
+    Builds the event record for one detail page and its category listing row.
+    Returns (event, missing required fields). With fast=False the full-tree
+    reference parse is used.
+    """
+    regions = None
+    if fast:
+        try:
+            regions = _extract_regions_fast(page)
+        except UnsupportedMarkup:
+            regions = None
+    description, date_time, venue, organizer = regions or _extract_regions_soup(page)
+
+    description = clean(description)
+
+    formatted_date = formatted_time = ""
+    if date_time is not None:
+        date_time = date_time.strip()
+        formatted_date = format_date(date_time)
+        formatted_time = format_time_range(date_time)
+
+    if not formatted_date or not formatted_time:
+        date_range = LISTING_DATE_RANGE.search(listing_date_time)
+        if date_range:
+            formatted_date = date_range.group(1)
+        date = LISTING_DATE.search(listing_date_time)
+        if date and not formatted_date:
+            formatted_date = date.group(1)
+        if not formatted_time:
+            formatted_time = format_time_range(listing_date_time)
+
+    organization = "HKU"
+    if category == "category_O" and organizer is not None and "organized by" in organizer:
+        organized_by = ORGANIZED_BY.search(organizer.strip())
+        if organized_by:
+            organization = clean(organized_by.group(1).strip())
+
+    location = venue.strip() if venue is not None else listing_venue
+    location = TRAILING_DOTS.sub(".", clean(location))
+
+    summary = description[:100] + "..." if len(description) > 100 else description
+
+    event = {
+        "eventId": event_id,
+        "title": clean(title),
+        "image": IMAGE_URL,
+        "summary": summary,
+        "description": description,
+        "date": formatted_date,
+        "time": formatted_time,
+        "organization": organization,
+        "type": "University Event" if organization == "HKU" else "External Event",
+        "subtype": CATEGORY_NAMES[category],
+        "location": location
+    }
+    return event, [field for field in REQUIRED_FIELDS if not event.get(field)]
+
+
+def _parse_job(job):
+    return parse_event_page(*job)
+
+
+def parse_event_pages(jobs, workers=1, chunksize=16):
+    """
+    parse_event_page over a list of argument tuples, in order. With more
+    than one worker the pages are parsed in a process pool.
+    """
+    if workers <= 1 or len(jobs) < 2:
+        return [parse_event_page(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_job, jobs, chunksize=chunksize))
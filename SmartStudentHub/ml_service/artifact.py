@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+SCHEMA_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+ARRAYS = ('indptr', 'indices', 'data', 'user_ids', 'event_ids', 'event_refs')
+
+# Saves publish CURRENT and prune old versions; one at a time per process.
+_save_lock = threading.Lock()
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def save_artifact(model_dir, matrix, user_ids, event_ids, event_refs, generation, trained_at=None,
+                  write_extras=None, metadata=None, keep=2):
+    """
+    Writes the model as plain .npy arrays plus manifest.json into a new version
+    directory under model_dir, then points model_dir/CURRENT at it. Older
+    versions beyond `keep` are removed; readers that still have them mapped
+    keep working until they reload. Every save gets its own version name, so
+    it never writes into or removes a version another save published.
+
+    write_extras(version_dir) may add further files (such as a neighbor index)
+    before the version is published; they are checksummed like the arrays.
+    """
+    with _save_lock:
+        return _save_artifact(model_dir, matrix, user_ids, event_ids, event_refs, generation, trained_at,
+                              write_extras, metadata, keep)
+
+
+def _save_artifact(model_dir, matrix, user_ids, event_ids, event_refs, generation, trained_at,
+                   write_extras, metadata, keep):
+    trained_at = trained_at if trained_at is not None else time.time()
+    # Compactions save again under the same generation and trained_at.
+    version = f"v{generation}-{int(trained_at * 1000)}-{uuid.uuid4().hex[:8]}"
+    version_dir = os.path.join(model_dir, version)
+    tmp_dir = f"{version_dir}.tmp"
+
+    os.makedirs(model_dir, exist_ok=True)
+    os.makedirs(tmp_dir)
+
+    matrix = matrix.tocsr()
+    arrays = {
+        'indptr': matrix.indptr,
+        'indices': matrix.indices,
+        'data': matrix.data,
+        'user_ids': np.asarray(user_ids, dtype=str),
+        'event_ids': np.asarray([str(event_id) for event_id in event_ids], dtype=str),
+        'event_refs': np.asarray(event_refs, dtype=str)
+    }
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array, allow_pickle=False)
+
+    if write_extras is not None:
+        write_extras(tmp_dir)
+
+    checksums = {}
+    for root, _, files in os.walk(tmp_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            checksums[os.path.relpath(path, tmp_dir)] = _sha256(path)
+
+    manifest = {
+        'schema_version': SCHEMA_VERSION,
+        'generation': generation,
+        'trained_at': trained_at,
+        'shape': list(matrix.shape),
+        'nnz': int(matrix.nnz),
+        'metadata': metadata or {},
+        'checksums': checksums
+    }
+    _write_atomic(os.path.join(tmp_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+    os.replace(tmp_dir, version_dir)
+    _write_atomic(os.path.join(model_dir, CURRENT_FILE), version)
+
+    # Another process may have published after us; its version stays too.
+    with open(os.path.join(model_dir, CURRENT_FILE), encoding='utf-8') as f:
+        current = f.read().strip()
+
+    versions = sorted(
+        (entry for entry in os.listdir(model_dir)
+         if entry.startswith('v') and os.path.isdir(os.path.join(model_dir, entry)) and not entry.endswith('.tmp')),
+        key=lambda entry: os.path.getmtime(os.path.join(model_dir, entry))
+    )
+    for old_version in versions[:-keep]:
+        if old_version not in (version, current):
+            shutil.rmtree(os.path.join(model_dir, old_version), ignore_errors=True)
+
+    return version_dir
+
+
+def load_artifact(model_dir, mmap=True, verify=True):
+    """
+    Loads the version named by model_dir/CURRENT. With mmap the arrays are
+    read-only memory maps, so processes loading the same version share pages.
+    Raises FileNotFoundError if there is no artifact and ArtifactError if it
+    is unusable.
+    """
+    with open(os.path.join(model_dir, CURRENT_FILE), encoding='utf-8') as f:
+        version = f.read().strip()
+    version_dir = os.path.join(model_dir, version)
+
+    try:
+        with open(os.path.join(version_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Unreadable manifest for {version}: {str(e)}")
+
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        raise ArtifactError(f"Unsupported schema version {manifest.get('schema_version')} in {version}")
+
+    if verify:
+        for relative_path, checksum in manifest['checksums'].items():
+            if _sha256(os.path.join(version_dir, relative_path)) != checksum:
+                raise ArtifactError(f"Checksum mismatch for {relative_path} in {version}")
+
+    arrays = {}
+    for name in ARRAYS:
+        path = os.path.join(version_dir, f"{name}.npy")
+        if f"{name}.npy" not in manifest['checksums']:
+            raise ArtifactError(f"{name}.npy is not listed in the manifest of {version}")
+        try:
+            arrays[name] = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ArtifactError(f"Unreadable {name}.npy in {version}: {str(e)}")
+
+    shape = tuple(manifest['shape'])
+    matrix = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape, copy=False)
+    if matrix.nnz != manifest['nnz']:
+        raise ArtifactError(f"Matrix in {version} does not match its manifest")
+
+    return {
+        'version': version,
+        'path': version_dir,
+        'manifest': manifest,
+        'matrix': matrix,
+        'user_ids': arrays['user_ids'].tolist(),
+        'event_ids': arrays['event_ids'].tolist(),
+        'event_refs': arrays['event_refs'].tolist()
+    }
@@ -0,0 +1,254 @@
+"""
+ASGI entry point for the recommender. Serves the same API as the Flask app
+in ml_recommender, with user lookups going through motor and scoring running
+on a thread pool so the event loop stays free. Concurrent /recommend requests
+for the same user, parameters, model generation and catalog version share a
+single computation, and answers go through the same result cache and ETag
+handling as the Flask app.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5003
+
+Run a single worker per process: every worker holds its own copy of the
+model and trains it on /retrain independently.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+import ml_recommender as service
+from async_mongo import AsyncUserStore
+from coalescing import RequestCoalescer
+from metrics import CONTENT_TYPE, Counter, Gauge, StageTimer
+from result_cache import etag_matches
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+SCORING_THREADS = int(os.getenv('ASGI_SCORING_THREADS', '4'))
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', '5000'))
+
+COALESCED_REQUESTS = service.registry.register(Counter(
+    'recommender_coalesced_requests_total', "Requests answered by another request's in-flight computation.",
+    ('endpoint',)
+))
+
+coalescer = RequestCoalescer()
+service.registry.register(Gauge(
+    'recommender_in_flight_computations', "Distinct /recommend computations in flight on the ASGI app.",
+    lambda: len(coalescer)
+))
+
+executor = None
+user_store = None
+
+
+def json_response(body, status=200):
+    # Same encoder as the Flask routes, so both apps render dates and ids identically.
+    return Response(dumps(body), status_code=status, media_type='application/json')
+
+
+def recommendation_response(request, payload, status, etag):
+    if etag is not None and etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers={'ETag': etag})
+    headers = {'ETag': etag} if etag is not None else None
+    return Response(payload, status_code=status, headers=headers, media_type='application/json')
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def run_scoring(function, *args):
+    return asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+
+def timed(rule):
+    """Records the handler's latency in the request histogram, like the Flask after_request hook."""
+    def decorator(handler):
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            service.REQUEST_SECONDS.observe(
+                time.perf_counter() - started, rule, request.method, str(response.status_code)
+            )
+            return response
+        return wrapper
+    return decorator
+
+
+async def compute_recommendations(snapshot, user_id, user_obj_id, num_recommendations, mode, window, fields):
+    stages = StageTimer(service.REQUEST_STAGE_SECONDS, '/recommend')
+    formatted_events = service.materialized_recommendations_for(
+        snapshot, user_id, num_recommendations, mode, window, fields
+    )
+    stages.lap('materialized_lookup')
+    if formatted_events:
+        logger.info(f"Returning {len(formatted_events)} materialized recommendations for user {user_id}.")
+        service.RECOMMENDATION_SOURCE.inc('materialized')
+        payload, etag = service.render_body({"recommendations": formatted_events})
+        stages.lap('serialization')
+        return payload, 200, etag
+
+    try:
+        registered_events = await user_store.registered_events(user_obj_id)
+    except Exception as e:
+        logger.error(f"Database error when fetching user {user_id}: {str(e)}")
+        return service.render_body({"error": "Database error."})[0], 500, None
+    stages.lap('user_lookup')
+
+    if registered_events is None:
+        logger.error(f"User not found: {user_id}")
+        return service.render_body({"error": "User not found."})[0], 404, None
+
+    return await run_scoring(
+        service.cached_recommend_for_user,
+        snapshot, user_id, registered_events, num_recommendations, mode, stages, window, fields
+    )
+
+
+@timed('/recommend')
+async def recommend(request):
+    params, error = service.parse_recommend_request(await read_json(request))
+    if error:
+        return json_response(*error)
+    user_id, user_obj_id, num_recommendations, mode, window, fields = params
+
+    snapshot = service.current_model
+    key = (
+        user_id,
+        num_recommendations,
+        mode,
+        window,
+        fields,
+        snapshot.generation if snapshot is not None else None,
+        service.event_catalog.version
+    )
+    if key in coalescer:
+        COALESCED_REQUESTS.inc('/recommend')
+    payload, status, etag = await coalescer.run(
+        key, lambda: compute_recommendations(snapshot, user_id, user_obj_id, num_recommendations, mode, window, fields)
+    )
+    return recommendation_response(request, payload, status, etag)
+
+
+@timed('/recommend/batch')
+async def recommend_batch(request):
+    params, error = service.parse_batch_request(await read_json(request))
+    if error:
+        return json_response(*error)
+    batch_user_ids, num_recommendations, mode, window, fields = params
+
+    snapshot = service.current_model
+    if snapshot is None:
+        logger.error("Model is not ready.")
+        return json_response({"error": "Model is not ready."}, 503)
+
+    stages = StageTimer(service.REQUEST_STAGE_SECONDS, '/recommend/batch')
+    object_ids, results = service.parse_user_ids(batch_user_ids)
+    try:
+        registered_by_user = await user_store.registered_events_many(object_ids.values())
+        stages.lap('user_lookup')
+        results.update(await run_scoring(
+            service.score_batch,
+            snapshot, object_ids, registered_by_user, num_recommendations, mode, stages, window, fields
+        ))
+    except Exception as e:
+        logger.error(f"Error generating batch recommendations: {str(e)}")
+        return json_response({"error": "Error generating recommendations."}, 500)
+
+    logger.info(f"Returning batch recommendations for {len(results)} users.")
+    response = json_response({"results": results})
+    stages.lap('serialization')
+    return response
+
+
+@timed('/retrain')
+async def retrain(request):
+    job = service.retrain_worker.submit()
+    logger.info(f"Retrain job {job['job_id']} scheduled ({job['status']}, coalesced={job['coalesced']}).")
+    return json_response({"message": "Model retraining scheduled.", **job}, 202)
+
+
+@timed('/retrain/<job_id>')
+async def retrain_status(request):
+    job = service.retrain_worker.status(request.path_params['job_id'])
+    if job is None:
+        return json_response({"error": "Retrain job not found."}, 404)
+    return json_response(job)
+
+
+@timed('/interactions')
+async def interactions(request):
+    # Compaction can rebuild the model, so it runs off the event loop.
+    body, status = await run_scoring(service.apply_interactions, await read_json(request))
+    return json_response(body, status)
+
+
+async def ready(request):
+    snapshot = service.current_model
+    body = {
+        "ready": service.is_ready(),
+        "model_loaded": snapshot is not None,
+        "catalog_loaded": service.event_catalog.loaded,
+        "generation": snapshot.generation if snapshot is not None else None,
+        "trained_at": snapshot.trained_at if snapshot is not None else None
+    }
+    return json_response(body, 200 if body["ready"] else 503)
+
+
+async def metrics(request):
+    return Response(service.registry.render(), headers={'Content-Type': CONTENT_TYPE})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global executor, user_store
+    executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix='scoring')
+    user_store = AsyncUserStore(
+        service.MONGO_URI,
+        service.DATABASE_NAME,
+        max_pool_size=service.MONGO_MAX_POOL_SIZE,
+        min_pool_size=service.MONGO_MIN_POOL_SIZE,
+        timeout_ms=MONGO_TIMEOUT_MS
+    )
+    service.start_warm_up()
+    logger.info(
+        f"ASGI recommender started with {SCORING_THREADS} scoring threads "
+        f"and a Mongo pool of {service.MONGO_MIN_POOL_SIZE}-{service.MONGO_MAX_POOL_SIZE} connections."
+    )
+    try:
+        yield
+    finally:
+        service.event_catalog.stop_polling()
+        executor.shutdown(wait=False)
+        user_store.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/recommend', recommend, methods=['POST']),
+        Route('/recommend/batch', recommend_batch, methods=['POST']),
+        Route('/retrain', retrain, methods=['POST']),
+        Route('/retrain/{job_id}', retrain_status, methods=['GET']),
+        Route('/interactions', interactions, methods=['POST']),
+        Route('/ready', ready, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5003')), workers=1)
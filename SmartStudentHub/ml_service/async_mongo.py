@@ -0,0 +1,34 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+class AsyncUserStore:
+    """
+    Async access to the users collection for the ASGI app. The pool bounds
+    how many queries run against Mongo at once; requests beyond it wait for
+    a connection instead of opening new ones.
+    """
+
+    def __init__(self, uri, database_name, max_pool_size=100, min_pool_size=0, timeout_ms=5000):
+        self.client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            waitQueueTimeoutMS=timeout_ms,
+            serverSelectionTimeoutMS=timeout_ms
+        )
+        self.users_collection = self.client[database_name]['users']
+
+    async def registered_events(self, user_obj_id):
+        """Returns the user's registered event ObjectIds, or None if the user does not exist."""
+        user = await self.users_collection.find_one({'_id': user_obj_id}, {'registeredEvents': 1})
+        if user is None:
+            return None
+        return user.get('registeredEvents', [])
+
+    async def registered_events_many(self, user_obj_ids):
+        """Returns {str(user ObjectId): registered event ObjectIds} for the users that exist."""
+        cursor = self.users_collection.find({'_id': {'$in': list(user_obj_ids)}}, {'registeredEvents': 1})
+        return {str(user['_id']): user.get('registeredEvents', []) async for user in cursor}
+
+    def close(self):
+        self.client.close()
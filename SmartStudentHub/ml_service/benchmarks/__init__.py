@@ -0,0 +1,9 @@
+"""
+Synthetic-scale benchmarks for the recommender service.
+
+Run from the ml_service directory:
+    python -m benchmarks.run --preset 10k
+    python -m benchmarks.compare baseline.json current.json
+    python -m benchmarks.loadtest --url http://localhost:5003 --concurrency 1 16 64
+    python -m benchmarks.payload
+"""
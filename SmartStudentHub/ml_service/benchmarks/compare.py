@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+# Every tracked metric is lower-is-better. Each has a noise floor: changes
+# smaller than it, in the metric's own unit, are never flagged.
+METRICS = (
+    (('train_seconds',), 0.25),
+    (('load_seconds',), 0.1),
+    (('peak_rss_mb',), 16),
+    (('artifact_bytes',), 64 * 1024),
+)
+LATENCY_METRICS = (
+    (('single', 'p50_ms'), 1.0),
+    (('single', 'p99_ms'), 2.0),
+    (('batch', 'p50_ms'), 5.0),
+    (('batch', 'p99_ms'), 10.0),
+)
+
+
+def _lookup(run, path):
+    value = run
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def tracked_metrics(run):
+    metrics = list(METRICS)
+    for mode in sorted(run.get('latency', {})):
+        metrics.extend((('latency', mode) + path, floor) for path, floor in LATENCY_METRICS)
+    return metrics
+
+
+def compare(baseline, current, threshold):
+    """
+    Yields (preset, metric, baseline, current, change, regressed) for every
+    metric present in both reports. change is relative to the baseline.
+    """
+    baseline_runs = {run['preset']: run for run in baseline['runs'] if 'error' not in run}
+    for run in current['runs']:
+        previous = baseline_runs.get(run['preset'])
+        if previous is None or 'error' in run:
+            continue
+        for path, floor in tracked_metrics(run):
+            before, after = _lookup(previous, path), _lookup(run, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            yield run['preset'], '.'.join(path), before, after, change, change > threshold and after - before > floor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files and flag regressions.")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressions = 0
+    for preset, metric, before, after, change, regressed in compare(baseline, current, args.threshold):
+        regressions += regressed
+        flag = 'REGRESSION' if regressed else ''
+        print(f"{preset:<5} {metric:<28} {before:>14.3f} {after:>14.3f} {change:>+8.1%} {flag}")
+
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.threshold:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+def _copy(value):
+    # Documents hold scalars, ObjectIds and flat lists; a shallow list copy is enough.
+    return list(value) if isinstance(value, list) else value
+
+
+class FakeCollection:
+    """
+    Just enough of a pymongo collection for the recommender, with documents
+    held in a dict keyed by _id so lookups by _id cost what an indexed Mongo
+    lookup would. Supported filters: {}, {'_id': value}, {'_id': {'$in': [...]}}
+    and {field: {'$gte': value}}.
+    """
+
+    def __init__(self):
+        self._documents = {}
+
+    def _matches(self, filter_):
+        if not filter_:
+            return iter(self._documents.values())
+
+        if set(filter_) == {'_id'}:
+            condition = filter_['_id']
+            if isinstance(condition, dict) and '$in' in condition:
+                return (self._documents[key] for key in condition['$in'] if key in self._documents)
+            document = self._documents.get(condition)
+            return iter([document] if document is not None else [])
+
+        (field, condition), = filter_.items()
+        if isinstance(condition, dict) and '$gte' in condition:
+            bound = condition['$gte']
+            return (
+                document for document in self._documents.values()
+                if document.get(field) is not None and document[field] >= bound
+            )
+        return (document for document in self._documents.values() if document.get(field) == condition)
+
+    @staticmethod
+    def _project(document, projection):
+        if not projection:
+            return {key: _copy(value) for key, value in document.items()}
+        projected = {key: _copy(document[key]) for key, include in projection.items() if include and key in document}
+        if projection.get('_id', 1):
+            projected['_id'] = document['_id']
+        return projected
+
+    def find(self, filter_=None, projection=None, **kwargs):
+        return (self._project(document, projection) for document in self._matches(filter_ or {}))
+
+    def find_one(self, filter_=None, projection=None):
+        for document in self._matches(filter_ or {}):
+            return self._project(document, projection)
+        return None
+
+    def insert_one(self, document):
+        self._documents[document['_id']] = {key: _copy(value) for key, value in document.items()}
+
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            self.insert_one(document)
+
+    def delete_many(self, filter_):
+        keys = [document['_id'] for document in self._matches(filter_)]
+        for key in keys:
+            del self._documents[key]
+
+    def estimated_document_count(self):
+        return len(self._documents)
+
+    def count_documents(self, filter_):
+        return sum(1 for _ in self._matches(filter_))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection()
+        return self._collections[name]
+
+
+class FakeMongoClient:
+    """Drop-in for pymongo.MongoClient in benchmarks; connection arguments are ignored."""
+
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase()
+        return self._databases[name]
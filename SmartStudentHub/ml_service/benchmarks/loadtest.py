@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.run import latency_summary
+
+
+def read_user_ids(args):
+    if args.user_ids:
+        with open(args.user_ids, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    from pymongo import MongoClient
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    users = client[os.getenv('DATABASE_NAME', 'test')]['users']
+    cursor = users.find({'registeredEvents.0': {'$exists': True}}, {'_id': 1}).limit(args.sample_users)
+    return [str(user['_id']) for user in cursor]
+
+
+async def run_level(url, concurrency, user_ids, options):
+    """
+    Keeps `concurrency` requests in flight against /recommend until
+    options['requests'] have been sent or options['duration'] has passed.
+    A hot_fraction of the requests go to one of options['hot_users'] users,
+    which is what request coalescing helps with.
+    """
+    rng = random.Random(options['seed'])
+    hot_users = user_ids[:options['hot_users']]
+    latencies = []
+    statuses = {}
+    sent = 0
+    deadline = time.perf_counter() + options['duration'] if options['duration'] else None
+
+    def next_user():
+        if hot_users and rng.random() < options['hot_fraction']:
+            return rng.choice(hot_users)
+        return rng.choice(user_ids)
+
+    async def worker(client):
+        nonlocal sent
+        while sent < options['requests'] and (deadline is None or time.perf_counter() < deadline):
+            sent += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post('/recommend', json={'user_id': next_user(), 'mode': options['mode']})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=options['timeout']) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status != '200')
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'errors': errors,
+        'statuses': statuses,
+        **latency_summary(latencies)
+    }
+
+
+def coalesced_total(url):
+    """Reads recommender_coalesced_requests_total from /metrics, or None if the server does not export it."""
+    try:
+        text = httpx.get(f"{url}/metrics").text
+    except httpx.HTTPError:
+        return None
+    total = None
+    for line in text.splitlines():
+        if line.startswith('recommender_coalesced_requests_total'):
+            total = (total or 0.0) + float(line.rsplit(' ', 1)[1])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /recommend throughput and latency under concurrent load.")
+    parser.add_argument('--url', default='http://localhost:5003')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per concurrency level.")
+    parser.add_argument('--duration', type=float, help="Stop each level after this many seconds.")
+    parser.add_argument('--user-ids', help="File with one user id per line. Defaults to sampling MONGO_URI.")
+    parser.add_argument('--sample-users', type=int, default=10000)
+    parser.add_argument('--hot-users', type=int, default=10)
+    parser.add_argument('--hot-fraction', type=float, default=0.0, help="Share of requests sent to the hot users.")
+    parser.add_argument('--mode', choices=['user', 'item'], default='user')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Optional JSON result file.")
+    args = parser.parse_args()
+
+    user_ids = read_user_ids(args)
+    if not user_ids:
+        print("No user ids to request.")
+        return 1
+
+    options = {
+        'requests': args.requests if args.duration is None else sys.maxsize,
+        'duration': args.duration,
+        'hot_users': args.hot_users,
+        'hot_fraction': args.hot_fraction,
+        'mode': args.mode,
+        'timeout': args.timeout,
+        'seed': args.seed
+    }
+
+    levels = []
+    for concurrency in args.concurrency:
+        before = coalesced_total(args.url)
+        result = asyncio.run(run_level(args.url, concurrency, user_ids, options))
+        after = coalesced_total(args.url)
+        result['coalesced'] = after - before if before is not None and after is not None else None
+        levels.append(result)
+        print(
+            f"c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  p50={result['p50_ms']:.1f}ms "
+            f"p99={result['p99_ms']:.1f}ms  errors={result['errors']}"
+            + (f"  coalesced={result['coalesced']:.0f}" if result['coalesced'] is not None else '')
+        )
+
+    if args.output:
+        report = {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'url': args.url,
+            'users': len(user_ids),
+            'options': {key: value for key, value in vars(args).items() if key != 'output'},
+            'levels': levels
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 1 if any(level['errors'] for level in levels) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
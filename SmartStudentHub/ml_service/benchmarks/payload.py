@@ -0,0 +1,115 @@
+import argparse
+import time
+
+import numpy as np
+from flask import Flask
+
+import serialization
+from benchmarks.fake_mongo import FakeDatabase
+from benchmarks.synthetic import generate, populate
+from catalog import FIELD_PROFILES, EventCatalog
+
+# Scraped descriptions run to a few paragraphs, partly in Chinese.
+SENTENCE = "Join us for an afternoon of talks and workshops. 歡迎各位同學參加。"
+
+
+def long_text(chars, i):
+    text = f"Event {i}. " + SENTENCE * (chars // len(SENTENCE) + 1)
+    return text[:chars]
+
+
+def build_catalog(events, summary_chars, description_chars):
+    documents = generate(users=0, events=events, organizations=max(events // 25, 1))
+    for i, event in enumerate(documents['events']):
+        event['summary'] = long_text(summary_chars, i)
+        event['description'] = long_text(description_chars, i)
+    db = FakeDatabase()
+    populate(db, documents)
+    catalog = EventCatalog(db['events'], db['organizations'])
+    catalog.load()
+    return catalog, [event['eventId'] for event in documents['events']]
+
+
+def time_responses(render, responses, repeat):
+    """Best-of-repeat microseconds per response and bytes per response."""
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = sum(len(payload if isinstance(payload, bytes) else payload.encode())
+                   for payload in map(render, responses))
+        best = min(best, time.perf_counter() - started)
+    return best / len(responses) * 1e6, size / len(responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bytes and serialization time of /recommend bodies: full dicts with Flask's encoder "
+                    "against cached catalog fragments with the service encoder."
+    )
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=10, help="Recommendations per user.")
+    parser.add_argument('--responses', type=int, default=2000)
+    parser.add_argument('--batch-users', type=int, default=100, help="Users per /recommend/batch body.")
+    parser.add_argument('--summary-chars', type=int, default=300)
+    parser.add_argument('--description-chars', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    catalog, event_ids = build_catalog(args.events, args.summary_chars, args.description_chars)
+    rng = np.random.default_rng(0)
+    responses = [list(rng.choice(event_ids, size=args.rows, replace=False)) for _ in range(args.responses)]
+    flask_json = Flask(__name__).json
+
+    def before(rows):
+        return flask_json.dumps({"recommendations": [catalog.get(event_id) for event_id in rows]})
+
+    def after(fields):
+        def render(rows):
+            return serialization.dumps({"recommendations": [catalog.fragment(event_id, fields) for event_id in rows]})
+        return render
+
+    def batch(render_rows):
+        def render(users):
+            return render_rows({"results": {str(i): {"recommendations": rows} for i, rows in enumerate(users)}})
+        return render
+
+    for fields in FIELD_PROFILES.values():
+        for event_id in event_ids:
+            catalog.fragment(event_id, fields)
+
+    encoder = 'orjson' if serialization.orjson is not None else 'json'
+    print(f"{args.events} events, {args.rows} rows per response, encoder={encoder}")
+    single = [
+        ('before (dicts, Flask json)', before),
+        ('after full (fragments)', after(FIELD_PROFILES['full'])),
+        ('after compact (fragments)', after(FIELD_PROFILES['compact']))
+    ]
+    baseline = None
+    for label, render in single:
+        micros, size = time_responses(render, responses, args.repeat)
+        baseline = baseline or micros
+        print(f"  /recommend        {label:<28} {size / 1024:8.1f} KiB {micros:9.1f}us  {baseline / micros:5.1f}x")
+
+    users = [responses[start:start + args.batch_users] for start in range(0, len(responses), args.batch_users)]
+    full_rows = [[[catalog.get(event_id) for event_id in rows] for rows in chunk] for chunk in users]
+    batches = [
+        ('before (dicts, Flask json)', batch(flask_json.dumps), full_rows),
+        ('after full (fragments)', batch(serialization.dumps), [
+            [[catalog.fragment(event_id, FIELD_PROFILES['full']) for event_id in rows] for rows in chunk]
+            for chunk in users
+        ]),
+        ('after compact (fragments)', batch(serialization.dumps), [
+            [[catalog.fragment(event_id, FIELD_PROFILES['compact']) for event_id in rows] for rows in chunk]
+            for chunk in users
+        ])
+    ]
+    baseline = None
+    for label, render, bodies in batches:
+        micros, size = time_responses(render, bodies, args.repeat)
+        baseline = baseline or micros
+        print(f"  /recommend/batch  {label:<28} {size / 1024:8.1f} KiB {micros:9.1f}us  {baseline / micros:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
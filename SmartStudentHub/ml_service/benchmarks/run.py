@@ -0,0 +1,253 @@
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import PRESETS, generate, populate
+
+ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ML_SERVICE_DIR, 'benchmarks', 'results')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, file_name)) for file_name in files)
+    return total
+
+
+def latency_summary(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        'requests': int(len(milliseconds)),
+        'mean_ms': float(milliseconds.mean()),
+        'p50_ms': float(np.percentile(milliseconds, 50)),
+        'p99_ms': float(np.percentile(milliseconds, 99))
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ML_SERVICE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_preset(preset, options):
+    """
+    Runs one preset end to end in the current process: generate, train,
+    reload the artifact the way a restarted server would, then time
+    /recommend and /recommend/batch through the Flask test client.
+    """
+    sizes = PRESETS[preset]
+    workdir = tempfile.mkdtemp(prefix=f"recommender-bench-{preset}-")
+    os.environ.update({
+        'MODEL_DIR': os.path.join(workdir, 'model'),
+        'MATERIALIZE_RECOMMENDATIONS': 'false',
+        'RETRAIN_DEBOUNCE': '0',
+        'CATALOG_REFRESH_INTERVAL': '3600',
+        # Synthetic events are dated in 2025; filtering on today's date would
+        # make results depend on when the benchmark runs.
+        'UPCOMING_ONLY': 'false'
+    })
+    os.chdir(workdir)
+
+    # The service connects at import time, so the stand-in must be in place first.
+    import pymongo
+    if options['store'] == 'mongomock':
+        import mongomock
+        pymongo.MongoClient = mongomock.MongoClient
+    else:
+        from benchmarks.fake_mongo import FakeMongoClient
+        pymongo.MongoClient = FakeMongoClient
+    sys.path.insert(0, ML_SERVICE_DIR)
+    import ml_recommender
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        started = time.perf_counter()
+        documents = generate(
+            sizes['users'], sizes['events'], sizes['organizations'],
+            mean_registrations=options['mean_registrations'], seed=options['seed']
+        )
+        registrations = sum(len(user['registeredEvents']) for user in documents['users'])
+        populate(ml_recommender.db, documents)
+        sample_user_ids = [str(user['_id']) for user in documents['users'] if user['registeredEvents']]
+        del documents
+        generate_seconds = time.perf_counter() - started
+        rss_before_training = peak_rss_mb()
+
+        started = time.perf_counter()
+        if not ml_recommender.train_model():
+            raise RuntimeError("Training failed.")
+        train_seconds = time.perf_counter() - started
+        rss_after_training = peak_rss_mb()
+        training_phases = {
+            labels[0]: total for labels, (total, _) in ml_recommender.TRAINING_PHASE_SECONDS.totals().items()
+        }
+
+        started = time.perf_counter()
+        ml_recommender.current_model = None
+        ml_recommender.start_warm_up().join()
+        if not ml_recommender.is_ready():
+            raise RuntimeError("Model artifact could not be reloaded.")
+        load_seconds = time.perf_counter() - started
+        artifact_bytes = directory_size(ml_recommender.load_artifact(ml_recommender.MODEL_DIR, verify=False)['path'])
+
+        rng = np.random.default_rng(options['seed'])
+        client = ml_recommender.app.test_client()
+        latency = {}
+        for mode in options['modes']:
+            single = []
+            users = rng.choice(sample_user_ids, size=options['warmup'] + options['requests'])
+            for i, user_id in enumerate(users):
+                request_started = time.perf_counter()
+                response = client.post('/recommend', json={'user_id': str(user_id), 'mode': mode})
+                elapsed = time.perf_counter() - request_started
+                if response.status_code != 200:
+                    raise RuntimeError(f"/recommend returned {response.status_code}: {response.get_data(as_text=True)}")
+                if i >= options['warmup']:
+                    single.append(elapsed)
+
+            batch = []
+            for i in range(options['batches'] + 1):
+                user_ids = rng.choice(sample_user_ids, size=options['batch_size']).tolist()
+                request_started = time.perf_counter()
+                response = client.post('/recommend/batch', json={'user_ids': user_ids, 'mode': mode})
+                elapsed = time.perf_counter() - request_started
+                if response.status_code != 200:
+                    raise RuntimeError(f"/recommend/batch returned {response.status_code}")
+                if i > 0:
+                    batch.append(elapsed)
+
+            latency[mode] = {
+                'single': latency_summary(single),
+                'batch': {**latency_summary(batch), 'batch_size': options['batch_size']}
+            }
+
+        return {
+            'preset': preset,
+            'users': sizes['users'],
+            'events': sizes['events'],
+            'organizations': sizes['organizations'],
+            'registrations': registrations,
+            'generate_seconds': generate_seconds,
+            'train_seconds': train_seconds,
+            'training_phases': training_phases,
+            'load_seconds': load_seconds,
+            'peak_rss_mb_before_training': rss_before_training,
+            'peak_rss_mb': rss_after_training,
+            'artifact_bytes': artifact_bytes,
+            'latency': latency,
+            'config': {
+                name: os.environ[name]
+                for name in ('NEIGHBOR_INDEX', 'RECOMMENDER_MODE', 'NUM_NEIGHBORS', 'CONTENT_WEIGHT', 'ITEM_SIMILARITY_TOP_M')
+                if name in os.environ
+            }
+        }
+    finally:
+        ml_recommender.event_catalog.stop_polling()
+        os.chdir(ML_SERVICE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_in_child(preset, options, queue):
+    try:
+        queue.put(run_preset(preset, options))
+    except Exception as e:
+        queue.put({'preset': preset, 'error': str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark train_model() and /recommend on synthetic data.")
+    parser.add_argument('--preset', nargs='+', choices=sorted(PRESETS), default=['1k'])
+    parser.add_argument(
+        '--store', choices=['fake', 'mongomock'], default='fake',
+        help="Mongo stand-in. fake indexes documents by _id; mongomock scans every collection."
+    )
+    parser.add_argument('--modes', nargs='+', choices=['user', 'item'], default=['user', 'item'])
+    parser.add_argument('--requests', type=int, default=200, help="Timed /recommend calls per mode.")
+    parser.add_argument('--warmup', type=int, default=10, help="Untimed /recommend calls per mode.")
+    parser.add_argument('--batches', type=int, default=20, help="Timed /recommend/batch calls per mode.")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--mean-registrations', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Result file. Defaults to benchmarks/results/<timestamp>.json.")
+    args = parser.parse_args()
+
+    options = {
+        'store': args.store,
+        'modes': args.modes,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'batches': args.batches,
+        'batch_size': args.batch_size,
+        'mean_registrations': args.mean_registrations,
+        'seed': args.seed
+    }
+
+    # Each preset gets a fresh interpreter so peak RSS is not carried over.
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for preset in args.preset:
+        queue = context.Queue()
+        process = context.Process(target=_run_in_child, args=(preset, options, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        runs.append(result)
+        if 'error' in result:
+            print(f"{preset}: failed: {result['error']}")
+            continue
+        print(
+            f"{preset}: train={result['train_seconds']:.2f}s load={result['load_seconds']:.2f}s "
+            f"rss={result['peak_rss_mb']:.0f}MB artifact={result['artifact_bytes'] / 1e6:.1f}MB"
+        )
+        for mode, summary in result['latency'].items():
+            print(
+                f"  {mode:<4} single p50={summary['single']['p50_ms']:.2f}ms p99={summary['single']['p99_ms']:.2f}ms "
+                f"batch({summary['batch']['batch_size']}) p50={summary['batch']['p50_ms']:.2f}ms "
+                f"p99={summary['batch']['p99_ms']:.2f}ms"
+            )
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': options,
+        'runs': runs
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return 1 if any('error' in run for run in runs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import datetime
+
+import numpy as np
+from bson import ObjectId
+
+PRESETS = {
+    '1k': {'users': 1000, 'events': 200, 'organizations': 20},
+    '10k': {'users': 10000, 'events': 1000, 'organizations': 50},
+    '100k': {'users': 100000, 'events': 5000, 'organizations': 200},
+    '1m': {'users': 1000000, 'events': 20000, 'organizations': 500},
+}
+
+EVENT_TYPES = ('University Event', 'External Event')
+SUBTYPES = ('Workshop', 'Talk', 'Volunteer', 'Sports', 'Career', 'Social')
+LOCATIONS = ('Main Building', 'Library', 'Sports Centre', 'Student Union', 'Online')
+
+
+def _object_ids(rng, n):
+    # Deterministic ObjectIds: 12 random bytes from the seeded generator.
+    raw = rng.integers(0, 256, size=(n, 12), dtype=np.uint8)
+    return [ObjectId(row.tobytes()) for row in raw]
+
+
+def generate(users, events, organizations, mean_registrations=5.0, popularity_exponent=1.1, seed=0):
+    """
+    Builds organizations, events and users documents shaped like the backend's
+    Mongoose models. Event popularity follows a power law, so a few events
+    collect most registrations, and each user's registration count is
+    Poisson-distributed around mean_registrations. The same arguments always
+    give the same documents.
+    """
+    rng = np.random.default_rng(seed)
+    updated_at = datetime.datetime(2025, 1, 1)
+
+    organization_refs = _object_ids(rng, organizations)
+    organization_documents = [
+        {'_id': ref, 'organizationId': f"org-{i}", 'name': f"Organization {i}", 'updatedAt': updated_at}
+        for i, ref in enumerate(organization_refs)
+    ]
+
+    event_refs = _object_ids(rng, events)
+    event_organizations = rng.integers(0, organizations, size=events)
+    event_days = rng.integers(0, 365, size=events)
+    event_documents = []
+    for i, ref in enumerate(event_refs):
+        day = datetime.date(2025, 1, 1) + datetime.timedelta(days=int(event_days[i]))
+        event_documents.append({
+            '_id': ref,
+            'eventId': str(i + 1),
+            'title': f"Event {i + 1}",
+            'summary': f"Summary of event {i + 1}.",
+            'description': f"Description of event {i + 1}.",
+            'image': '',
+            'date': day.strftime('%d-%m-%Y'),
+            'time': f"{10 + i % 8}:00",
+            'organization': organization_refs[event_organizations[i]],
+            'type': EVENT_TYPES[i % len(EVENT_TYPES)],
+            'subtype': SUBTYPES[i % len(SUBTYPES)],
+            'location': LOCATIONS[i % len(LOCATIONS)],
+            'updatedAt': updated_at
+        })
+
+    # Event ranks are shuffled so popularity is not tied to eventId order.
+    popularity = 1.0 / np.arange(1, events + 1) ** popularity_exponent
+    popularity = popularity[rng.permutation(events)]
+    popularity /= popularity.sum()
+
+    counts = np.minimum(rng.poisson(mean_registrations, size=users), events)
+    registrations = rng.choice(events, size=int(counts.sum()), p=popularity)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    user_refs = _object_ids(rng, users)
+    user_documents = []
+    for i, ref in enumerate(user_refs):
+        chosen = dict.fromkeys(registrations[offsets[i]:offsets[i + 1]].tolist())
+        user_documents.append({'_id': ref, 'registeredEvents': [event_refs[j] for j in chosen]})
+
+    return {
+        'organizations': organization_documents,
+        'events': event_documents,
+        'users': user_documents
+    }
+
+
+def populate(db, documents, batch_size=10000):
+    """Inserts generated documents into a (fake or real) database, replacing existing ones."""
+    for name in ('organizations', 'events', 'users'):
+        collection = db[name]
+        collection.delete_many({})
+        rows = documents[name]
+        for start in range(0, len(rows), batch_size):
+            collection.insert_many(rows[start:start + batch_size], ordered=False)
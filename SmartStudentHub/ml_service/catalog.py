@@ -0,0 +1,243 @@
+import logging
+import threading
+
+from event_dates import parse_event_date
+from serialization import fragment
+
+logger = logging.getLogger(__name__)
+
+EVENT_PROJECTION = {
+    '_id': 1,
+    'eventId': 1,
+    'title': 1,
+    'image': 1,
+    'summary': 1,
+    'description': 1,
+    'type': 1,
+    'subtype': 1,
+    'location': 1,
+    'date': 1,
+    'time': 1,
+    'organization': 1,
+    'updatedAt': 1
+}
+
+ORGANIZATION_PROJECTION = {'_id': 1, 'name': 1, 'updatedAt': 1}
+
+# Fields whose changes matter to responses. Registrations save the event and
+# move updatedAt without touching any of these.
+SERVED_FIELDS = tuple(field for field in EVENT_PROJECTION if field != 'updatedAt')
+
+# Fields of a /recommend row, in response order. eventId is always included.
+RESPONSE_FIELDS = (
+    'eventId', 'title', 'organization', 'image', 'summary', 'description', 'type', 'subtype', 'location', 'date', 'time'
+)
+FIELD_PROFILES = {
+    'full': RESPONSE_FIELDS,
+    'compact': tuple(field for field in RESPONSE_FIELDS if field not in ('summary', 'description'))
+}
+
+
+def _served(event):
+    return {field: event.get(field) for field in SERVED_FIELDS}
+
+
+def _latest_update(documents):
+    timestamps = [document['updatedAt'] for document in documents if document.get('updatedAt') is not None]
+    return max(timestamps) if timestamps else None
+
+
+class EventCatalog:
+    """
+    In-memory copy of the events collection with organization names resolved.
+
+    load() reads both collections once. refresh() only asks for documents whose
+    updatedAt moved past the newest one already seen, and falls back to a full
+    load when the document counts show that something was deleted. The
+    version only moves when a served field changes, not on every save. Event dates
+    are parsed once per document change, for the recommender's date index, and
+    response rows are serialized once per event and field selection.
+    """
+
+    def __init__(self, events_collection, organizations_collection):
+        self.events_collection = events_collection
+        self.organizations_collection = organizations_collection
+        self.version = 0
+        self.loaded = False
+        self._events = {}
+        self._event_id_to_ref = {}
+        self._event_days = {}
+        self._organization_names = {}
+        self._fragments = {}
+        self._events_seen_at = None
+        self._organizations_seen_at = None
+        self._lock = threading.RLock()
+        self._poller = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._events)
+
+    def load(self):
+        events = list(self.events_collection.find({}, EVENT_PROJECTION))
+        organizations = list(self.organizations_collection.find({}, ORGANIZATION_PROJECTION))
+
+        events_by_ref = {str(event['_id']): event for event in events}
+        event_id_to_ref = {event['eventId']: event_ref for event_ref, event in events_by_ref.items()}
+        event_days = {event['eventId']: parse_event_date(event.get('date')) for event in events_by_ref.values()}
+        organization_names = {
+            str(organization['_id']): organization.get('name', 'N/A') for organization in organizations
+        }
+
+        with self._lock:
+            self._events = events_by_ref
+            self._event_id_to_ref = event_id_to_ref
+            self._event_days = event_days
+            self._organization_names = organization_names
+            self._fragments = {}
+            self._events_seen_at = _latest_update(events)
+            self._organizations_seen_at = _latest_update(organizations)
+            self.loaded = True
+            self.version += 1
+
+        logger.info(f"Event catalog loaded: {len(events)} events, {len(organizations)} organizations.")
+        return self.version
+
+    def refresh(self):
+        """Pulls changes since the last load or refresh. Returns True if anything changed."""
+        if not self.loaded:
+            self.load()
+            return True
+
+        events = list(self.events_collection.find(self._changed_since(self._events_seen_at), EVENT_PROJECTION))
+        organizations = list(self.organizations_collection.find(
+            self._changed_since(self._organizations_seen_at), ORGANIZATION_PROJECTION
+        ))
+
+        with self._lock:
+            changed = self._apply_organizations(organizations) + self._apply_events(events)
+
+        if self.events_collection.estimated_document_count() != len(self._events):
+            logger.info("Event count changed outside of updates. Reloading event catalog.")
+            self.load()
+            return True
+
+        if changed:
+            with self._lock:
+                self.version += 1
+            logger.info(f"Event catalog refreshed: {changed} documents changed.")
+        return bool(changed)
+
+    def start_polling(self, interval):
+        if self._poller is not None:
+            return self._poller
+
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing event catalog: {str(e)}")
+
+        self._stop.clear()
+        self._poller = threading.Thread(target=poll, name='event-catalog-poller', daemon=True)
+        self._poller.start()
+        return self._poller
+
+    def stop_polling(self):
+        self._stop.set()
+        self._poller = None
+
+    def event_id_for(self, event_ref):
+        event = self._events.get(str(event_ref))
+        return event['eventId'] if event else None
+
+    def ref_for(self, event_id):
+        return self._event_id_to_ref.get(event_id)
+
+    def event_days(self, event_id):
+        """(first day, last day) of an event as date ordinals, or None if it is unknown or undated."""
+        return self._event_days.get(event_id)
+
+    def organization_name(self, organization_ref):
+        return self._organization_names.get(str(organization_ref), 'N/A')
+
+    def get(self, event_id):
+        """Returns the /recommend payload for an eventId, or None if it is not in the catalog."""
+        event_ref = self._event_id_to_ref.get(event_id)
+        event = self._events.get(event_ref) if event_ref else None
+        if event is None:
+            return None
+        return {
+            'eventId': event.get('eventId', ''),
+            'title': event.get('title', ''),
+            'organization': {'name': self.organization_name(event.get('organization'))},
+            'image': event.get('image', ''),
+            'summary': event.get('summary', ''),
+            'description': event.get('description', ''),
+            'type': event.get('type', ''),
+            'subtype': event.get('subtype', ''),
+            'location': event.get('location', ''),
+            'date': event.get('date', ''),
+            'time': event.get('time', ''),
+        }
+
+    def fragment(self, event_id, fields=RESPONSE_FIELDS):
+        """
+        The /recommend row of an eventId restricted to fields, as a pre-serialized
+        JSON Fragment, or None if it is not in the catalog. Rows are cached until
+        the event or an organization name changes.
+        """
+        cached = self._fragments.get(event_id)
+        if cached is not None and fields in cached:
+            return cached[fields]
+        with self._lock:
+            row = self.get(event_id)
+            if row is None:
+                return None
+            serialized = fragment({field: row[field] for field in fields})
+            self._fragments.setdefault(event_id, {})[fields] = serialized
+            return serialized
+
+    @staticmethod
+    def _changed_since(seen_at):
+        return {'updatedAt': {'$gte': seen_at}} if seen_at is not None else {}
+
+    def _apply_events(self, events):
+        changed = 0
+        for event in events:
+            event_ref = str(event['_id'])
+            previous = self._events.get(event_ref)
+            updated_at = event.get('updatedAt')
+            if updated_at is not None and (self._events_seen_at is None or updated_at > self._events_seen_at):
+                self._events_seen_at = updated_at
+            if previous is not None and _served(previous) == _served(event):
+                continue
+            changed += 1
+            if previous is not None and self._event_id_to_ref.get(previous.get('eventId')) == event_ref:
+                del self._event_id_to_ref[previous['eventId']]
+                self._event_days.pop(previous['eventId'], None)
+                self._fragments.pop(previous['eventId'], None)
+            self._events[event_ref] = event
+            self._fragments.pop(event['eventId'], None)
+            self._event_id_to_ref[event['eventId']] = event_ref
+            self._event_days[event['eventId']] = parse_event_date(event.get('date'))
+        return changed
+
+    def _apply_organizations(self, organizations):
+        changed = 0
+        for organization in organizations:
+            organization_ref = str(organization['_id'])
+            name = organization.get('name', 'N/A')
+            if self._organization_names.get(organization_ref) != name:
+                self._organization_names[organization_ref] = name
+                changed += 1
+            updated_at = organization.get('updatedAt')
+            if updated_at is not None and (
+                self._organizations_seen_at is None or updated_at > self._organizations_seen_at
+            ):
+                self._organizations_seen_at = updated_at
+        if changed:
+            # Rows embed organization names; renames are rare, so drop them all.
+            self._fragments = {}
+        return changed
@@ -0,0 +1,32 @@
+import asyncio
+
+
+class RequestCoalescer:
+    """
+    Shares one in-flight computation between concurrent callers with the same
+    key. The first caller starts the computation; callers that arrive before
+    it finishes await the same future instead of starting their own. Nothing
+    is cached once the computation completes.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def __contains__(self, key):
+        return key in self._in_flight
+
+    async def run(self, key, factory):
+        """Returns the result of factory(), an async callable, shared by key."""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the computation the others are awaiting.
+        return await asyncio.shield(future)
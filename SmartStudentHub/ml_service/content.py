@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.float32
+
+
+def _index_path(vector_store_dir):
+    return os.path.join(vector_store_dir, 'hnswlib.index')
+
+
+def read_vector_store(vector_store_dir):
+    """
+    Reads the event embeddings that the backend's chatbot persists with
+    LangChain's HNSWLib store. Returns (event_ids, vectors) with unit-length
+    float32 rows; docstore.json maps each index label to its document.
+    """
+    if hnswlib is None:
+        raise ImportError("hnswlib is required to read the vector store.")
+
+    with open(os.path.join(vector_store_dir, 'args.json'), encoding='utf-8') as f:
+        args = json.load(f)
+    with open(os.path.join(vector_store_dir, 'docstore.json'), encoding='utf-8') as f:
+        docstore = json.load(f)
+
+    index = hnswlib.Index(space=args.get('space', 'cosine'), dim=int(args['numDimensions']))
+    index.load_index(_index_path(vector_store_dir))
+
+    labels = []
+    event_ids = []
+    for label, document in docstore:
+        event_id = document.get('metadata', {}).get('eventId')
+        if event_id is not None:
+            labels.append(int(label))
+            event_ids.append(str(event_id))
+
+    vectors = np.asarray(index.get_items(labels), dtype=EMBEDDING_DTYPE) if labels else \
+        np.zeros((0, int(args['numDimensions'])), dtype=EMBEDDING_DTYPE)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return event_ids, np.ascontiguousarray(vectors)
+
+
+class EventEmbeddings:
+    """Event embeddings keyed by eventId, loaded once from the vector store."""
+
+    def __init__(self, event_ids, vectors, source_mtime=None):
+        self.event_ids = list(event_ids)
+        self.event_id_to_row = {event_id: row for row, event_id in enumerate(self.event_ids)}
+        self.vectors = vectors
+        self.source_mtime = source_mtime
+
+    def __len__(self):
+        return len(self.event_ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @classmethod
+    def load(cls, vector_store_dir, cache_path=None, mmap=True):
+        """
+        Loads the embeddings, going through a .npy cache when cache_path is
+        set. The cache is rebuilt whenever hnswlib.index is newer than it and,
+        with mmap, is mapped read-only so worker processes share its pages.
+        """
+        source_mtime = os.path.getmtime(_index_path(vector_store_dir))
+        ids_path = f"{cache_path}.json" if cache_path else None
+
+        if cache_path and os.path.exists(cache_path) and os.path.exists(ids_path):
+            try:
+                with open(ids_path, encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('source_mtime') == source_mtime:
+                    vectors = np.load(cache_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+                    return cls(cached['event_ids'], vectors, source_mtime)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable embedding cache: {str(e)}")
+
+        event_ids, vectors = read_vector_store(vector_store_dir)
+        if cache_path:
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, vectors, allow_pickle=False)
+            os.replace(tmp_path, cache_path)
+            with open(f"{ids_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({'source_mtime': source_mtime, 'event_ids': event_ids}, f)
+            os.replace(f"{ids_path}.tmp", ids_path)
+            if mmap:
+                vectors = np.load(cache_path, mmap_mode='r', allow_pickle=False)
+        return cls(event_ids, vectors, source_mtime)
+
+    def is_stale(self, vector_store_dir):
+        try:
+            return os.path.getmtime(_index_path(vector_store_dir)) != self.source_mtime
+        except OSError:
+            return False
+
+    def align(self, event_ids):
+        """(len(event_ids), dim) array in the given column order; unknown events get zero rows."""
+        rows = np.fromiter(
+            (self.event_id_to_row.get(str(event_id), -1) for event_id in event_ids),
+            dtype=np.int64,
+            count=len(event_ids)
+        )
+        aligned = np.zeros((len(rows), self.dim), dtype=EMBEDDING_DTYPE)
+        known = rows >= 0
+        aligned[known] = self.vectors[rows[known]]
+        return aligned
+
+
+class ContentScorer:
+    """
+    Event embeddings aligned with the columns of one interaction matrix.
+
+    A user's profile is the normalized sum of the embeddings of the events
+    they registered for, and each event's content score is its cosine
+    similarity to that profile. Events nobody has registered for yet still
+    get a content score, which is what lets new events surface.
+    """
+
+    def __init__(self, embeddings, weight):
+        self.embeddings = embeddings
+        self.weight = weight
+
+    @property
+    def n_columns(self):
+        return self.embeddings.shape[0]
+
+    def extend(self, event_ids, embeddings=None):
+        """
+        A scorer with rows appended for columns added after this one was
+        built, aligned from embeddings (an EventEmbeddings). Without
+        embeddings, or for events they do not know, the rows are zero.
+        """
+        if not len(event_ids):
+            return self
+        if embeddings is not None and embeddings.dim == self.embeddings.shape[1]:
+            added = embeddings.align(event_ids)
+        else:
+            added = np.zeros((len(event_ids), self.embeddings.shape[1]), dtype=EMBEDDING_DTYPE)
+        return ContentScorer(np.concatenate([self.embeddings, added]), self.weight)
+
+    def scores(self, query_block):
+        """Dense (n_queries, n_columns) content scores for sparse query rows."""
+        query_block = query_block.tocsr()
+        if query_block.shape[1] > self.n_columns:
+            query_block = query_block[:, :self.n_columns]
+        profiles = np.asarray(query_block @ self.embeddings, dtype=EMBEDDING_DTYPE)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        np.divide(profiles, norms, out=profiles, where=norms > 0)
+        return profiles @ self.embeddings.T
+
+    def blend(self, query_block, collaborative):
+        """
+        Mixes collaborative scores, rescaled to [0, 1] per query, with
+        non-negative content scores: (1 - weight) * collaborative + weight * content.
+        Returns a dense (n_queries, n_columns) array.
+        """
+        if hasattr(collaborative, 'toarray'):
+            collaborative = collaborative.toarray()
+        collaborative = np.asarray(collaborative, dtype=EMBEDDING_DTYPE).reshape(query_block.shape[0], -1)
+        collaborative = collaborative[:, :self.n_columns]
+        peaks = collaborative.max(axis=1, keepdims=True) if collaborative.shape[1] else collaborative[:, :1]
+        np.divide(collaborative, peaks, out=collaborative, where=peaks > 0)
+
+        blended = self.scores(query_block)
+        np.maximum(blended, 0, out=blended)
+        blended *= self.weight
+        blended[:, :collaborative.shape[1]] += (1.0 - self.weight) * collaborative
+        return blended
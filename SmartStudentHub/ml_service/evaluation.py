@@ -0,0 +1,271 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import dotenv
+import numpy as np
+
+from item_similarity import item_scores, item_similarity
+from neighbors import index_from_env, synthetic_matrix
+from scoring import batch_neighbor_scores, top_n_rows
+
+logger = logging.getLogger(__name__)
+
+EVALUATION_MODES = ('user', 'item', 'popular')
+
+_worker_state = None
+
+
+def hold_out(matrix, users=None, random_state=0):
+    """
+    Leave-one-out split. Picks one registration of every user with at least
+    two, or of a random sample of users of that many, and removes it from the
+    matrix. Returns (training matrix, evaluated rows, held-out column per row).
+    """
+    rng = np.random.default_rng(random_state)
+    matrix = matrix.tocsr()
+    counts = np.diff(matrix.indptr)
+    rows = np.flatnonzero(counts >= 2)
+    if users is not None and users < len(rows):
+        rows = np.sort(rng.choice(rows, size=users, replace=False))
+
+    positions = matrix.indptr[rows] + rng.integers(0, counts[rows])
+    held_out = matrix.indices[positions].astype(np.int64)
+
+    train = matrix.astype(np.float32, copy=True)
+    train.data[positions] = 0
+    train.eliminate_zeros()
+    return train, rows, held_out
+
+
+def fit_mode(train, mode, top_m=50, workers=None):
+    """The model a mode scores with: a neighbor index, an item similarity matrix or event popularity."""
+    if mode == 'user':
+        return index_from_env().build(train)
+    if mode == 'item':
+        return item_similarity(train, top_m=top_m, workers=workers)
+    if mode == 'popular':
+        return np.asarray(train.sum(axis=0), dtype=np.float32).ravel()
+    raise ValueError(f"Unknown mode '{mode}'")
+
+
+def rank_rows(train, mode, model, rows, k, n_neighbors, content=None):
+    """Top-k columns, padded with -1, for training rows, scored the way /recommend/batch scores them."""
+    query_block = train[rows]
+    if mode == 'user':
+        distances, indices = model.kneighbors(query_block, n_neighbors=n_neighbors)
+        scores = batch_neighbor_scores(train, indices, distances, skip_rows=rows)
+    elif mode == 'item':
+        scores = item_scores(model, query_block)
+    else:
+        scores = np.broadcast_to(model, (len(rows), len(model)))
+    if content is not None:
+        scores = content.blend(query_block, scores)
+
+    columns = np.full((len(rows), k), -1, dtype=np.int64)
+    for i, ranked in enumerate(top_n_rows(scores, k, exclude=query_block)):
+        columns[i, :len(ranked)] = ranked
+    return columns
+
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+
+def _rank_chunk(start, end):
+    state = _worker_state
+    started = time.perf_counter()
+    columns = rank_rows(
+        state['train'], state['mode'], state['model'], state['rows'][start:end], state['k'], state['n_neighbors'],
+        state['content']
+    )
+    return start, columns, time.perf_counter() - started
+
+
+def rank_all(state, workers=1, chunk_size=1024):
+    """
+    rank_rows over every evaluated row, in chunks across a process pool.
+    Returns the (n_rows, k) column array and the scoring seconds summed over chunks.
+    """
+    rows = state['rows']
+    columns = np.full((len(rows), state['k']), -1, dtype=np.int64)
+    bounds = [(start, min(start + chunk_size, len(rows))) for start in range(0, len(rows), chunk_size)]
+    seconds = 0.0
+
+    if workers == 1 or len(bounds) <= 1:
+        _init_worker(state)
+        chunks = (_rank_chunk(start, end) for start, end in bounds)
+        for start, chunk_columns, chunk_seconds in chunks:
+            columns[start:start + len(chunk_columns)] = chunk_columns
+            seconds += chunk_seconds
+        return columns, seconds
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(state,)
+    ) as pool:
+        for start, chunk_columns, chunk_seconds in pool.map(_rank_chunk, *zip(*bounds)):
+            columns[start:start + len(chunk_columns)] = chunk_columns
+            seconds += chunk_seconds
+    return columns, seconds
+
+
+def ranking_metrics(columns, held_out, n_events, ks):
+    """hit_rate@k, ndcg@k and catalog coverage@k for each k, with one held-out column per row."""
+    matches = columns == held_out[:, None]
+    ranks = np.where(matches.any(axis=1), matches.argmax(axis=1), columns.shape[1])
+    metrics = {}
+    for k in ks:
+        hit = ranks < k
+        gains = np.where(hit, 1.0 / np.log2(ranks + 2.0), 0.0)
+        recommended = columns[:, :k]
+        metrics[k] = {
+            'hit_rate': float(hit.mean()) if len(hit) else 0.0,
+            'ndcg': float(gains.mean()) if len(gains) else 0.0,
+            'coverage': len(np.unique(recommended[recommended >= 0])) / float(n_events) if n_events else 0.0
+        }
+    return metrics
+
+
+def single_user_latency(state, sample=200, random_state=0):
+    """p50 / p99 milliseconds to score one user at a time, as /recommend does."""
+    if sample <= 0 or not len(state['rows']):
+        return None
+    rng = np.random.default_rng(random_state)
+    rows = rng.choice(state['rows'], size=min(sample, len(state['rows'])), replace=False)
+    seconds = []
+    for row in rows:
+        started = time.perf_counter()
+        rank_rows(state['train'], state['mode'], state['model'], np.asarray([row]), state['k'], state['n_neighbors'],
+                  state['content'])
+        seconds.append(time.perf_counter() - started)
+    milliseconds = np.asarray(seconds) * 1000
+    return {'p50_ms': float(np.percentile(milliseconds, 50)), 'p99_ms': float(np.percentile(milliseconds, 99))}
+
+
+def evaluate(matrix, modes=('user', 'item'), ks=(5, 10, 20), users=None, num_neighbors=20, top_m=50, content=None,
+             workers=None, chunk_size=1024, latency_sample=200, random_state=0):
+    """
+    Holds out one registration per evaluated user, fits every mode on what is
+    left and reports, per mode, the ranking metrics at each k together with
+    fit time, amortized per-user scoring time and single-user latency.
+    content is a ContentScorer aligned with the matrix columns, or None.
+    """
+    workers = workers or os.cpu_count() or 1
+    k = max(ks)
+    train, rows, held_out = hold_out(matrix, users, random_state)
+    report = {
+        'users': int(matrix.shape[0]),
+        'events': int(matrix.shape[1]),
+        'evaluated_users': int(len(rows)),
+        'ks': list(ks),
+        'workers': workers,
+        'modes': {}
+    }
+
+    for mode in modes:
+        started = time.perf_counter()
+        model = fit_mode(train, mode, top_m=top_m, workers=workers)
+        fit_seconds = time.perf_counter() - started
+
+        state = {
+            'train': train,
+            'mode': mode,
+            'model': model,
+            'rows': rows,
+            'k': k,
+            'n_neighbors': min(max(k + 1, num_neighbors), train.shape[0]),
+            'content': content if mode != 'popular' else None
+        }
+        started = time.perf_counter()
+        columns, scoring_seconds = rank_all(state, workers, chunk_size)
+        wall_seconds = time.perf_counter() - started
+
+        report['modes'][mode] = {
+            'metrics': {str(at): values for at, values in ranking_metrics(columns, held_out, train.shape[1], ks).items()},
+            'fit_seconds': fit_seconds,
+            'scoring_seconds': wall_seconds,
+            'batched_ms_per_user': 1000 * scoring_seconds / max(len(rows), 1),
+            'single_user': single_user_latency(state, latency_sample, random_state)
+        }
+        logger.info(f"Evaluated mode {mode} in {fit_seconds + wall_seconds:.1f}s.")
+    return report
+
+
+def main():
+    dotenv.load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Leave-one-out evaluation of the recommender modes: hit rate, NDCG and coverage at k."
+    )
+    parser.add_argument('--model-dir', help="Model artifact to evaluate. Defaults to synthetic data.")
+    parser.add_argument('--users', type=int, default=100000, help="Synthetic users.")
+    parser.add_argument('--events', type=int, default=5000, help="Synthetic events.")
+    parser.add_argument('--sample', type=int, help="Evaluate a random sample of this many users.")
+    parser.add_argument('--modes', nargs='+', choices=EVALUATION_MODES, default=['user', 'item', 'popular'])
+    parser.add_argument('--k', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--workers', type=int, default=0, help="Scoring processes. 0 uses every CPU.")
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--latency-sample', type=int, default=200, help="Users timed one at a time per mode.")
+    parser.add_argument('--vector-store', help="Blend content scores from this vector store, as CONTENT_WEIGHT does.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    event_ids = None
+    if args.model_dir:
+        from artifact import load_artifact
+        artifact = load_artifact(args.model_dir)
+        matrix, event_ids = artifact['matrix'], artifact['event_ids']
+    else:
+        matrix = synthetic_matrix(args.users, args.events, random_state=args.seed)
+
+    content = None
+    content_weight = float(os.getenv('CONTENT_WEIGHT', '0.3'))
+    if args.vector_store and content_weight > 0:
+        if event_ids is None:
+            parser.error("--vector-store needs --model-dir, whose event ids align the embeddings.")
+        from content import ContentScorer, EventEmbeddings
+        content = ContentScorer(EventEmbeddings.load(args.vector_store).align(event_ids), content_weight)
+
+    report = evaluate(
+        matrix,
+        modes=args.modes,
+        ks=sorted(set(args.k)),
+        users=args.sample,
+        num_neighbors=int(os.getenv('NUM_NEIGHBORS', '20')),
+        top_m=int(os.getenv('ITEM_SIMILARITY_TOP_M', '50')),
+        content=content,
+        workers=args.workers or None,
+        chunk_size=args.chunk_size,
+        latency_sample=args.latency_sample,
+        random_state=args.seed
+    )
+    report['neighbor_index'] = index_from_env().params
+    report['content_weight'] = content_weight if content is not None else 0.0
+
+    print(f"{report['evaluated_users']} of {report['users']} users, {report['events']} events, "
+          f"{report['workers']} workers")
+    for mode, result in report['modes'].items():
+        single = result['single_user']
+        latency = f" single p50={single['p50_ms']:.2f}ms p99={single['p99_ms']:.2f}ms" if single else ''
+        print(f"  {mode:<7} fit={result['fit_seconds']:.1f}s score={result['scoring_seconds']:.1f}s "
+              f"batched={result['batched_ms_per_user']:.3f}ms/user{latency}")
+        for at, values in result['metrics'].items():
+            print(f"    @{at:<3} hit_rate={values['hit_rate']:.4f} ndcg={values['ndcg']:.4f} "
+                  f"coverage={values['coverage']:.4f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
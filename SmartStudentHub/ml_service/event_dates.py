@@ -0,0 +1,124 @@
+import datetime
+import re
+
+import numpy as np
+
+DAY_DTYPE = np.int32
+# Undated events span every window, so they are never masked out.
+NO_START = np.iinfo(DAY_DTYPE).min
+NO_END = np.iinfo(DAY_DTYPE).max
+
+MONTHS = {
+    name: number for number, name in enumerate(
+        ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1
+    )
+}
+
+NUMERIC_DATE = re.compile(r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})')
+ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+# "30 Mar 2025", and the scraper's category-page ranges "28 Mar - 02 Apr 2025".
+NAMED_DATE = re.compile(r'(\d{1,2})\s+([A-Za-z]{3})[A-Za-z]*(?:\s+(\d{4}))?')
+
+
+def _ordinal(year, month, day):
+    try:
+        return datetime.date(int(year), int(month), int(day)).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_event_date(value):
+    """
+    Parses an event's date field into (first day, last day) as date ordinals,
+    or None if it cannot be read. Handles what scrape_hku_events.py and the
+    backend produce: "15-05-2025", "01-05-2025 to 03-05-2025", "30 Mar 2025"
+    and "28 Mar - 02 Apr 2025", plus date and datetime values.
+    """
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.toordinal(), value.toordinal()
+    if not isinstance(value, str) or not value:
+        return None
+
+    days = [_ordinal(year, month, day) for day, month, year in NUMERIC_DATE.findall(value)]
+    if not days:
+        named = NAMED_DATE.findall(value)
+        # A range names the year once, at the end.
+        year = next((explicit for _, _, explicit in reversed(named) if explicit), None)
+        if year is None:
+            return None
+        days = [_ordinal(explicit or year, MONTHS.get(month.lower()), day) for day, month, explicit in named]
+        if len(days) == 2 and None not in days and days[0] > days[1] and not named[0][2]:
+            # "28 Dec - 02 Jan 2026" starts in the previous year.
+            days[0] = _ordinal(int(year) - 1, MONTHS[named[0][1].lower()], named[0][0])
+    days = [day for day in days if day is not None]
+    if not days:
+        return None
+    return min(days), max(days)
+
+
+def parse_request_date(value):
+    """Date ordinal for a request's from/to value ("DD-MM-YYYY" or "YYYY-MM-DD"); raises ValueError."""
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date: {value!r}")
+    match = ISO_DATE.match(value.strip())
+    if match:
+        day = _ordinal(*match.groups())
+    else:
+        match = NUMERIC_DATE.fullmatch(value.strip())
+        day = _ordinal(match.group(3), match.group(2), match.group(1)) if match else None
+    if day is None:
+        raise ValueError(f"Invalid date: {value!r}")
+    return day
+
+
+def today():
+    return datetime.date.today().toordinal()
+
+
+class EventDateIndex:
+    """
+    First and last day of every event column, as int32 date ordinals, so a
+    date window turns into one vectorized comparison over all columns.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.key = None
+        self._last = (None, None)
+
+    def __len__(self):
+        return len(self.start)
+
+    @classmethod
+    def build(cls, event_ids, days_for):
+        """days_for(event_id) returns (first day, last day) or None, as EventCatalog.event_days does."""
+        start = np.full(len(event_ids), NO_START, dtype=DAY_DTYPE)
+        end = np.full(len(event_ids), NO_END, dtype=DAY_DTYPE)
+        for j, event_id in enumerate(event_ids):
+            days = days_for(event_id)
+            if days is not None:
+                start[j], end[j] = days
+        return cls(start, end)
+
+    def mask(self, window):
+        """
+        Boolean array of the columns whose dates overlap window, a (from, to)
+        pair of date ordinals where either side may be None. None means no window.
+        """
+        if window is None or window == (None, None):
+            return None
+        last_window, last_mask = self._last
+        if window == last_window:
+            return last_mask
+
+        from_day, to_day = window
+        mask = np.ones(len(self.start), dtype=bool)
+        if from_day is not None:
+            mask &= self.end >= from_day
+        if to_day is not None:
+            mask &= self.start <= to_day
+        self._last = (window, mask)
+        return mask
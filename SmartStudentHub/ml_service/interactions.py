@@ -0,0 +1,252 @@
+import threading
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+INTERACTION_DTYPE = np.float32
+INDEX_DTYPE = np.int32
+
+
+def build_interaction_matrix(registered_events_rows, event_ref_to_index, n_events):
+    """
+    Builds a CSR user x event matrix in a single pass.
+
+    registered_events_rows yields one list of event ObjectIds per user, in the
+    same order as the user ids. event_ref_to_index maps str(ObjectId) to the
+    event's column. References to unknown events, or to columns past n_events,
+    are skipped.
+    """
+    indptr = [0]
+    indices = []
+
+    for registered_events in registered_events_rows:
+        columns = set()
+        for event_ref in registered_events or []:
+            j = event_ref_to_index.get(str(event_ref))
+            if j is not None and j < n_events:
+                columns.add(j)
+        indices.extend(sorted(columns))
+        indptr.append(len(indices))
+
+    indices = np.asarray(indices, dtype=INDEX_DTYPE)
+    indptr = np.asarray(indptr, dtype=INDEX_DTYPE)
+    data = np.ones(len(indices), dtype=INTERACTION_DTYPE)
+
+    return csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_events))
+
+
+def build_user_vector(registered_events, event_ref_to_index, n_events):
+    return build_interaction_matrix([registered_events], event_ref_to_index, n_events)
+
+
+class InteractionMatrixBuilder:
+    """
+    Appends users to a CSR matrix batch by batch. Each batch is turned into
+    int32 arrays straight away, so only the current batch is ever held as
+    Python objects; build() concatenates the arrays once at the end.
+    """
+
+    def __init__(self, event_ref_to_index, n_events):
+        self.event_ref_to_index = event_ref_to_index
+        self.n_events = n_events
+        self.user_ids = []
+        self._indices = []
+        self._row_lengths = []
+
+    def add_users(self, users):
+        """users is an iterable of (user_id, registered event ObjectIds) pairs."""
+        indices = []
+        row_lengths = []
+        for user_id, registered_events in users:
+            columns = set()
+            for event_ref in registered_events or []:
+                j = self.event_ref_to_index.get(str(event_ref))
+                if j is not None and j < self.n_events:
+                    columns.add(j)
+            indices.extend(sorted(columns))
+            row_lengths.append(len(columns))
+            self.user_ids.append(user_id)
+        self._indices.append(np.asarray(indices, dtype=INDEX_DTYPE))
+        self._row_lengths.append(np.asarray(row_lengths, dtype=INDEX_DTYPE))
+
+    def build(self):
+        indices = np.concatenate(self._indices) if self._indices else np.empty(0, dtype=INDEX_DTYPE)
+        row_lengths = np.concatenate(self._row_lengths) if self._row_lengths else np.empty(0, dtype=INDEX_DTYPE)
+        self._indices = []
+        self._row_lengths = []
+
+        indptr = np.zeros(len(row_lengths) + 1, dtype=INDEX_DTYPE)
+        np.cumsum(row_lengths, out=indptr[1:])
+        data = np.ones(len(indices), dtype=INTERACTION_DTYPE)
+        return csr_matrix((data, indices, indptr), shape=(len(row_lengths), self.n_events))
+
+
+class InteractionStore:
+    """
+    Mutable view over a trained interaction matrix.
+
+    Deltas are kept as per-row column sets on top of the last compacted CSR
+    matrix and folded back into it by compact(). New users and events extend
+    the id maps immediately and get their row/column on the next compaction.
+    """
+
+    def __init__(self, matrix, user_ids, event_ids, event_ref_to_index_map):
+        self.matrix = matrix.tocsr()
+        self.user_ids = list(user_ids)
+        self.user_id_to_index_map = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+        self.event_ids = list(event_ids)
+        self.event_id_to_index_map = {event_id: idx for idx, event_id in enumerate(self.event_ids)}
+        self.event_ref_to_index_map = dict(event_ref_to_index_map)
+        self.pending = 0
+        self.last_compaction = time.monotonic()
+        self._dirty_rows = {}
+        self._lock = threading.RLock()
+
+    @property
+    def shape(self):
+        return len(self.user_ids), len(self.event_ids)
+
+    def add_user(self, user_id):
+        with self._lock:
+            idx = self.user_id_to_index_map.get(user_id)
+            if idx is None:
+                idx = len(self.user_ids)
+                self.user_ids.append(user_id)
+                self.user_id_to_index_map[user_id] = idx
+                self._dirty_rows[idx] = set()
+                self.pending += 1
+            return idx
+
+    def add_event(self, event_ref, event_id):
+        with self._lock:
+            idx = self.event_ref_to_index_map.get(event_ref)
+            if idx is None:
+                idx = len(self.event_ids)
+                self.event_ids.append(event_id)
+                self.event_ref_to_index_map[event_ref] = idx
+                self.event_id_to_index_map.setdefault(event_id, idx)
+                self.pending += 1
+            return idx
+
+    def resolve_event(self, event_ref=None, event_id=None):
+        if event_ref is not None:
+            idx = self.event_ref_to_index_map.get(str(event_ref))
+            if idx is not None:
+                return idx
+        if event_id is not None:
+            return self.event_id_to_index_map.get(str(event_id))
+        return None
+
+    def user_columns(self, row):
+        with self._lock:
+            columns = self._dirty_rows.get(row)
+            if columns is not None:
+                return set(columns)
+            if row < self.matrix.shape[0]:
+                start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+                return set(self.matrix.indices[start:end].tolist())
+            return set()
+
+    def set_interaction(self, user_id, column, value):
+        with self._lock:
+            row = self.add_user(user_id)
+            columns = self._dirty_rows.get(row)
+            if columns is None:
+                columns = self.user_columns(row)
+                self._dirty_rows[row] = columns
+            if value:
+                columns.add(column)
+            else:
+                columns.discard(column)
+            self.pending += 1
+            return row
+
+    def apply(self, delta):
+        """
+        Applies one delta dict and returns None, or the reason it was skipped.
+
+        Supported types: register, unregister, new_event, new_user.
+        """
+        delta_type = delta.get('type')
+        user_id = delta.get('user_id')
+        event_ref = delta.get('event_ref')
+        event_id = delta.get('event_id')
+
+        if delta_type == 'new_user':
+            if not user_id:
+                return "user_id is required."
+            self.add_user(str(user_id))
+            return None
+
+        if delta_type == 'new_event':
+            if not event_ref or event_id is None:
+                return "event_ref and event_id are required."
+            self.add_event(str(event_ref), str(event_id))
+            return None
+
+        if delta_type in ('register', 'unregister'):
+            if not user_id:
+                return "user_id is required."
+            with self._lock:
+                column = self.resolve_event(event_ref, event_id)
+                if column is None:
+                    if not event_ref or event_id is None:
+                        return "Unknown event."
+                    column = self.add_event(str(event_ref), str(event_id))
+                self.set_interaction(str(user_id), column, delta_type == 'register')
+            return None
+
+        return f"Unsupported interaction type: {delta_type}"
+
+    def freeze(self, n_users, n_events):
+        """
+        Copies of the id lists and maps as they are now, for a snapshot of an
+        n_users x n_events matrix. Later deltas only extend the store's own.
+        Returns (user_ids, event_ids, user_id_to_index_map,
+        event_id_to_index_map, event_ref_to_index_map).
+        """
+        with self._lock:
+            return (
+                self.user_ids[:n_users],
+                self.event_ids[:n_events],
+                dict(self.user_id_to_index_map),
+                dict(self.event_id_to_index_map),
+                dict(self.event_ref_to_index_map)
+            )
+
+    def needs_compaction(self, max_pending, max_age):
+        if not self.pending:
+            return False
+        return self.pending >= max_pending or time.monotonic() - self.last_compaction >= max_age
+
+    def compact(self):
+        """Folds pending deltas into a new CSR matrix. Returns it and the rows that changed."""
+        with self._lock:
+            n_users, n_events = self.shape
+            base = self.matrix.tocoo()
+            dirty_rows = self._dirty_rows
+
+            keep = np.ones(base.row.shape[0], dtype=bool)
+            if dirty_rows:
+                dirty = np.fromiter(dirty_rows.keys(), dtype=INDEX_DTYPE, count=len(dirty_rows))
+                keep = ~np.isin(base.row, dirty)
+
+            overlay_rows = []
+            overlay_cols = []
+            for row, columns in dirty_rows.items():
+                overlay_rows.extend([row] * len(columns))
+                overlay_cols.extend(columns)
+
+            rows = np.concatenate([base.row[keep], np.asarray(overlay_rows, dtype=INDEX_DTYPE)])
+            cols = np.concatenate([base.col[keep], np.asarray(overlay_cols, dtype=INDEX_DTYPE)])
+            data = np.ones(len(rows), dtype=INTERACTION_DTYPE)
+
+            matrix = csr_matrix((data, (rows, cols)), shape=(n_users, n_events))
+            matrix.sort_indices()
+
+            self.matrix = matrix
+            self._dirty_rows = {}
+            self.pending = 0
+            self.last_compaction = time.monotonic()
+            return matrix, np.sort(np.fromiter(dirty_rows.keys(), dtype=INDEX_DTYPE, count=len(dirty_rows)))
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from interactions import INDEX_DTYPE, INTERACTION_DTYPE
+
+_worker_event_rows = None
+_worker_norms = None
+
+
+def _init_worker(event_rows, norms):
+    global _worker_event_rows, _worker_norms
+    _worker_event_rows = event_rows
+    _worker_norms = norms
+
+
+def compute_similarity_rows(event_rows, norms, start, end, top_m):
+    """
+    Cosine co-registration similarity of events [start, end) against every
+    event, keeping the top_m most similar other events per row.
+    """
+    co_registrations = (event_rows[start:end] @ event_rows.T).tocsr()
+    co_registrations.sum_duplicates()
+
+    row_lengths = np.diff(co_registrations.indptr)
+    rows = np.repeat(np.arange(start, end), row_lengths)
+    columns = co_registrations.indices
+    denominators = norms[rows] * norms[columns]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(denominators > 0, co_registrations.data / denominators, 0).astype(INTERACTION_DTYPE)
+    values[columns == rows] = 0
+
+    indptr = [0]
+    kept_columns = []
+    kept_values = []
+    for i in range(end - start):
+        row_start, row_end = co_registrations.indptr[i], co_registrations.indptr[i + 1]
+        row_columns, row_values = columns[row_start:row_end], values[row_start:row_end]
+        positive = row_values > 0
+        row_columns, row_values = row_columns[positive], row_values[positive]
+        if len(row_columns) > top_m:
+            best = np.argpartition(-row_values, top_m - 1)[:top_m]
+            row_columns, row_values = row_columns[best], row_values[best]
+        kept_columns.append(row_columns)
+        kept_values.append(row_values)
+        indptr.append(indptr[-1] + len(row_columns))
+
+    return (
+        start,
+        np.asarray(indptr, dtype=np.int64),
+        np.concatenate(kept_columns).astype(INDEX_DTYPE) if kept_columns else np.empty(0, dtype=INDEX_DTYPE),
+        np.concatenate(kept_values).astype(INTERACTION_DTYPE) if kept_values else np.empty(0, dtype=INTERACTION_DTYPE)
+    )
+
+
+def _compute_chunk(start, end, top_m):
+    return compute_similarity_rows(_worker_event_rows, _worker_norms, start, end, top_m)
+
+
+def item_similarity(matrix, top_m=50, workers=None, chunk_size=512):
+    """
+    Builds the sparse (n_events, n_events) item-item similarity matrix of a
+    user x event interaction matrix. Each row holds at most top_m entries and
+    the diagonal is empty. Event chunks run in a process pool when there is
+    more than one chunk and more than one worker.
+    """
+    event_rows = matrix.T.tocsr().astype(INTERACTION_DTYPE)
+    n_events = event_rows.shape[0]
+    norms = np.sqrt(np.asarray(event_rows.multiply(event_rows).sum(axis=1), dtype=np.float32).ravel())
+
+    bounds = [(start, min(start + chunk_size, n_events)) for start in range(0, n_events, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(bounds) <= 1:
+        chunks = [compute_similarity_rows(event_rows, norms, start, end, top_m) for start, end in bounds]
+    else:
+        # spawn, not fork: this runs on a background thread of a threaded server.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(event_rows, norms)
+        ) as pool:
+            futures = [pool.submit(_compute_chunk, start, end, top_m) for start, end in bounds]
+            chunks = [future.result() for future in futures]
+
+    indptr = [np.zeros(1, dtype=np.int64)]
+    offset = 0
+    for _, chunk_indptr, _, _ in chunks:
+        indptr.append(chunk_indptr[1:] + offset)
+        offset += chunk_indptr[-1]
+
+    return csr_matrix(
+        (
+            np.concatenate([chunk[3] for chunk in chunks]) if chunks else np.empty(0, dtype=INTERACTION_DTYPE),
+            np.concatenate([chunk[2] for chunk in chunks]) if chunks else np.empty(0, dtype=INDEX_DTYPE),
+            np.concatenate(indptr)
+        ),
+        shape=(n_events, n_events)
+    )
+
+
+def item_scores(similarity, query_block):
+    """
+    Scores events for each query row as the sum of the similarity rows of the
+    events it registered for. Columns added after the similarity matrix was
+    built carry no similarity yet and are ignored.
+    """
+    n_events = similarity.shape[0]
+    n_columns = query_block.shape[1]
+    query_block = query_block.tocsr()
+    if n_columns > n_events:
+        query_block = query_block[:, :n_events]
+    scores = (query_block @ similarity).tocsr()
+    if n_columns > n_events:
+        scores.resize(scores.shape[0], n_columns)
+    return scores
+
+
+def pad_similarity(similarity, n_events):
+    """The similarity matrix grown to n_events square, with no similarities for the added events."""
+    if similarity.shape[0] >= n_events:
+        return similarity
+    indptr = np.concatenate([
+        similarity.indptr,
+        np.full(n_events - similarity.shape[0], similarity.indptr[-1], dtype=similarity.indptr.dtype)
+    ])
+    return csr_matrix((similarity.data, similarity.indices, indptr), shape=(n_events, n_events), copy=False)
+
+
+def save_similarity(directory, similarity):
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, 'indptr.npy'), similarity.indptr, allow_pickle=False)
+    np.save(os.path.join(directory, 'indices.npy'), similarity.indices, allow_pickle=False)
+    np.save(os.path.join(directory, 'data.npy'), similarity.data, allow_pickle=False)
+
+
+def load_similarity(directory, n_events, mmap=True):
+    mmap_mode = 'r' if mmap else None
+    return csr_matrix(
+        (
+            np.load(os.path.join(directory, 'data.npy'), mmap_mode=mmap_mode, allow_pickle=False),
+            np.load(os.path.join(directory, 'indices.npy'), mmap_mode=mmap_mode, allow_pickle=False),
+            np.load(os.path.join(directory, 'indptr.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        ),
+        shape=(n_events, n_events),
+        copy=False
+    )
@@ -0,0 +1,247 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from neighbors import BruteForceIndex
+from scoring import batch_neighbor_scores, top_n_rows
+
+logger = logging.getLogger(__name__)
+
+_worker_matrix = None
+_worker_model = None
+_worker_content = None
+
+
+def _init_worker(matrix, index, content):
+    global _worker_matrix, _worker_model, _worker_content
+    _worker_matrix = matrix
+    _worker_model = index
+    _worker_content = content
+
+
+def top_k_for_rows(matrix, model, rows, k, n_neighbors, content=None):
+    """
+    Top-k columns and scores for the given matrix rows, padded with -1 / 0.
+    With a ContentScorer the neighbor scores are blended with content scores.
+    """
+    query_block = matrix[rows]
+    distances, indices = model.kneighbors(query_block, n_neighbors=n_neighbors)
+    scores = batch_neighbor_scores(matrix, indices, distances, skip_rows=rows)
+    if content is not None:
+        scores = content.blend(query_block, scores)
+
+    columns = np.full((len(rows), k), -1, dtype=np.int32)
+    values = np.zeros((len(rows), k), dtype=np.float32)
+    for i, ranked in enumerate(top_n_rows(scores, k, exclude=query_block)):
+        columns[i, :len(ranked)] = ranked
+        if len(ranked):
+            values[i, :len(ranked)] = scores[i, ranked] if content is not None else scores[i, ranked].toarray().ravel()
+    return columns, values
+
+
+def compute_top_k(matrix, model, start, end, k, n_neighbors, content=None):
+    """top_k_for_rows for matrix rows [start, end); returns start with the columns and scores."""
+    columns, values = top_k_for_rows(matrix, model, np.arange(start, end), k, n_neighbors, content)
+    return start, columns, values
+
+
+def _compute_chunk(start, end, k, n_neighbors):
+    return compute_top_k(_worker_matrix, _worker_model, start, end, k, n_neighbors, _worker_content)
+
+
+class MaterializedRecommendations:
+    """
+    Precomputed top-k event columns for every user of a trained model.
+
+    columns and scores are (n_users, k) arrays aligned with user_ids; unused
+    slots hold -1. Users whose interactions changed after the snapshot was
+    built are marked stale and skipped by lookup().
+    """
+
+    def __init__(self, user_ids, columns, scores, matrix_shape, matrix_nnz, created_at=None):
+        self.user_ids = list(user_ids)
+        self.user_id_to_index_map = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+        self.columns = columns
+        self.scores = scores
+        self.matrix_shape = tuple(matrix_shape)
+        self.matrix_nnz = int(matrix_nnz)
+        self.created_at = created_at if created_at is not None else time.time()
+        self.stale_user_ids = {}
+        self.generation = 0
+
+    @property
+    def k(self):
+        return self.columns.shape[1]
+
+    def matches(self, matrix):
+        return self.matrix_shape == tuple(matrix.shape) and self.matrix_nnz == matrix.nnz
+
+    def mark_stale(self, user_id):
+        self.stale_user_ids[user_id] = time.time()
+
+    def inherit_stale(self, previous):
+        """Keeps the stale marks of previous that were made after this snapshot started building."""
+        for user_id, marked_at in list(previous.stale_user_ids.items()):
+            if marked_at >= self.created_at:
+                self.stale_user_ids[user_id] = marked_at
+
+    def lookup(self, user_id, n, mask=None):
+        """
+        Returns up to n ranked columns, or None when the user must be recomputed.
+        Columns that are False in mask are skipped; if that leaves fewer than n
+        of the k stored ones, the user is recomputed too.
+        """
+        if n > self.k or user_id in self.stale_user_ids:
+            return None
+        idx = self.user_id_to_index_map.get(user_id)
+        if idx is None:
+            return None
+        if mask is None:
+            row = self.columns[idx, :n]
+            return row[row >= 0]
+
+        row = self.columns[idx]
+        row = row[row >= 0]
+        complete = len(row) < self.k
+        row = row[mask[row]]
+        if len(row) < n and not complete:
+            return None
+        return row[:n]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                user_ids=np.asarray(self.user_ids, dtype=str),
+                columns=self.columns,
+                scores=self.scores,
+                matrix_shape=np.asarray(self.matrix_shape, dtype=np.int64),
+                matrix_nnz=np.int64(self.matrix_nnz),
+                created_at=np.float64(self.created_at)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['user_ids'].tolist(),
+                data['columns'],
+                data['scores'],
+                data['matrix_shape'].tolist(),
+                int(data['matrix_nnz']),
+                float(data['created_at'])
+            )
+
+
+def materialize(matrix, user_ids, k, n_neighbors, index=None, workers=None, chunk_size=2048, content=None):
+    """
+    Computes top-k recommendations for every row of matrix, in chunks across a
+    process pool. index is the snapshot's neighbor index; exact brute-force
+    search is used when it is omitted. content is the snapshot's ContentScorer.
+    """
+    started_at = time.time()
+    n_users = matrix.shape[0]
+    n_neighbors = min(n_neighbors, n_users)
+    columns = np.full((n_users, k), -1, dtype=np.int32)
+    scores = np.zeros((n_users, k), dtype=np.float32)
+
+    if n_neighbors >= 2:
+        bounds = [(start, min(start + chunk_size, n_users)) for start in range(0, n_users, chunk_size)]
+        workers = workers or os.cpu_count() or 1
+
+        if index is None:
+            index = BruteForceIndex().build(matrix)
+
+        if workers == 1 or len(bounds) == 1:
+            chunks = (compute_top_k(matrix, index, start, end, k, n_neighbors, content) for start, end in bounds)
+            for start, chunk_columns, chunk_scores in chunks:
+                columns[start:start + len(chunk_columns)] = chunk_columns
+                scores[start:start + len(chunk_scores)] = chunk_scores
+        else:
+            # spawn, not fork: this runs on a background thread of a threaded server.
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(matrix, index, content)
+            ) as pool:
+                futures = [pool.submit(_compute_chunk, start, end, k, n_neighbors) for start, end in bounds]
+                for future in futures:
+                    start, chunk_columns, chunk_scores = future.result()
+                    columns[start:start + len(chunk_columns)] = chunk_columns
+                    scores[start:start + len(chunk_scores)] = chunk_scores
+
+    return MaterializedRecommendations(user_ids[:n_users], columns, scores, matrix.shape, matrix.nnz, started_at)
+
+
+def rematerialize(materialized, matrix, user_ids, rows, n_neighbors, index, chunk_size=2048, content=None):
+    """
+    A copy of materialized brought up to date for the given rows of matrix,
+    such as the ones a compaction changed; rows past its end belong to new
+    users and are computed too. Every other row keeps its recommendations.
+    The copy has no stale marks, so callers must fold in every delta marked
+    so far first. materialized itself is left untouched for readers.
+    """
+    n_users = matrix.shape[0]
+    n_previous = min(len(materialized.user_ids), n_users)
+    columns = np.full((n_users, materialized.k), -1, dtype=np.int32)
+    scores = np.zeros((n_users, materialized.k), dtype=np.float32)
+    columns[:n_previous] = materialized.columns[:n_previous]
+    scores[:n_previous] = materialized.scores[:n_previous]
+
+    rows = np.union1d(np.asarray(rows, dtype=np.int64), np.arange(n_previous, n_users, dtype=np.int64))
+    n_neighbors = min(n_neighbors, n_users)
+    if n_neighbors >= 2:
+        for start in range(0, len(rows), chunk_size):
+            chunk_rows = rows[start:start + chunk_size]
+            columns[chunk_rows], scores[chunk_rows] = top_k_for_rows(
+                matrix, index, chunk_rows, materialized.k, n_neighbors, content
+            )
+
+    refreshed = MaterializedRecommendations(user_ids[:n_users], columns, scores, matrix.shape, matrix.nnz)
+    refreshed.generation = materialized.generation
+    return refreshed
+
+
+class MaterializedRefresher:
+    """Rebuilds the materialized store on a background thread, one build at a time."""
+
+    def __init__(self, build, on_ready):
+        self._build = build
+        self._on_ready = on_ready
+        self._lock = threading.Lock()
+        self._running = False
+        self._requested = False
+
+    def request(self):
+        with self._lock:
+            self._requested = True
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._run, name='materialized-refresh', daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._requested:
+                    self._running = False
+                    return
+                self._requested = False
+            try:
+                started = time.perf_counter()
+                store = self._build()
+                if store is not None:
+                    self._on_ready(store)
+                    logger.info(
+                        f"Materialized recommendations for {len(store.user_ids)} users "
+                        f"in {time.perf_counter() - started:.2f}s."
+                    )
+            except Exception as e:
+                logger.error(f"Error materializing recommendations: {str(e)}")
@@ -1,14 +1,29 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from pymongo import MongoClient
-from sklearn.neighbors import NearestNeighbors
-import numpy as np
-import pickle
 import os
 from bson import ObjectId
 import dotenv
 import logging
+import threading
+import time
+
+from artifact import ArtifactError, load_artifact, save_artifact
+from catalog import FIELD_PROFILES, RESPONSE_FIELDS, EventCatalog
+from content import ContentScorer, EventEmbeddings
+from event_dates import EventDateIndex, parse_request_date, today
+from interactions import InteractionStore, build_interaction_matrix, build_user_vector
+from item_similarity import item_scores, item_similarity, load_similarity, pad_similarity, save_similarity
+from materialized import MaterializedRecommendations, MaterializedRefresher, materialize, rematerialize
+from metrics import CONTENT_TYPE, TRAINING_BUCKETS, Counter, Gauge, Histogram, StageTimer, registry
+from model_snapshot import ModelSnapshot
+from neighbors import index_from_env, load_index
+from result_cache import ResultCache, etag_for, etag_matches, fingerprint
+from retrain import RetrainWorker
+from scoring import batch_neighbor_scores, neighbor_scores, top_n, top_n_rows
+from serialization import dumps
+from training_data import MongoTrainingSource, SnapshotTrainingSource, load_training_data
 
 app = Flask(__name__)
 CORS(app)
@@ -20,316 +35,1088 @@ dotenv.load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'test')
-client = MongoClient(MONGO_URI)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE)
 db = client[DATABASE_NAME]
 events_collection = db['events']
 users_collection = db['users']
 organizations_collection = db['organizations']
 
-MODEL_PATH = 'knn_model.pkl'
+MODEL_DIR = os.getenv('MODEL_DIR', 'model')
+NEIGHBOR_INDEX_DIR = 'neighbor_index'
+ITEM_SIMILARITY_DIR = 'item_similarity'
+MODEL_VERIFY_CHECKSUMS = os.getenv('MODEL_VERIFY_CHECKSUMS', 'true').lower() == 'true'
+COMPACT_EVERY = int(os.getenv('INTERACTIONS_COMPACT_EVERY', '100'))
+COMPACT_INTERVAL = float(os.getenv('INTERACTIONS_COMPACT_INTERVAL', '60'))
+NUM_NEIGHBORS = int(os.getenv('NUM_NEIGHBORS', '20'))
+RECOMMENDER_MODES = ('user', 'item')
+RECOMMENDER_MODE = os.getenv('RECOMMENDER_MODE', 'user').lower()
+ITEM_SIMILARITY_TOP_M = int(os.getenv('ITEM_SIMILARITY_TOP_M', '50'))
+ITEM_SIMILARITY_WORKERS = int(os.getenv('ITEM_SIMILARITY_WORKERS', '0'))
+VECTOR_STORE_DIR = os.getenv(
+    'VECTOR_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vector_store')
+)
+CONTENT_WEIGHT = float(os.getenv('CONTENT_WEIGHT', '0.3'))
+EMBEDDINGS_CACHE = 'event_embeddings.npy'
+EMBEDDINGS_MMAP = os.getenv('EMBEDDINGS_MMAP', 'true').lower() == 'true'
+BATCH_MAX_USERS = int(os.getenv('BATCH_MAX_USERS', '5000'))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '1024'))
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '30'))
+MATERIALIZE = os.getenv('MATERIALIZE_RECOMMENDATIONS', 'false').lower() == 'true'
+MATERIALIZE_TOP_K = int(os.getenv('MATERIALIZE_TOP_K', '20'))
+MATERIALIZE_WORKERS = int(os.getenv('MATERIALIZE_WORKERS', '0'))
+MATERIALIZED_PATH = 'recommendations_snapshot.npz'
+RETRAIN_DEBOUNCE = float(os.getenv('RETRAIN_DEBOUNCE', '1'))
+TRAINING_BATCH_SIZE = int(os.getenv('TRAINING_BATCH_SIZE', '10000'))
+TRAINING_SNAPSHOT = os.getenv('TRAINING_SNAPSHOT')
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+RESULT_CACHE_MAX_MB = float(os.getenv('RESULT_CACHE_MAX_MB', '64'))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '300'))
+UPCOMING_ONLY = os.getenv('UPCOMING_ONLY', 'true').lower() == 'true'
+RESPONSE_PROFILE = os.getenv('RESPONSE_PROFILE', 'full').lower()
+
+if RECOMMENDER_MODE not in RECOMMENDER_MODES:
+    logger.warning(f"Unknown RECOMMENDER_MODE '{RECOMMENDER_MODE}'. Falling back to user-based recommendations.")
+    RECOMMENDER_MODE = 'user'
+
+if RESPONSE_PROFILE not in FIELD_PROFILES:
+    logger.warning(f"Unknown RESPONSE_PROFILE '{RESPONSE_PROFILE}'. Falling back to full responses.")
+    RESPONSE_PROFILE = 'full'
+
+REQUEST_SECONDS = registry.register(Histogram(
+    'recommender_request_seconds', "End-to-end request latency.", ('endpoint', 'method', 'status')
+))
+REQUEST_STAGE_SECONDS = registry.register(Histogram(
+    'recommender_request_stage_seconds', "Latency of each stage of a recommendation request.", ('endpoint', 'stage')
+))
+TRAINING_PHASE_SECONDS = registry.register(Histogram(
+    'recommender_training_phase_seconds', "Duration of each model build phase.", ('phase',), buckets=TRAINING_BUCKETS
+))
+RECOMMENDATION_SOURCE = registry.register(Counter(
+    'recommender_recommendations_total', "Recommendation responses by the path that served them.", ('source',)
+))
+RESULT_CACHE_REQUESTS = registry.register(Counter(
+    'recommender_result_cache_requests_total', "Result cache lookups by outcome.", ('result',)
+))
+RESULT_CACHE_EVICTIONS = registry.register(Counter(
+    'recommender_result_cache_evictions_total', "Result cache entries dropped, by reason.", ('reason',)
+))
+
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl=RESULT_CACHE_TTL,
+    requests=RESULT_CACHE_REQUESTS,
+    evictions=RESULT_CACHE_EVICTIONS
+)
+
+current_model = None
+event_catalog = EventCatalog(events_collection, organizations_collection)
+materialized_recommendations = None
+event_embeddings = None
+event_date_index = None
+
+# Held while interaction deltas are applied and while a freshly trained
+# snapshot is swapped in, so deltas that arrive during a build are replayed
+# onto the new store instead of being lost.
+swap_lock = threading.Lock()
+replay_log = None
+# Compactions and retrains save after releasing swap_lock; saving one at a
+# time, and only the installed snapshot, keeps CURRENT from going back to an
+# older one that finished writing last.
+save_lock = threading.Lock()
+warm_up_thread = None
+
+
+def install_model(snapshot):
+    global current_model
+    previous = current_model
+    current_model = snapshot
+    # Entries for the previous generation can no longer be hit; free them now.
+    # Compactions keep the generation and the cache: users whose deltas were
+    # folded in were already invalidated, and other entries age out.
+    if previous is None or previous.generation != snapshot.generation:
+        result_cache.clear()
+
+
+def load_event_embeddings():
+    """Loads the vector store embeddings once, and again whenever the backend rewrites them."""
+    global event_embeddings
+
+    if CONTENT_WEIGHT <= 0:
+        return None
+    embeddings = event_embeddings
+    if embeddings is not None and not embeddings.is_stale(VECTOR_STORE_DIR):
+        return embeddings
+    try:
+        embeddings = EventEmbeddings.load(VECTOR_STORE_DIR, EMBEDDINGS_CACHE, mmap=EMBEDDINGS_MMAP)
+        logger.info(f"Loaded {len(embeddings)} event embeddings from {VECTOR_STORE_DIR}.")
+    except (ImportError, OSError, ValueError, KeyError) as e:
+        logger.warning(f"Event embeddings are unavailable, using collaborative scores only: {str(e)}")
+        return embeddings
+    event_embeddings = embeddings
+    return embeddings
+
+
+def fit_snapshot(store, generation, trained_at=None, index=None, similarity=None, content=None):
+    """Builds a snapshot of store, computing whichever of the index, similarity and content scores is not passed."""
+    matrix = store.matrix
+    if index is None:
+        with TRAINING_PHASE_SECONDS.time('neighbor_index'):
+            index = index_from_env().build(matrix)
+    if similarity is None:
+        with TRAINING_PHASE_SECONDS.time('item_similarity'):
+            similarity = item_similarity(
+                matrix, top_m=ITEM_SIMILARITY_TOP_M, workers=ITEM_SIMILARITY_WORKERS or None
+            )
+
+    if content is None:
+        with TRAINING_PHASE_SECONDS.time('content_embeddings'):
+            embeddings = load_event_embeddings()
+            if embeddings is not None:
+                content = ContentScorer(embeddings.align(store.event_ids[:matrix.shape[1]]), CONTENT_WEIGHT)
+
+    return ModelSnapshot.fit(store, generation, trained_at, index=index, similarity=similarity, content=content)
+
+
+def save_model(snapshot):
+    with save_lock:
+        if snapshot is not current_model:
+            logger.info("Skipped saving a model that has since been replaced.")
+            return
+        write_model(snapshot)
+
+
+def write_model(snapshot):
+    # The snapshot's id lists and maps are copies frozen when it was built;
+    # the store's own keep growing under concurrent /interactions requests.
+    n_events = snapshot.matrix.shape[1]
+    event_refs = [''] * n_events
+    for event_ref, idx in snapshot.event_ref_to_index_map.items():
+        if idx < n_events:
+            event_refs[idx] = event_ref
+
+    save_artifact(
+        MODEL_DIR,
+        snapshot.matrix,
+        snapshot.user_ids,
+        snapshot.event_ids,
+        event_refs,
+        snapshot.generation,
+        snapshot.trained_at,
+        write_extras=lambda version_dir: write_model_extras(snapshot, version_dir),
+        metadata={
+            'neighbor_index': snapshot.model.params,
+            'item_similarity': {'top_m': ITEM_SIMILARITY_TOP_M}
+        }
+    )
+
+
+def write_model_extras(snapshot, version_dir):
+    snapshot.model.save(os.path.join(version_dir, NEIGHBOR_INDEX_DIR))
+    save_similarity(os.path.join(version_dir, ITEM_SIMILARITY_DIR), snapshot.similarity)
+
+
+def build_materialized():
+    snapshot = current_model
+    if snapshot is None:
+        return None
+    with TRAINING_PHASE_SECONDS.time('materialize'):
+        materialized = materialize(
+            snapshot.matrix,
+            snapshot.user_ids,
+            MATERIALIZE_TOP_K,
+            NUM_NEIGHBORS,
+            index=snapshot.model,
+            workers=MATERIALIZE_WORKERS or None,
+            content=snapshot.content
+        )
+    materialized.generation = snapshot.generation
+    return materialized
+
+
+def install_materialized(materialized):
+    global materialized_recommendations
+
+    snapshot = current_model
+    if snapshot is None or materialized.generation != snapshot.generation:
+        logger.info("Discarding materialized recommendations built for a previous model.")
+        return
+    previous = materialized_recommendations
+    if previous is not None and previous.generation == materialized.generation:
+        materialized.inherit_stale(previous)
+    materialized_recommendations = materialized
+    save_materialized(materialized)
+
 
-model = None
-event_id_to_index_map = {}
-user_ids = []
-interaction_matrix = None
+def save_materialized(materialized):
+    with save_lock:
+        if materialized is materialized_recommendations:
+            materialized.save(MATERIALIZED_PATH)
+
+
+def refresh_materialized(previous, snapshot, rows):
+    """
+    Recomputes the materialized rows a compaction from previous to snapshot
+    changed, and the rows of new users. Runs under swap_lock, so every delta
+    marked stale so far is folded into snapshot. Returns the refreshed store,
+    or None when there is nothing to patch.
+    """
+    global materialized_recommendations
+
+    materialized = materialized_recommendations
+    if materialized is None or materialized.generation != snapshot.generation:
+        # The retrain's full build is still running; it covers these deltas.
+        return None
+    if not materialized.matches(previous.matrix):
+        # Built on an older matrix, so rows changed since then are unknown.
+        materialized_refresher.request()
+        return None
+    with TRAINING_PHASE_SECONDS.time('materialize_rows'):
+        materialized = rematerialize(
+            materialized,
+            snapshot.matrix,
+            snapshot.user_ids,
+            rows,
+            NUM_NEIGHBORS,
+            snapshot.model,
+            content=snapshot.content
+        )
+    materialized_recommendations = materialized
+    return materialized
+
+
+materialized_refresher = MaterializedRefresher(build_materialized, install_materialized)
+
+
+def load_materialized():
+    global materialized_recommendations
+
+    if os.path.exists(MATERIALIZED_PATH):
+        try:
+            materialized = MaterializedRecommendations.load(MATERIALIZED_PATH)
+            if materialized.matches(current_model.matrix):
+                materialized.generation = current_model.generation
+                materialized_recommendations = materialized
+                logger.info("Materialized recommendations loaded from disk.")
+                return
+            logger.info("Materialized recommendations are out of date.")
+        except Exception as e:
+            logger.error(f"Error loading materialized recommendations: {str(e)}")
+    materialized_refresher.request()
+
+
+def compact_interactions():
+    """
+    Folds pending deltas into a new snapshot. Returns False when another
+    request compacted first and nothing is left to fold in.
+    """
+    with swap_lock:
+        snapshot = current_model
+        # apply_interactions checks outside the lock, so concurrent requests
+        # can all see the same deltas due; only the first one compacts.
+        if not snapshot.store.needs_compaction(COMPACT_EVERY, COMPACT_INTERVAL):
+            return False
+        with TRAINING_PHASE_SECONDS.time('compact'):
+            matrix, changed_rows = snapshot.store.compact()
+        logger.info(f"Compacted interactions: shape={matrix.shape}, nnz={matrix.nnz}")
+        with TRAINING_PHASE_SECONDS.time('neighbor_index_update'):
+            index = snapshot.model.update(matrix, changed_rows)
+        # Folding deltas in must stay cheap: the item similarity carries over
+        # until the next retrain, with empty rows for new events, and content
+        # scores only gain rows for the new events' columns.
+        similarity = pad_similarity(snapshot.similarity, matrix.shape[1])
+        content = snapshot.content
+        if content is not None and content.n_columns < matrix.shape[1]:
+            content = content.extend(
+                snapshot.store.event_ids[content.n_columns:matrix.shape[1]], load_event_embeddings()
+            )
+        compacted = fit_snapshot(
+            snapshot.store, snapshot.generation, snapshot.trained_at,
+            index=index, similarity=similarity, content=content
+        )
+        install_model(compacted)
+        # Full rebuilds are left to retrains; only the changed rows are redone.
+        materialized = refresh_materialized(snapshot, compacted, changed_rows) if MATERIALIZE else None
+    with TRAINING_PHASE_SECONDS.time('save_artifact'):
+        save_model(compacted)
+    if materialized is not None:
+        save_materialized(materialized)
+    return True
 
 
 def train_model():
-    global model, event_id_to_index_map, user_ids, interaction_matrix
+    global replay_log
 
     logger.info("Starting model training...")
+    phases = StageTimer(TRAINING_PHASE_SECONDS)
+    started = time.perf_counter()
 
-    events = list(events_collection.find({}, {'_id': 1, 'eventId': 1, 'title': 1, 'organization': 1}))
-    if not events:
-        logger.error("No events found in the database. Cannot train the model.")
-        return False
+    with swap_lock:
+        replay_log = []
 
-    event_id_map = {event['eventId']: str(event['_id']) for event in events}
-    logger.info(f"Event ID Map: {event_id_map}")
+    try:
+        if TRAINING_SNAPSHOT:
+            source = SnapshotTrainingSource(TRAINING_SNAPSHOT)
+        else:
+            source = MongoTrainingSource(events_collection, users_collection, TRAINING_BATCH_SIZE)
+        event_ids, event_ref_to_index, trained_user_ids, matrix = load_training_data(source, TRAINING_BATCH_SIZE)
+        phases.lap('load_data')
+        logger.info(f"Indexed {len(event_ids)} events and {len(trained_user_ids)} users from {source}.")
 
-    event_ids = [event['eventId'] for event in events]
-    event_id_to_index_map = {event_id: idx for idx, event_id in enumerate(event_ids)}
-    logger.info(f"Event ID to Index Map: {event_id_to_index_map}")
+        if not event_ids:
+            logger.error("No events found in the database. Cannot train the model.")
+            return False
 
-    users = list(users_collection.find({}, {'registeredEvents': 1}))
-    if not users:
-        logger.error("No users found in the database. Cannot train the model.")
-        return False
+        if not trained_user_ids:
+            logger.error("No users found in the database. Cannot train the model.")
+            return False
 
-    user_ids = [str(user['_id']) for user in users]
-    logger.info(f"User IDs: {user_ids}")
-
-    interaction_matrix = np.zeros((len(user_ids), len(event_ids)))
-
-    for i, user in enumerate(users):
-        for event_ref in user.get('registeredEvents', []):
-            event_ref_str = str(event_ref)
-            event_id_str = None
-            for eid, oid in event_id_map.items():
-                if oid == event_ref_str:
-                    event_id_str = eid
-                    break
-            if event_id_str and event_id_str in event_id_to_index_map:
-                j = event_id_to_index_map[event_id_str]
-                interaction_matrix[i][j] = 1
-
-    if interaction_matrix.shape[0] == 0 or interaction_matrix.shape[1] == 0:
-        logger.error("Interaction matrix is empty. Cannot train the model.")
-        return False
+        if matrix.shape[0] == 0 or matrix.shape[1] == 0:
+            logger.error("Interaction matrix is empty. Cannot train the model.")
+            return False
+
+        logger.info(f"Interaction Matrix: shape={matrix.shape}, nnz={matrix.nnz}")
 
-    logger.info(f"Interaction Matrix:\n{interaction_matrix}")
+        store = InteractionStore(matrix, trained_user_ids, event_ids, event_ref_to_index)
+        generation = current_model.generation + 1 if current_model is not None else 1
+        snapshot = fit_snapshot(store, generation)
 
-    model = NearestNeighbors(metric='cosine', algorithm='brute')
-    model.fit(interaction_matrix)
+        phases.skip()
 
-    model.user_ids = user_ids
-    model.event_ids = event_ids
-    model.interaction_matrix = interaction_matrix
+        with swap_lock:
+            for delta in replay_log:
+                store.apply(delta)
+            replay_log = None
+            install_model(snapshot)
+        phases.lap('install')
+    finally:
+        with swap_lock:
+            replay_log = None
 
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump({
-            'model': model,
-            'event_id_to_index_map': event_id_to_index_map,
-            'user_ids': user_ids,
-            'interaction_matrix': interaction_matrix
-        }, f)
+    save_model(snapshot)
+    phases.lap('save_artifact')
 
-    logger.info("Model trained and saved successfully.")
+    if MATERIALIZE:
+        materialized_refresher.request()
+
+    TRAINING_PHASE_SECONDS.observe(time.perf_counter() - started, 'total')
+    logger.info(f"Model trained and saved successfully in {time.perf_counter() - started:.2f}s.")
     return True
 
 
+retrain_worker = RetrainWorker(train_model, debounce=RETRAIN_DEBOUNCE)
+
+
 def load_model():
-    global model, event_id_to_index_map, user_ids, interaction_matrix
+    """
+    Installs the model artifact from MODEL_DIR. If there is none, or it cannot
+    be used, a background retrain is scheduled instead of training inline.
+    """
+    try:
+        artifact = load_artifact(MODEL_DIR, mmap=True, verify=MODEL_VERIFY_CHECKSUMS)
+    except FileNotFoundError:
+        logger.info("Model artifact not found. Scheduling a training run...")
+        retrain_worker.submit()
+        return False
+    except ArtifactError as e:
+        logger.error(f"Error loading model: {str(e)}. Scheduling a training run...")
+        retrain_worker.submit()
+        return False
 
-    if not os.path.exists(MODEL_PATH):
-        logger.info("Model file not found. Training a new model...")
-        success = train_model()
-        if not success:
-            logger.error("Model training failed during initial load.")
-    else:
+    manifest = artifact['manifest']
+    event_ref_to_index = {event_ref: idx for idx, event_ref in enumerate(artifact['event_refs'])}
+    store = InteractionStore(artifact['matrix'], artifact['user_ids'], artifact['event_ids'], event_ref_to_index)
+
+    index = None
+    index_dir = os.path.join(artifact['path'], NEIGHBOR_INDEX_DIR)
+    if os.path.isdir(index_dir) and index_from_env().params == manifest['metadata'].get('neighbor_index'):
+        try:
+            index = load_index(index_dir, store.matrix)
+        except Exception as e:
+            logger.error(f"Error loading neighbor index: {str(e)}. Rebuilding it.")
+
+    similarity = None
+    similarity_dir = os.path.join(artifact['path'], ITEM_SIMILARITY_DIR)
+    if os.path.isdir(similarity_dir) and manifest['metadata'].get('item_similarity') == {'top_m': ITEM_SIMILARITY_TOP_M}:
         try:
-            with open(MODEL_PATH, 'rb') as f:
-                data = pickle.load(f)
-                required_keys = {'model', 'event_id_to_index_map', 'user_ids', 'interaction_matrix'}
-                if not required_keys.issubset(data.keys()):
-                    logger.warning("Pickle file is missing required data. Re-training the model...")
-                    success = train_model()
-                    if not success:
-                        logger.error("Model training failed during re-training.")
-                        return
-                else:
-                    model = data['model']
-                    event_id_to_index_map = data['event_id_to_index_map']
-                    user_ids = data['user_ids']
-                    interaction_matrix = data['interaction_matrix']
-                    logger.info("Model loaded successfully from disk.")
+            similarity = load_similarity(similarity_dir, store.matrix.shape[1])
         except Exception as e:
-            logger.error(f"Error loading model: {str(e)}. Attempting to retrain.")
-            success = train_model()
-            if not success:
-                logger.error("Model training failed after load failure.")
+            logger.error(f"Error loading item similarity: {str(e)}. Rebuilding it.")
 
+    install_model(fit_snapshot(store, manifest['generation'], manifest['trained_at'], index, similarity))
+    logger.info(f"Model {artifact['version']} loaded from {MODEL_DIR}.")
 
-@app.route('/recommend', methods=['POST'])
-def recommend():
+    if MATERIALIZE:
+        load_materialized()
+    return True
+
+
+def warm_up():
+    try:
+        load_model()
+    except Exception as e:
+        logger.error(f"Error during model warm-up: {str(e)}")
+    try:
+        event_catalog.load()
+        event_catalog.start_polling(CATALOG_REFRESH_INTERVAL)
+    except Exception as e:
+        logger.error(f"Error during event catalog warm-up: {str(e)}")
+
+
+def start_warm_up():
+    global warm_up_thread
+
+    with swap_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+            warm_up_thread.start()
+    return warm_up_thread
+
+
+def is_ready():
+    return current_model is not None and event_catalog.loaded
+
+
+@app.before_request
+def ensure_warm_up():
+    g.request_started = time.perf_counter()
+    if warm_up_thread is None:
+        start_warm_up()
+
+
+@app.after_request
+def record_request(response):
+    started = g.get('request_started')
+    if started is not None and request.url_rule is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started, request.url_rule.rule, request.method, str(response.status_code)
+        )
+    return response
+
+
+def format_recommendations(snapshot, columns, fields=None):
+    """The catalog's pre-serialized rows of the recommended columns, restricted to fields."""
+    fields = fields or FIELD_PROFILES[RESPONSE_PROFILE]
+    formatted_events = []
+    for j in columns:
+        event = event_catalog.fragment(snapshot.event_ids[j], fields)
+        if event is not None:
+            formatted_events.append(event)
+    return formatted_events
+
+
+def date_mask(snapshot, window):
     """
-    Expects JSON payload:
-    {
-        "user_id": "user's ObjectId as string",
-        "num_recommendations": 5  # Optional, defaults to 5
-    }
+    Boolean mask of the snapshot's columns whose events overlap window, or
+    None for no window. The date index behind it is rebuilt only when the
+    snapshot or the catalog changes.
+    """
+    global event_date_index
+
+    if window is None or snapshot is None:
+        return None
+    index = event_date_index
+    key = (snapshot.version, event_catalog.version)
+    if index is None or index.key != key:
+        index = EventDateIndex.build(snapshot.event_ids[:snapshot.matrix.shape[1]], event_catalog.event_days)
+        index.key = key
+        event_date_index = index
+    return index.mask(window)
+
+
+def parse_window(data):
+    """
+    Reads the optional "from" and "to" dates of a request body. Without
+    "from", the window starts today when UPCOMING_ONLY is set; an explicit
+    null lifts that. Returns ((from day, to day) or None, None), or
+    (None, (error body, status)).
     """
-    data = request.get_json()
+    try:
+        if 'from' in data:
+            from_day = parse_request_date(data['from']) if data['from'] is not None else None
+        else:
+            from_day = today() if UPCOMING_ONLY else None
+        to_day = parse_request_date(data['to']) if data.get('to') is not None else None
+    except ValueError as e:
+        logger.error(str(e))
+        return None, ({"error": "from and to must be dates formatted as DD-MM-YYYY or YYYY-MM-DD."}, 400)
+
+    if from_day is None and to_day is None:
+        return None, None
+    return (from_day, to_day), None
+
+
+def parse_fields(data):
+    """
+    Reads the optional "fields" of a request body: a profile name ("full" or
+    "compact"), a list of field names or a comma-separated string of them.
+    Returns (tuple of fields in response order, None), or (None, (error body, status)).
+    """
+    fields = data.get('fields')
+    if fields is None:
+        return FIELD_PROFILES[RESPONSE_PROFILE], None
+    if isinstance(fields, str):
+        if fields in FIELD_PROFILES:
+            return FIELD_PROFILES[fields], None
+        fields = [field.strip() for field in fields.split(',')]
+
+    if not isinstance(fields, list) or not all(field in RESPONSE_FIELDS for field in fields):
+        logger.error(f"Invalid fields: {fields}")
+        return None, ({
+            "error": f"fields must be one of {', '.join(FIELD_PROFILES)} or a list of: {', '.join(RESPONSE_FIELDS)}."
+        }, 400)
+    selected = set(fields) | {'eventId'}
+    return tuple(field for field in RESPONSE_FIELDS if field in selected), None
 
+
+def parse_recommend_request(data):
+    """
+    Validates a /recommend body. Returns ((user_id, user ObjectId,
+    num_recommendations, mode, window, fields), None), or (None, (error body, status)).
+    """
     if not data:
         logger.error("No data received in the request.")
-        return jsonify({"error": "No data provided."}), 400
+        return None, ({"error": "No data provided."}, 400)
 
     user_id = data.get('user_id')
     num_recommendations = data.get('num_recommendations', 5)
+    mode = data.get('mode', RECOMMENDER_MODE)
 
     if not user_id:
         logger.error("user_id is missing in the request.")
-        return jsonify({"error": "user_id is required."}), 400
+        return None, ({"error": "user_id is required."}, 400)
+
+    if mode not in RECOMMENDER_MODES:
+        logger.error(f"Invalid mode: {mode}")
+        return None, ({"error": f"mode must be one of: {', '.join(RECOMMENDER_MODES)}."}, 400)
 
     try:
         user_obj_id = ObjectId(user_id)
     except Exception as e:
         logger.error(f"Invalid user_id format: {user_id}. Error: {str(e)}")
-        return jsonify({"error": "Invalid user_id format."}), 400
+        return None, ({"error": "Invalid user_id format."}, 400)
+
+    window, error = parse_window(data)
+    if error:
+        return None, error
+
+    fields, error = parse_fields(data)
+    if error:
+        return None, error
+
+    return (str(user_id), user_obj_id, num_recommendations, mode, window, fields), None
+
+
+def parse_batch_request(data):
+    """
+    Validates a /recommend/batch body. Returns ((user_ids, num_recommendations,
+    mode, window, fields), None), or (None, (error body, status)).
+    """
+    if not data:
+        logger.error("No data received in the request.")
+        return None, ({"error": "No data provided."}, 400)
+
+    batch_user_ids = data.get('user_ids')
+    num_recommendations = data.get('num_recommendations', 5)
+    mode = data.get('mode', RECOMMENDER_MODE)
+
+    if not batch_user_ids or not isinstance(batch_user_ids, list):
+        logger.error("user_ids is missing in the request.")
+        return None, ({"error": "user_ids must be a non-empty list."}, 400)
+
+    if len(batch_user_ids) > BATCH_MAX_USERS:
+        logger.error(f"Batch of {len(batch_user_ids)} users exceeds the limit of {BATCH_MAX_USERS}.")
+        return None, ({"error": f"At most {BATCH_MAX_USERS} user_ids per request."}, 400)
+
+    if mode not in RECOMMENDER_MODES:
+        logger.error(f"Invalid mode: {mode}")
+        return None, ({"error": f"mode must be one of: {', '.join(RECOMMENDER_MODES)}."}, 400)
+
+    window, error = parse_window(data)
+    if error:
+        return None, error
+
+    fields, error = parse_fields(data)
+    if error:
+        return None, error
+
+    return ([str(user_id) for user_id in batch_user_ids], num_recommendations, mode, window, fields), None
+
+
+def parse_user_ids(batch_user_ids):
+    """Returns ({user_id: ObjectId}, {user_id: error result}) for a list of user id strings."""
+    object_ids = {}
+    errors = {}
+    for user_id in batch_user_ids:
+        try:
+            object_ids[user_id] = ObjectId(user_id)
+        except Exception:
+            errors[user_id] = {"error": "Invalid user_id format."}
+    return object_ids, errors
+
+
+def materialized_recommendations_for(snapshot, user_id, num_recommendations, mode, window=None, fields=None):
+    """Formatted events from the materialized store, or None if the user must be scored live."""
+    materialized = materialized_recommendations
+    if (
+        mode != 'user' or
+        snapshot is None or
+        materialized is None or
+        materialized.generation != snapshot.generation or
+        materialized.matrix_shape[1] > snapshot.matrix.shape[1] or
+        not event_catalog.loaded
+    ):
+        return None
+
+    columns = materialized.lookup(user_id, num_recommendations, mask=date_mask(snapshot, window))
+    if columns is None or not len(columns):
+        return None
+    return format_recommendations(snapshot, columns, fields) or None
+
+
+def recommend_for_user(snapshot, user_id, registered_events, num_recommendations=5, mode=None, stages=None,
+                       window=None, fields=None):
+    """
+    Scores one user's registered events against a snapshot. Returns the
+    /recommend response body and status code. This is the part of a request
+    that does not touch the users collection, shared by the WSGI and ASGI apps.
+    Events outside window are masked out before ranking; rows hold only fields.
+    """
+    mode = mode or RECOMMENDER_MODE
+    stages = stages or StageTimer(REQUEST_STAGE_SECONDS, '/recommend')
+
+    if not registered_events:
+        logger.info(f"User {user_id} has no registered events.")
+        return {"message": "User has no registered events.", "recommendations": []}, 200
+
+    if not event_catalog.loaded:
+        try:
+            event_catalog.load()
+        except Exception as e:
+            logger.error(f"Database error when loading event catalog: {str(e)}")
+            return {"error": "Database error."}, 500
+        stages.lap('catalog_load')
+
+    if snapshot is None:
+        logger.error("Model is not ready.")
+        return {"error": "Model is not ready."}, 503
+
+    matrix = snapshot.matrix
+    user_vector = build_user_vector(registered_events, snapshot.event_ref_to_index_map, matrix.shape[1])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"User Vector for {user_id}: columns={user_vector.indices.tolist()}")
+    stages.lap('vector_build')
+
+    if mode == 'item':
+        scores = item_scores(snapshot.similarity, user_vector).toarray().ravel()
+    else:
+        n_samples_fit = matrix.shape[0]
+        desired_neighbors = min(max(num_recommendations + 1, NUM_NEIGHBORS), n_samples_fit)
+
+        if desired_neighbors < 2:
+            logger.warning("Not enough data to provide recommendations.")
+            return {"error": "Not enough data to provide recommendations."}, 400
+
+        try:
+            distances, indices = snapshot.model.kneighbors(user_vector, n_neighbors=desired_neighbors)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"KNN Distances: {distances}")
+                logger.debug(f"KNN Indices: {indices}")
+        except ValueError as ve:
+            logger.error(f"KNN Error: {str(ve)}")
+            return {"error": "Error generating recommendations."}, 500
+        except Exception as e:
+            logger.error(f"Unexpected error during KNN computation: {str(e)}")
+            return {"error": "Unexpected error during recommendation generation."}, 500
+        stages.lap('neighbor_query')
+
+        user_row = snapshot.user_id_to_index_map.get(user_id)
+        scores = neighbor_scores(
+            matrix,
+            indices,
+            distances,
+            skip_rows=[user_row] if user_row is not None else []
+        )
+
+    if snapshot.content is not None:
+        scores = snapshot.content.blend(user_vector, scores)[0]
+
+    recommended_columns = top_n(
+        scores, num_recommendations, exclude_columns=user_vector.indices, mask=date_mask(snapshot, window)
+    )
+    stages.lap('scoring')
+
+    if len(recommended_columns) == 0:
+        logger.info("No similar events found for recommendations.")
+        return {"message": "No similar events found.", "recommendations": []}, 200
+
+    formatted_events = format_recommendations(snapshot, recommended_columns, fields)
+    stages.lap('enrichment')
+
+    if not formatted_events:
+        logger.info("No recommended events found in the event catalog.")
+        return {"message": "No recommended events found.", "recommendations": []}, 200
+
+    logger.info(f"Returning {len(formatted_events)} recommendations for user {user_id}.")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Formatted Recommendations: {formatted_events}")
+
+    RECOMMENDATION_SOURCE.inc(mode)
+    return {"recommendations": formatted_events}, 200
+
+
+def render_body(body):
+    """Serializes a response body once. Returns the JSON payload and its ETag."""
+    payload = dumps(body)
+    return payload, etag_for(payload)
+
+
+def cached_recommend_for_user(snapshot, user_id, registered_events, num_recommendations=5, mode=None, stages=None,
+                              window=None, fields=None):
+    """
+    recommend_for_user behind the result cache. Returns (JSON payload, status,
+    ETag); the ETag is None for anything but a 200. Entries are keyed on the
+    model generation, catalog version and a fingerprint of the user's
+    registrations, so any change to those misses instead of serving stale data.
+    """
+    mode = mode or RECOMMENDER_MODE
+    fields = fields or FIELD_PROFILES[RESPONSE_PROFILE]
+    stages = stages or StageTimer(REQUEST_STAGE_SECONDS, '/recommend')
+
+    key = None
+    if result_cache.enabled and snapshot is not None:
+        key = (
+            user_id,
+            num_recommendations,
+            mode,
+            window,
+            fields,
+            snapshot.generation,
+            event_catalog.version,
+            fingerprint(registered_events)
+        )
+        cached = result_cache.get(key)
+        stages.lap('cache_lookup')
+        if cached is not None:
+            RECOMMENDATION_SOURCE.inc('cache')
+            return cached[0], 200, cached[1]
+
+    body, status = recommend_for_user(
+        snapshot, user_id, registered_events, num_recommendations, mode, stages, window, fields
+    )
+    payload, etag = render_body(body)
+    stages.lap('serialization')
+    if status != 200:
+        return payload, status, None
+    if key is not None:
+        result_cache.put(key, payload, etag)
+    return payload, status, etag
+
+
+def score_batch(snapshot, object_ids, registered_by_user, num_recommendations=5, mode=None, stages=None, window=None,
+                fields=None):
+    """
+    Scores the users of a batch whose registrations were already looked up:
+    one neighbor query per chunk and one sparse scoring pass. Returns a dict
+    keyed by user id whose values have the same shape as a /recommend body.
+    """
+    mode = mode or RECOMMENDER_MODE
+    stages = stages or StageTimer(REQUEST_STAGE_SECONDS, '/recommend/batch')
+
+    if not event_catalog.loaded:
+        event_catalog.load()
+        stages.lap('catalog_load')
+
+    mask = date_mask(snapshot, window)
+    results = {}
+    query_user_ids = []
+    for user_id in object_ids:
+        if user_id not in registered_by_user:
+            results[user_id] = {"error": "User not found."}
+        elif not registered_by_user[user_id]:
+            results[user_id] = {"message": "User has no registered events.", "recommendations": []}
+        else:
+            query_user_ids.append(user_id)
+
+    matrix = snapshot.matrix
+    n_samples_fit = matrix.shape[0]
+    desired_neighbors = min(max(num_recommendations + 1, NUM_NEIGHBORS), n_samples_fit)
+    if mode == 'user' and desired_neighbors < 2:
+        for user_id in query_user_ids:
+            results[user_id] = {"error": "Not enough data to provide recommendations."}
+        return results
+
+    for start in range(0, len(query_user_ids), BATCH_CHUNK_SIZE):
+        chunk = query_user_ids[start:start + BATCH_CHUNK_SIZE]
+        query_block = build_interaction_matrix(
+            (registered_by_user[user_id] for user_id in chunk),
+            snapshot.event_ref_to_index_map,
+            matrix.shape[1]
+        )
+        stages.lap('vector_build')
+        if mode == 'item':
+            scores = item_scores(snapshot.similarity, query_block)
+        else:
+            distances, indices = snapshot.model.kneighbors(query_block, n_neighbors=desired_neighbors)
+            stages.lap('neighbor_query')
+            skip_rows = [snapshot.user_id_to_index_map.get(user_id, -1) for user_id in chunk]
+            scores = batch_neighbor_scores(matrix, indices, distances, skip_rows=skip_rows)
+        if snapshot.content is not None:
+            scores = snapshot.content.blend(query_block, scores)
+        ranked = top_n_rows(scores, num_recommendations, exclude=query_block, mask=mask)
+        stages.lap('scoring')
+
+        for user_id, columns in zip(chunk, ranked):
+            formatted_events = format_recommendations(snapshot, columns, fields)
+            if formatted_events:
+                results[user_id] = {"recommendations": formatted_events}
+            else:
+                results[user_id] = {"message": "No similar events found.", "recommendations": []}
+        stages.lap('enrichment')
+
+    return results
+
+
+def recommend_batch(batch_user_ids, num_recommendations=5, mode=None, window=None, fields=None):
+    """
+    Recommends events for many users with one user lookup, one neighbor query
+    per chunk and one sparse scoring pass. Returns a dict keyed by user id whose
+    values have the same shape as a /recommend response body.
+    """
+    snapshot = current_model
+    if snapshot is None:
+        raise RuntimeError("Model is not ready.")
+
+    stages = StageTimer(REQUEST_STAGE_SECONDS, '/recommend/batch')
+    object_ids, results = parse_user_ids(batch_user_ids)
+    users = users_collection.find({'_id': {'$in': list(object_ids.values())}}, {'registeredEvents': 1})
+    registered_by_user = {str(user['_id']): user.get('registeredEvents', []) for user in users}
+    stages.lap('user_lookup')
+
+    results.update(score_batch(
+        snapshot, object_ids, registered_by_user, num_recommendations, mode, stages, window, fields
+    ))
+    return results
+
+
+@app.route('/recommend', methods=['POST'])
+def recommend():
+    """
+    Expects JSON payload:
+    {
+        "user_id": "user's ObjectId as string",
+        "num_recommendations": 5,  # Optional, defaults to 5
+        "mode": "user" | "item",  # Optional, defaults to RECOMMENDER_MODE
+        "from": "DD-MM-YYYY",  # Optional, defaults to today when UPCOMING_ONLY; null for no lower bound
+        "to": "DD-MM-YYYY",  # Optional
+        "fields": "full" | "compact" | ["title", "date", ...]  # Optional, defaults to RESPONSE_PROFILE
+    }
+    """
+    params, error = parse_recommend_request(request.get_json())
+    if error:
+        return jsonify(error[0]), error[1]
+    user_id, user_obj_id, num_recommendations, mode, window, fields = params
+
+    stages = StageTimer(REQUEST_STAGE_SECONDS, '/recommend')
+    snapshot = current_model
+    formatted_events = materialized_recommendations_for(
+        snapshot, user_id, num_recommendations, mode, window, fields
+    )
+    stages.lap('materialized_lookup')
+    if formatted_events:
+        logger.info(f"Returning {len(formatted_events)} materialized recommendations for user {user_id}.")
+        RECOMMENDATION_SOURCE.inc('materialized')
+        payload, etag = render_body({"recommendations": formatted_events})
+        stages.lap('serialization')
+        return recommendation_response(payload, 200, etag)
 
     try:
         user = users_collection.find_one({'_id': user_obj_id}, {'registeredEvents': 1})
     except Exception as e:
         logger.error(f"Database error when fetching user {user_id}: {str(e)}")
         return jsonify({"error": "Database error."}), 500
+    stages.lap('user_lookup')
 
     if not user:
         logger.error(f"User not found: {user_id}")
         return jsonify({"error": "User not found."}), 404
 
-    registered_events = user.get('registeredEvents', [])
-    if not registered_events:
-        logger.info(f"User {user_id} has no registered events.")
-        return jsonify({"message": "User has no registered events.", "recommendations": []}), 200
+    payload, status, etag = cached_recommend_for_user(
+        snapshot, user_id, user.get('registeredEvents', []), num_recommendations, mode, stages, window, fields
+    )
+    return recommendation_response(payload, status, etag)
+
+
+def recommendation_response(payload, status, etag):
+    """A /recommend response, or an empty 304 when the client already holds this ETag."""
+    if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers={'ETag': etag})
+    response = Response(payload, status=status, mimetype='application/json')
+    if etag is not None:
+        response.headers['ETag'] = etag
+    return response
+
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch_route():
+    """
+    Expects JSON payload:
+    {
+        "user_ids": ["user's ObjectId as string", ...],
+        "num_recommendations": 5,  # Optional, defaults to 5
+        "mode": "user" | "item",  # Optional, defaults to RECOMMENDER_MODE
+        "from": "DD-MM-YYYY",  # Optional, as for /recommend
+        "to": "DD-MM-YYYY",  # Optional
+        "fields": "compact"  # Optional, as for /recommend
+    }
+    """
+    params, error = parse_batch_request(request.get_json())
+    if error:
+        return jsonify(error[0]), error[1]
+    batch_user_ids, num_recommendations, mode, window, fields = params
 
     try:
-        events = list(events_collection.find({}, {
-            '_id': 1,
-            'eventId': 1,
-            'title': 1,
-            'organization': 1,
-            'type': 1,
-            'subtype': 1,
-            'location': 1,
-            'date': 1,
-            'time': 1
-        }))
+        results = recommend_batch(batch_user_ids, num_recommendations, mode, window, fields)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
-        logger.error(f"Database error when fetching events: {str(e)}")
-        return jsonify({"error": "Database error."}), 500
+        logger.error(f"Error generating batch recommendations: {str(e)}")
+        return jsonify({"error": "Error generating recommendations."}), 500
 
-    id_to_event_id_map = {str(event['_id']): event['eventId'] for event in events}
-    logger.info(f"Event ID Map in Recommend: {id_to_event_id_map}")
+    logger.info(f"Returning batch recommendations for {len(results)} users.")
+    started = time.perf_counter()
+    response = Response(dumps({"results": results}), status=200, mimetype='application/json')
+    REQUEST_STAGE_SECONDS.observe(time.perf_counter() - started, '/recommend/batch', 'serialization')
+    return response
 
-    user_vector = np.zeros(len(event_id_to_index_map))
-    excluded_event_ids = []
 
-    for event_ref in registered_events:
-        event_ref_str = str(event_ref)
-        event_id_str = id_to_event_id_map.get(event_ref_str)
-        if event_id_str and event_id_str in event_id_to_index_map:
-            j = event_id_to_index_map[event_id_str]
-            user_vector[j] = 1
-            excluded_event_ids.append(event_id_str)
-            logger.debug(f"User {user_id} registered for Event ID: {event_id_str}")
+@app.route('/retrain', methods=['POST'])
+def retrain():
+    """
+    Schedules a background retrain and returns its job. Requests made while a
+    build is pending are coalesced into the same job.
+    """
+    job = retrain_worker.submit()
+    logger.info(f"Retrain job {job['job_id']} scheduled ({job['status']}, coalesced={job['coalesced']}).")
+    return jsonify({"message": "Model retraining scheduled.", **job}), 202
 
-    user_vector = user_vector.reshape(1, -1)
-    logger.info(f"User Vector for {user_id}: {user_vector}")
 
-    if model is None or interaction_matrix is None:
-        logger.error("Model is not trained. Insufficient data.")
-        return jsonify({"error": "Model is not trained. Insufficient data."}), 500
+@app.route('/retrain/<job_id>', methods=['GET'])
+def retrain_status(job_id):
+    job = retrain_worker.status(job_id)
+    if job is None:
+        return jsonify({"error": "Retrain job not found."}), 404
+    return jsonify(job), 200
 
-    n_samples_fit = interaction_matrix.shape[0]
-    desired_neighbors = min(num_recommendations + 1, n_samples_fit)
 
-    if desired_neighbors < 2:
-        logger.warning("Not enough data to provide recommendations.")
-        return jsonify({"error": "Not enough data to provide recommendations."}), 400
+@app.route('/interactions', methods=['POST'])
+def interactions():
+    """
+    Applies interaction deltas without a full retrain. Accepts a single delta
+    or {"interactions": [...]}, where each delta is one of:
+    {"type": "register" | "unregister", "user_id": "...", "event_ref": "event ObjectId", "event_id": "eventId"}
+    {"type": "new_event", "event_ref": "event ObjectId", "event_id": "eventId"}
+    {"type": "new_user", "user_id": "..."}
+    """
+    body, status = apply_interactions(request.get_json())
+    return jsonify(body), status
 
-    try:
-        distances, indices = model.kneighbors(user_vector, n_neighbors=desired_neighbors)
-        logger.info(f"KNN Distances: {distances}")
-        logger.info(f"KNN Indices: {indices}")
-    except ValueError as ve:
-        logger.error(f"KNN Error: {str(ve)}")
-        return jsonify({"error": "Error generating recommendations."}), 500
-    except Exception as e:
-        logger.error(f"Unexpected error during KNN computation: {str(e)}")
-        return jsonify({"error": "Unexpected error during recommendation generation."}), 500
-
-    similar_users_indices = indices.flatten()
-    logger.info(f"Similar Users Indices: {similar_users_indices}")
-
-    similar_users = []
-    for i in similar_users_indices:
-        if i < len(user_ids):
-            similar_user_id = user_ids[i]
-            try:
-                similar_user = users_collection.find_one({'_id': ObjectId(similar_user_id)}, {'registeredEvents': 1})
-                if similar_user and similar_user_id != user_id:
-                    similar_users.append(similar_user)
-                    logger.debug(f"Found similar user: {similar_user_id}")
-            except Exception as e:
-                logger.error(f"Error fetching similar user {similar_user_id}: {str(e)}")
-
-    logger.info(f"Similar Users: {[str(u['_id']) for u in similar_users]}")
-
-    recommended_event_ids = set()
-    for u in similar_users:
-        for event_ref in u.get('registeredEvents', []):
-            event_id_str = id_to_event_id_map.get(str(event_ref))
-            if (
-                event_id_str not in excluded_event_ids and
-                event_id_str in event_id_to_index_map
-            ):
-                recommended_event_ids.add(event_id_str)
-                logger.debug(f"Recommended Event Added: {event_id_str}")
-
-    if not recommended_event_ids:
-        logger.info("No similar events found for recommendations.")
-        return jsonify({"message": "No similar events found.", "recommendations": []}), 200
 
-    try:
-        recommended_events = list(events_collection.aggregate([
-            {'$match': {'eventId': {'$in': list(recommended_event_ids)}}},
-            {'$lookup': {
-                'from': 'organizations',
-                'localField': 'organization',
-                'foreignField': '_id',
-                'as': 'organization_details'
-            }},
-            {'$unwind': {'path': '$organization_details', 'preserveNullAndEmptyArrays': True}},
-            {'$project': {
-                'eventId': 1,
-                'title': 1,
-                'image': 1,
-                'summary': 1,
-                'description': 1,
-                'type': 1,
-                'subtype': 1,
-                'location': 1,
-                'date': 1,
-                'time': 1,
-                'organization': {
-                    'name': {'$ifNull': ['$organization_details.name', 'N/A']}
-                }
-            }},
-            {'$limit': num_recommendations}
-        ]))
-        logger.info(f"Recommended Events Fetched: {[e['eventId'] for e in recommended_events]}")
-    except Exception as e:
-        logger.error(f"Database error when fetching recommended events: {str(e)}")
-        return jsonify({"error": "Database error."}), 500
+def apply_interactions(data):
+    """Applies an /interactions body. Returns the response body and status code."""
+    if not data:
+        logger.error("No data received in the request.")
+        return {"error": "No data provided."}, 400
 
-    if not recommended_events:
-        logger.info("No recommended events found in the database.")
-        return jsonify({"message": "No recommended events found.", "recommendations": []}), 200
-
-    formatted_events = [{
-        'eventId': event.get('eventId', ''),
-        'title': event.get('title', ''),
-        'organization': event.get('organization', {'name': 'N/A'}),
-        'image': event.get('image', ''),
-        'summary': event.get('summary', ''),
-        'description': event.get('description', ''),
-        'type': event.get('type', ''),
-        'subtype': event.get('subtype', ''),
-        'location': event.get('location', ''),
-        'date': event.get('date', ''),
-        'time': event.get('time', ''),
-    } for event in recommended_events]
+    deltas = data.get('interactions', [data]) if isinstance(data, dict) else data
+    if not isinstance(deltas, list):
+        return {"error": "interactions must be a list."}, 400
 
-    logger.info(f"Returning {len(formatted_events)} recommendations for user {user_id}.")
-    logger.debug(f"Formatted Recommendations: {formatted_events}")
+    applied = 0
+    skipped = []
+    with swap_lock:
+        snapshot = current_model
+        if snapshot is None:
+            logger.error("Model is not ready. Cannot apply interactions.")
+            return {"error": "Model is not ready."}, 503
 
-    return jsonify({"recommendations": formatted_events}), 200
+        materialized = materialized_recommendations
+        for position, delta in enumerate(deltas):
+            reason = snapshot.store.apply(delta) if isinstance(delta, dict) else "Delta must be an object."
+            if reason:
+                skipped.append({"index": position, "error": reason})
+                continue
+            applied += 1
+            if replay_log is not None:
+                replay_log.append(delta)
+            if delta.get('user_id'):
+                result_cache.invalidate_user(str(delta['user_id']))
+                if materialized is not None:
+                    materialized.mark_stale(str(delta['user_id']))
 
+    if skipped:
+        logger.warning(f"Skipped {len(skipped)} of {len(deltas)} interactions.")
 
-@app.route('/retrain', methods=['POST'])
-def retrain():
+    compacted = False
+    if snapshot.store.needs_compaction(COMPACT_EVERY, COMPACT_INTERVAL):
+        try:
+            compacted = compact_interactions()
+        except Exception as e:
+            logger.error(f"Error compacting interactions: {str(e)}")
+            return {"error": "Error compacting interactions."}, 500
 
-    logger.info("Retraining model upon request...")
-    success = train_model()
-    if success:
-        logger.info("Model retrained successfully.")
-        return jsonify({"message": "Model retrained successfully."}), 200
-    else:
-        logger.error("Model retraining failed.")
-        return jsonify({"error": "Model retraining failed."}), 500
+    return {
+        "applied": applied,
+        "skipped": skipped,
+        "pending": snapshot.store.pending,
+        "compacted": compacted
+    }, 200
+
+
+registry.register(Gauge(
+    'recommender_model_generation', "Generation of the installed model.",
+    lambda: current_model.generation if current_model is not None else None
+))
+registry.register(Gauge(
+    'recommender_model_users', "Users in the installed interaction matrix.",
+    lambda: current_model.matrix.shape[0] if current_model is not None else None
+))
+registry.register(Gauge(
+    'recommender_model_events', "Events in the installed interaction matrix.",
+    lambda: current_model.matrix.shape[1] if current_model is not None else None
+))
+registry.register(Gauge(
+    'recommender_pending_interactions', "Interaction deltas waiting for compaction.",
+    lambda: current_model.store.pending if current_model is not None else None
+))
+registry.register(Gauge('recommender_catalog_events', "Events in the in-memory catalog.", lambda: len(event_catalog)))
+registry.register(Gauge('recommender_result_cache_entries', "Entries in the result cache.", lambda: len(result_cache)))
+registry.register(Gauge(
+    'recommender_result_cache_bytes', "Serialized bytes held by the result cache.", lambda: result_cache.bytes
+))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    snapshot = current_model
+    body = {
+        "ready": is_ready(),
+        "model_loaded": snapshot is not None,
+        "catalog_loaded": event_catalog.loaded,
+        "generation": snapshot.generation if snapshot is not None else None,
+        "trained_at": snapshot.trained_at if snapshot is not None else None
+    }
+    return jsonify(body), 200 if body["ready"] else 503
 
 
 if __name__ == '__main__':
-    load_model()
+    start_warm_up()
     app.run(host='0.0.0.0', port=5003, debug=True)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import time
+import uuid
+
+from item_similarity import item_similarity
+from neighbors import index_from_env
+
+
+class ModelSnapshot:
+    """
+    A fitted neighbor index and item-item similarity matrix together with the
+    interaction matrix and id maps they were built on. content, when event
+    embeddings are available, holds them aligned with the matrix columns.
+
+    The matrix, index, similarity, content and id maps are never modified
+    after construction: the id lists and maps are copied from the store, and
+    compaction builds new ones (an index's update() returns a new index).
+    store is not part of that; it is the mutable delta layer shared by every
+    snapshot of a generation, written only by delta application, compaction
+    and the retrain replay, and never read when scoring a request.
+
+    Request handlers read the current snapshot once and use only that object,
+    so a retrain or compaction that swaps in a new snapshot can never pair a
+    new index map with an old model. version is unique to each snapshot, so
+    unlike generation it also changes on compaction.
+    """
+
+    def __init__(self, store, model, matrix, generation, trained_at=None, similarity=None, content=None):
+        self.store = store
+        (
+            self.user_ids,
+            self.event_ids,
+            self.user_id_to_index_map,
+            self.event_id_to_index_map,
+            self.event_ref_to_index_map
+        ) = store.freeze(*matrix.shape)
+        self.model = model
+        self.matrix = matrix
+        self.similarity = similarity
+        self.content = content
+        self.generation = generation
+        self.trained_at = trained_at if trained_at is not None else time.time()
+        self.version = uuid.uuid4().hex
+
+    @classmethod
+    def fit(cls, store, generation, trained_at=None, index=None, similarity=None, similarity_top_m=50, workers=None,
+            content=None):
+        """Builds whichever of the neighbor index and similarity matrix is not passed in."""
+        matrix = store.matrix
+        if index is None:
+            index = index_from_env().build(matrix)
+        if similarity is None:
+            similarity = item_similarity(matrix, top_m=similarity_top_m, workers=workers)
+        return cls(store, index, matrix, generation, trained_at, similarity, content)
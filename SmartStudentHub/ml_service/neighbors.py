@@ -0,0 +1,322 @@
+import argparse
+import copy
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+PARAMS_FILE = 'params.json'
+
+
+class BruteForceIndex:
+    """
+    Exact cosine neighbors over the raw interaction rows. Like HnswIndex, a
+    fitted index is never modified: update() returns a new one, so requests
+    still querying the old index are unaffected.
+    """
+
+    name = 'brute'
+
+    def __init__(self):
+        self._model = None
+
+    @property
+    def params(self):
+        return {'backend': self.name}
+
+    def build(self, matrix):
+        self._model = NearestNeighbors(metric='cosine', algorithm='brute')
+        self._model.fit(matrix)
+        return self
+
+    def update(self, matrix, rows):
+        return type(self)().build(matrix)
+
+    def kneighbors(self, vectors, n_neighbors):
+        return self._model.kneighbors(vectors, n_neighbors=n_neighbors)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, PARAMS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.params, f)
+
+    @classmethod
+    def load(cls, directory, matrix, params):
+        return cls().build(matrix)
+
+
+class HnswIndex:
+    """
+    Approximate cosine neighbors: users are embedded with a truncated SVD of the
+    interaction matrix and searched in an HNSW graph. Queries are projected with
+    the same SVD components, so any sparse interaction row can be looked up.
+    The graph returns `rerank` times more candidates than asked for, which are
+    then re-ordered by exact cosine distance on the sparse rows.
+    """
+
+    name = 'hnsw'
+
+    def __init__(self, n_components=64, m=16, ef_construction=200, ef=64, rerank=8, random_state=0, num_threads=-1):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for the hnsw neighbor index.")
+        self.n_components = n_components
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.rerank = rerank
+        self.random_state = random_state
+        self.num_threads = num_threads
+        self.components = None
+        self._index = None
+        self._matrix = None
+        self._norms = None
+
+    @property
+    def params(self):
+        return {
+            'backend': self.name,
+            'n_components': self.n_components,
+            'm': self.m,
+            'ef_construction': self.ef_construction,
+            'ef': self.ef,
+            'rerank': self.rerank,
+            'random_state': self.random_state
+        }
+
+    def _attach(self, matrix):
+        self._matrix = matrix
+        self._norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+
+    def embed(self, vectors):
+        # Events added after the SVD was fit have no component weights yet.
+        n_fitted_events = self.components.shape[1]
+        if vectors.shape[1] > n_fitted_events:
+            vectors = vectors[:, :n_fitted_events]
+        embeddings = np.asarray(vectors @ self.components.T, dtype=np.float32)
+        return np.ascontiguousarray(embeddings)
+
+    def build(self, matrix):
+        n_users, n_events = matrix.shape
+        n_components = max(1, min(self.n_components, n_events - 1, n_users - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=self.random_state)
+        svd.fit(matrix)
+        self.components = np.ascontiguousarray(svd.components_, dtype=np.float32)
+
+        self._index = hnswlib.Index(space='cosine', dim=self.components.shape[0])
+        self._index.init_index(max_elements=max(n_users, 1), ef_construction=self.ef_construction, M=self.m)
+        self._index.set_num_threads(self.num_threads)
+        if n_users:
+            self._index.add_items(self.embed(matrix), np.arange(n_users))
+        self._index.set_ef(self.ef)
+        self._attach(matrix)
+        return self
+
+    def update(self, matrix, rows):
+        """
+        A copy of the index with the given rows re-embedded and the graph grown
+        for new users. The graph is copied first, so requests still querying
+        this index never see it half-updated.
+        """
+        updated = copy.copy(self)
+        updated._index = copy.deepcopy(self._index)
+        updated._index.set_num_threads(self.num_threads)
+        n_users = matrix.shape[0]
+        if n_users > updated._index.get_max_elements():
+            updated._index.resize_index(max(n_users, int(updated._index.get_max_elements() * 1.5)))
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows):
+            updated._index.add_items(self.embed(matrix[rows]), rows)
+        updated._attach(matrix)
+        return updated
+
+    def kneighbors(self, vectors, n_neighbors):
+        n_neighbors = min(n_neighbors, self._index.get_current_count())
+        n_candidates = min(n_neighbors * max(self.rerank, 1), self._index.get_current_count())
+        # knn_query searches with max(ef, k), so ef never has to be raised on
+        # the shared graph for a larger query.
+        candidates, distances = self._index.knn_query(self.embed(vectors), k=n_candidates)
+        candidates = candidates.astype(np.intp)
+        if n_candidates == n_neighbors:
+            return distances, candidates
+
+        # Exact cosine distance between each query and its candidates.
+        vectors = vectors.tocsr()
+        query_norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1), dtype=np.float32).ravel())
+        query_rows = np.repeat(np.arange(candidates.shape[0]), n_candidates)
+        dots = np.asarray(
+            self._matrix[candidates.ravel()].multiply(vectors[query_rows]).sum(axis=1), dtype=np.float32
+        ).reshape(candidates.shape)
+        denominators = self._norms[candidates] * query_norms[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = np.where(denominators > 0, 1.0 - dots / denominators, 1.0).astype(np.float32)
+
+        order = np.argsort(distances, axis=1, kind='stable')[:, :n_neighbors]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'components.npy'), self.components, allow_pickle=False)
+        self._index.save_index(os.path.join(directory, 'hnsw.index'))
+        with open(os.path.join(directory, PARAMS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.params, f)
+
+    @classmethod
+    def load(cls, directory, matrix, params):
+        index = cls(
+            n_components=params['n_components'],
+            m=params['m'],
+            ef_construction=params['ef_construction'],
+            ef=params['ef'],
+            rerank=params.get('rerank', 8),
+            random_state=params['random_state']
+        )
+        index.components = np.load(os.path.join(directory, 'components.npy'), allow_pickle=False)
+        index._index = hnswlib.Index(space='cosine', dim=index.components.shape[0])
+        index._index.load_index(os.path.join(directory, 'hnsw.index'), max_elements=max(matrix.shape[0], 1))
+        index._index.set_ef(index.ef)
+        index._attach(matrix)
+        return index
+
+
+BACKENDS = {BruteForceIndex.name: BruteForceIndex, HnswIndex.name: HnswIndex}
+
+
+def index_from_env():
+    """Builds an unfitted index from NEIGHBOR_INDEX and the HNSW_* settings."""
+    backend = os.getenv('NEIGHBOR_INDEX', 'brute').lower()
+    if backend == HnswIndex.name:
+        if hnswlib is not None:
+            return HnswIndex(
+                n_components=int(os.getenv('HNSW_COMPONENTS', '64')),
+                m=int(os.getenv('HNSW_M', '16')),
+                ef_construction=int(os.getenv('HNSW_EF_CONSTRUCTION', '200')),
+                ef=int(os.getenv('HNSW_EF', '64')),
+                rerank=int(os.getenv('HNSW_RERANK', '8'))
+            )
+        logger.warning("hnswlib is not installed. Falling back to the brute neighbor index.")
+    elif backend != BruteForceIndex.name:
+        logger.warning(f"Unknown NEIGHBOR_INDEX '{backend}'. Falling back to the brute neighbor index.")
+    return BruteForceIndex()
+
+
+def load_index(directory, matrix):
+    with open(os.path.join(directory, PARAMS_FILE), encoding='utf-8') as f:
+        params = json.load(f)
+    return BACKENDS[params['backend']].load(directory, matrix, params)
+
+
+def recall_report(matrix, approximate, k=20, sample=1000, random_state=0):
+    """Compares approximate neighbors against exact brute-force neighbors for sampled users."""
+    rng = np.random.default_rng(random_state)
+    rows = rng.choice(matrix.shape[0], size=min(sample, matrix.shape[0]), replace=False)
+    queries = matrix[rows]
+    k = min(k, matrix.shape[0])
+
+    exact = BruteForceIndex().build(matrix)
+    started = time.perf_counter()
+    exact_distances, exact_indices = exact.kneighbors(queries, k)
+    exact_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _, approximate_indices = approximate.kneighbors(queries, k)
+    approximate_seconds = time.perf_counter() - started
+
+    # Users often tie at the k-th distance, so an approximate neighbor counts
+    # as a hit whenever it is at least as close as the exact k-th neighbor.
+    normalized = normalize(matrix)
+    hits = 0
+    for i, row in enumerate(rows):
+        candidates = approximate_indices[i][approximate_indices[i] < matrix.shape[0]]
+        similarities = np.asarray(normalized[candidates] @ normalized[row].T.toarray()).ravel()
+        hits += int(np.sum(1.0 - similarities <= exact_distances[i, -1] + 1e-6))
+
+    return {
+        'params': approximate.params,
+        'users': int(matrix.shape[0]),
+        'events': int(matrix.shape[1]),
+        'queries': int(len(rows)),
+        'k': int(k),
+        'recall': hits / float(len(rows) * k) if len(rows) else 0.0,
+        'exact_ms_per_query': 1000 * exact_seconds / max(len(rows), 1),
+        'approximate_ms_per_query': 1000 * approximate_seconds / max(len(rows), 1)
+    }
+
+
+def synthetic_matrix(n_users, n_events, mean_registrations=5, random_state=0):
+    """Random user x event matrix with power-law event popularity."""
+    from interactions import INDEX_DTYPE, INTERACTION_DTYPE
+    from scipy.sparse import csr_matrix
+
+    rng = np.random.default_rng(random_state)
+    popularity = 1.0 / np.arange(1, n_events + 1) ** 1.1
+    popularity /= popularity.sum()
+    counts = np.maximum(rng.poisson(mean_registrations, n_users), 1)
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(INDEX_DTYPE)
+    indices = rng.choice(n_events, size=int(indptr[-1]), p=popularity).astype(INDEX_DTYPE)
+    matrix = csr_matrix((np.ones(len(indices), dtype=INTERACTION_DTYPE), indices, indptr), shape=(n_users, n_events))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall of the HNSW neighbor index against exact search.")
+    parser.add_argument('--model-dir', help="Model artifact to evaluate. Defaults to synthetic data.")
+    parser.add_argument('--users', type=int, default=100000, help="Synthetic users.")
+    parser.add_argument('--events', type=int, default=2000, help="Synthetic events.")
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--sample', type=int, default=1000)
+    parser.add_argument('--components', type=int, default=64)
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=200)
+    parser.add_argument('--ef', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--rerank', type=int, default=8)
+    parser.add_argument('--output', help="Write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    if args.model_dir:
+        from artifact import load_artifact
+        matrix = load_artifact(args.model_dir)['matrix']
+    else:
+        matrix = synthetic_matrix(args.users, args.events)
+
+    started = time.perf_counter()
+    index = HnswIndex(
+        n_components=args.components,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        rerank=args.rerank
+    ).build(matrix)
+    build_seconds = time.perf_counter() - started
+
+    reports = []
+    for ef in args.ef:
+        index.ef = ef
+        index._index.set_ef(ef)
+        report = recall_report(matrix, index, k=args.k, sample=args.sample)
+        report['build_seconds'] = build_seconds
+        reports.append(report)
+        print(
+            f"ef={ef:<4} recall@{report['k']}={report['recall']:.3f} "
+            f"exact={report['exact_ms_per_query']:.3f}ms approximate={report['approximate_ms_per_query']:.3f}ms"
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def fingerprint(registered_events):
+    """Order-independent digest of a user's registered event ObjectIds."""
+    digest = hashlib.blake2b(digest_size=8)
+    for event_ref in sorted({str(event_ref) for event_ref in registered_events or []}):
+        digest.update(event_ref.encode())
+    return digest.hexdigest()
+
+
+def etag_for(payload):
+    """Strong ETag for a serialized response body."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return f'"{hashlib.blake2b(payload, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value names etag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResultCache:
+    """
+    LRU cache of serialized /recommend bodies with a TTL.
+
+    Keys start with the user id so that invalidate_user() can drop every
+    entry of one user. Memory is bounded by both the number of entries and
+    the total size of the cached payloads; max_entries=0 disables the cache.
+    requests and evictions are optional metrics Counters labelled by result
+    ('hit' / 'miss') and by reason ('capacity' / 'expired' / 'invalidated').
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=300.0, requests=None, evictions=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._requests = requests
+        self._evictions = evictions
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns (payload, etag) for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key, 'expired')
+                entry = None
+            if entry is None:
+                self._count(self._requests, 'miss')
+                return None
+            self._entries.move_to_end(key)
+            self._count(self._requests, 'hit')
+            return entry[0], entry[1]
+
+    def put(self, key, payload, etag):
+        if not self.enabled or len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = (payload, etag, time.monotonic())
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            self.bytes += len(payload)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), 'capacity')
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key, 'invalidated')
+
+    def clear(self):
+        with self._lock:
+            self._count(self._evictions, 'invalidated', amount=len(self._entries))
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.bytes = 0
+
+    def _remove(self, key, reason):
+        payload, _, _ = self._entries.pop(key)
+        self.bytes -= len(payload)
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+        if reason is not None:
+            self._count(self._evictions, reason)
+
+    @staticmethod
+    def _count(counter, label, amount=1):
+        if counter is not None and amount:
+            counter.inc(label, amount=amount)
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class RetrainWorker:
+    """
+    Runs model builds on a single background thread.
+
+    A request that arrives while a build is queued joins that queued job; one
+    that arrives while a build is running queues exactly one follow-up build.
+    The worker waits `debounce` seconds before starting each build so that a
+    burst of requests collapses into a single job.
+    """
+
+    def __init__(self, build, debounce=0.0, history=100):
+        self._build = build
+        self._debounce = debounce
+        self._history = history
+        self._jobs = OrderedDict()
+        self._queued = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+
+    @property
+    def busy(self):
+        return self._running
+
+    def submit(self):
+        with self._lock:
+            if self._queued is not None:
+                self._queued['coalesced'] += 1
+                return dict(self._queued)
+
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'status': 'queued',
+                'requested_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'coalesced': 0
+            }
+            self._jobs[job['job_id']] = job
+            while len(self._jobs) > self._history:
+                self._jobs.popitem(last=False)
+            self._queued = job
+
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, name='retrain-worker', daemon=True).start()
+            return dict(job)
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job has finished and returns its final status."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] in ('succeeded', 'failed'):
+                    return dict(job) if job else None
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return dict(job)
+                self._done.wait(remaining)
+
+    def _run(self):
+        while True:
+            if self._debounce:
+                time.sleep(self._debounce)
+
+            with self._lock:
+                job = self._queued
+                if job is None:
+                    self._running = False
+                    return
+                self._queued = None
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+
+            try:
+                success = self._build()
+            except Exception as e:
+                logger.error(f"Retrain job {job['job_id']} failed: {str(e)}")
+                success = False
+
+            with self._lock:
+                job['status'] = 'succeeded' if success else 'failed'
+                job['finished_at'] = time.time()
+                self._done.notify_all()
@@ -0,0 +1,111 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def neighbor_scores(interaction_matrix, neighbor_indices, distances, skip_rows=()):
+    """
+    Scores every event as the similarity-weighted sum of the neighbors' rows.
+
+    distances are cosine distances from kneighbors, so each neighbor weighs
+    1 - distance. Rows listed in skip_rows (the querying user) are ignored.
+    """
+    neighbor_indices = np.asarray(neighbor_indices).ravel()
+    weights = 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+
+    keep = (neighbor_indices < interaction_matrix.shape[0]) & (weights > 0)
+    if len(skip_rows):
+        keep &= ~np.isin(neighbor_indices, skip_rows)
+
+    neighbor_rows = interaction_matrix[neighbor_indices[keep]]
+    return np.asarray(neighbor_rows.T @ weights[keep], dtype=np.float32).ravel()
+
+
+def batch_neighbor_scores(interaction_matrix, neighbor_indices, distances, skip_rows=None):
+    """
+    Batched neighbor_scores: one row of event scores per query.
+
+    neighbor_indices and distances are the (n_queries, k) arrays returned by
+    kneighbors. skip_rows holds each query's own matrix row, or -1.
+    """
+    neighbor_indices = np.asarray(neighbor_indices)
+    n_queries, k = neighbor_indices.shape
+    weights = 1.0 - np.asarray(distances, dtype=np.float32)
+
+    rows = np.repeat(np.arange(n_queries), k)
+    columns = neighbor_indices.ravel()
+    weights = weights.ravel()
+
+    keep = (columns < interaction_matrix.shape[0]) & (weights > 0)
+    if skip_rows is not None:
+        keep &= columns != np.repeat(np.asarray(skip_rows), k)
+
+    weight_matrix = csr_matrix(
+        (weights[keep], (rows[keep], columns[keep])),
+        shape=(n_queries, interaction_matrix.shape[0])
+    )
+    return (weight_matrix @ interaction_matrix).tocsr()
+
+
+def _rank(columns, values, n):
+    candidates = values > 0
+    columns, values = columns[candidates], values[candidates]
+    if len(columns) > n:
+        # Keep every value tied with the n-th best so ties break by column below.
+        threshold = -np.partition(-values, n - 1)[n - 1]
+        best = values >= threshold
+        columns, values = columns[best], values[best]
+    return columns[np.lexsort((columns, -values))][:n]
+
+
+def top_n(scores, n, exclude_columns=(), mask=None):
+    """
+    Returns up to n column indices with a positive score, best first. Columns
+    that are False in mask, a boolean array over all columns, are never returned.
+    """
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    scores = np.array(scores, dtype=np.float32, copy=True)
+    if len(exclude_columns):
+        scores[np.asarray(exclude_columns)] = 0
+    if mask is not None:
+        scores[~mask[:len(scores)]] = 0
+
+    return _rank(np.arange(len(scores)), scores, n)
+
+
+def top_n_rows(scores, n, exclude=None, mask=None):
+    """
+    top_n for every row of a sparse or dense score matrix. Entries that are
+    non-zero in exclude (typically the queries' own interaction rows), or in
+    a column that is False in mask, are dropped.
+    """
+    if isinstance(scores, np.ndarray):
+        exclude = exclude.tocsr() if exclude is not None else None
+        return [
+            top_n(
+                row,
+                n,
+                exclude_columns=exclude.indices[exclude.indptr[i]:exclude.indptr[i + 1]] if exclude is not None else (),
+                mask=mask
+            )
+            for i, row in enumerate(scores)
+        ]
+
+    scores = scores.tocsr()
+    if exclude is not None:
+        scores = (scores - scores.multiply(exclude != 0)).tocsr()
+        scores.eliminate_zeros()
+    if mask is not None:
+        scores = scores.copy() if exclude is None else scores
+        scores.data[~mask[scores.indices]] = 0
+        scores.eliminate_zeros()
+
+    results = []
+    for i in range(scores.shape[0]):
+        if n <= 0:
+            results.append(np.empty(0, dtype=np.intp))
+            continue
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        results.append(_rank(scores.indices[start:end], scores.data[start:end], n))
+    return results
@@ -0,0 +1,61 @@
+"""
+JSON encoding for response bodies. Uses orjson when it is installed and the
+standard library otherwise; both write compact UTF-8 JSON bytes with keys in
+insertion order, and render dates the way Flask's JSON provider does.
+
+A Fragment is JSON serialized ahead of time, such as an event cached by the
+catalog, and is copied into the output verbatim instead of being encoded
+again on every response.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Fragment(bytes):
+    """Pre-serialized JSON, spliced into dumps() output as is."""
+    __slots__ = ()
+
+
+def default(value):
+    if isinstance(value, datetime.date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def _encode(value):
+        return orjson.dumps(value, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+else:
+    _encoder = json.JSONEncoder(default=default, ensure_ascii=False, separators=(',', ':'))
+
+    def _encode(value):
+        return _encoder.encode(value).encode()
+
+
+def dumps(body):
+    """Serializes body to JSON bytes, splicing in any Fragments it holds."""
+    if isinstance(body, Fragment):
+        return body
+    if isinstance(body, dict):
+        return b'{' + b','.join(
+            _encode(key if isinstance(key, str) else str(key)) + b':' + dumps(value) for key, value in body.items()
+        ) + b'}'
+    if isinstance(body, (list, tuple)):
+        return b'[' + b','.join(dumps(value) for value in body) + b']'
+    return _encode(body)
+
+
+def fragment(value):
+    """Serializes a value once, for reuse across responses."""
+    return Fragment(_encode(value))
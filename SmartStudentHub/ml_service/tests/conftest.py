@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+
+import pytest
+
+ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_SERVICE_DIR)
+
+
+@pytest.fixture
+def documents():
+    from benchmarks.synthetic import generate
+    return generate(users=300, events=60, organizations=5, seed=1)
+
+
+@pytest.fixture
+def service(documents, tmp_path, monkeypatch):
+    """
+    ml_recommender trained on a small synthetic dataset in the benchmarks'
+    in-memory Mongo stand-in, with its model files under tmp_path. The module
+    connects at import time, so the stand-in is patched in before the first import.
+    """
+    monkeypatch.chdir(tmp_path)
+    for name, value in {
+        'MODEL_DIR': 'model',
+        'MATERIALIZE_RECOMMENDATIONS': 'false',
+        'RETRAIN_DEBOUNCE': '0',
+        'CATALOG_REFRESH_INTERVAL': '3600',
+        'UPCOMING_ONLY': 'false',
+        'VECTOR_STORE_DIR': str(tmp_path / 'vector_store')
+    }.items():
+        os.environ.setdefault(name, value)
+
+    import pymongo
+    from benchmarks.fake_mongo import FakeMongoClient
+    monkeypatch.setattr(pymongo, 'MongoClient', FakeMongoClient)
+    import ml_recommender
+    from benchmarks.synthetic import populate
+
+    # Requests would otherwise start a warm-up that reloads the model from disk.
+    finished = threading.Thread(target=lambda: None)
+    finished.start()
+    finished.join()
+    monkeypatch.setattr(ml_recommender, 'warm_up_thread', finished)
+    monkeypatch.setattr(ml_recommender, 'current_model', None)
+    monkeypatch.setattr(ml_recommender, 'materialized_recommendations', None)
+    ml_recommender.result_cache.clear()
+
+    populate(ml_recommender.db, documents)
+    ml_recommender.event_catalog.load()
+    assert ml_recommender.train_model()
+    yield ml_recommender
+    ml_recommender.event_catalog.stop_polling()
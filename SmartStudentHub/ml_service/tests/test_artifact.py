@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from artifact import load_artifact, save_artifact
+
+
+def save(model_dir, value, keep=2):
+    matrix = csr_matrix(np.full((3, 2), value, dtype=np.float32))
+
+    def write_extras(version_dir):
+        # Widen the window in which another save could touch this version.
+        time.sleep(0.01)
+        with open(os.path.join(version_dir, 'extra.txt'), 'w') as f:
+            f.write(str(value))
+
+    return save_artifact(model_dir, matrix, ['u0', 'u1', 'u2'], ['e0', 'e1'], ['r0', 'r1'],
+                         generation=1, trained_at=1000.0, write_extras=write_extras, keep=keep)
+
+
+def test_saves_with_the_same_generation_get_their_own_versions(tmp_path):
+    model_dir = str(tmp_path)
+    first = save(model_dir, 1)
+    second = save(model_dir, 2)
+
+    assert first != second
+    artifact = load_artifact(model_dir)
+    assert artifact['path'] == second
+    assert artifact['matrix'].toarray().max() == 2
+    # The earlier version is still intact for readers that have it mapped.
+    with open(os.path.join(first, 'extra.txt')) as f:
+        assert f.read() == '1'
+
+
+def test_concurrent_saves_leave_a_loadable_artifact(tmp_path):
+    model_dir = str(tmp_path)
+    errors = []
+
+    def run(value):
+        try:
+            save(model_dir, value, keep=1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(value,)) for value in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    artifact = load_artifact(model_dir)
+    with open(os.path.join(artifact['path'], 'extra.txt')) as f:
+        assert artifact['matrix'].toarray().max() == int(f.read())
+    assert [entry for entry in os.listdir(model_dir) if entry.endswith('.tmp')] == []
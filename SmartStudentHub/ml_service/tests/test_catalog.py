@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from benchmarks.fake_mongo import FakeDatabase
+from benchmarks.synthetic import generate, populate
+from catalog import EventCatalog
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    populate(db, generate(users=0, events=10, organizations=2, seed=2))
+    return db
+
+
+@pytest.fixture
+def catalog(db):
+    catalog = EventCatalog(db['events'], db['organizations'])
+    catalog.load()
+    return catalog
+
+
+def save(collection, document, **fields):
+    """Writes document back with fields changed and updatedAt moved on, as a Mongoose save does."""
+    updated_at = document['updatedAt'] + datetime.timedelta(minutes=1)
+    collection.insert_one(dict(document, updatedAt=updated_at, **fields))
+
+
+def test_refresh_without_changes_keeps_the_version(catalog):
+    version = catalog.version
+    assert not catalog.refresh()
+    assert catalog.version == version
+
+
+def test_refresh_picks_up_updated_events_and_organizations(db, catalog):
+    event = db['events'].find_one({'eventId': '1'})
+    organization = db['organizations'].find_one({'_id': event['organization']})
+    catalog.fragment('1')
+    version = catalog.version
+
+    save(db['events'], event, title="Renamed event", date='01-02-2026')
+    save(db['organizations'], organization, name="Renamed organization")
+
+    assert catalog.refresh()
+    assert catalog.version == version + 1
+    assert catalog.get('1')['title'] == "Renamed event"
+    assert catalog.get('1')['organization'] == {'name': "Renamed organization"}
+    assert b"Renamed event" in catalog.fragment('1')
+    assert catalog.event_days('1') == (datetime.date(2026, 2, 1).toordinal(),) * 2
+
+
+def test_refresh_ignores_saves_that_change_no_served_field(db, catalog):
+    version = catalog.version
+    save(db['events'], db['events'].find_one({'eventId': '2'}), registeredUsers=['user'])
+    assert not catalog.refresh()
+    assert catalog.version == version
+
+
+def test_refresh_adds_new_events(db, catalog):
+    template = db['events'].find_one({'eventId': '1'})
+    save(db['events'], dict(template, _id='new-ref'), eventId='new', title="New event")
+
+    assert catalog.refresh()
+    assert len(catalog) == 11
+    assert catalog.ref_for('new') == 'new-ref'
+    assert catalog.get('new')['title'] == "New event"
+
+
+def test_refresh_reloads_after_deletions(db, catalog):
+    deleted = db['events'].find_one({'eventId': '3'})
+    catalog.fragment('3')
+    version = catalog.version
+    db['events'].delete_many({'_id': deleted['_id']})
+
+    assert catalog.refresh()
+    assert catalog.version > version
+    assert len(catalog) == 9
+    assert catalog.get('3') is None and catalog.fragment('3') is None
+    assert catalog.ref_for('3') is None and catalog.event_id_for(deleted['_id']) is None
+    assert catalog.event_days('3') is None
@@ -0,0 +1,184 @@
+import threading
+
+
+def register(user, event):
+    return {"type": "register", "user_id": str(user['_id']), "event_ref": str(event['_id']),
+            "event_id": event['eventId']}
+
+
+def test_compaction_while_recommending(service, documents, monkeypatch):
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1)
+    users = [user for user in documents['users'] if user['registeredEvents']]
+    errors = []
+    stop = threading.Event()
+
+    def recommend():
+        while not stop.is_set():
+            for user in users[:10]:
+                body, status = service.recommend_for_user(
+                    service.current_model, str(user['_id']), user['registeredEvents'], 5, 'user'
+                )
+                if status != 200:
+                    errors.append(body)
+
+    thread = threading.Thread(target=recommend)
+    thread.start()
+    try:
+        for i, user in enumerate(users[:20]):
+            body, status = service.apply_interactions(register(user, documents['events'][i]))
+            assert status == 200 and body['compacted']
+    finally:
+        stop.set()
+        thread.join()
+
+    assert errors == []
+
+
+def test_compaction_runs_once_for_deltas_seen_by_concurrent_requests(service, documents, monkeypatch):
+    monkeypatch.setattr(service, 'MATERIALIZE', False)
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1000)
+    user = next(user for user in documents['users'] if user['registeredEvents'])
+    body, status = service.apply_interactions(register(user, documents['events'][0]))
+    assert status == 200 and not body['compacted']
+
+    # Two requests both saw the delta due outside swap_lock; the second finds it folded in.
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1)
+    saved = []
+    monkeypatch.setattr(service, 'save_model', saved.append)
+    assert service.compact_interactions() is True
+    assert service.compact_interactions() is False
+    assert len(saved) == 1
+    assert service.current_model.store.pending == 0
+
+
+def test_compaction_extends_content_scores_for_new_events(service, documents, monkeypatch):
+    import numpy as np
+    from content import ContentScorer, EventEmbeddings
+
+    snapshot = service.current_model
+    n_events = snapshot.matrix.shape[1]
+    vectors = np.eye(n_events + 2, dtype=np.float32)
+    embeddings = EventEmbeddings(snapshot.event_ids + ['new-event'], vectors[:n_events + 1])
+    snapshot.content = ContentScorer(embeddings.align(snapshot.event_ids), 0.3)
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1)
+    monkeypatch.setattr(service, 'save_model', lambda snapshot: None)
+    user = next(user for user in documents['users'] if user['registeredEvents'])
+
+    def register_new(event_id):
+        delta = {"type": "register", "user_id": str(user['_id']), "event_ref": f"ref-{event_id}", "event_id": event_id}
+        body, status = service.apply_interactions(delta)
+        assert status == 200 and body['compacted']
+        return service.current_model
+
+    monkeypatch.setattr(service, 'load_event_embeddings', lambda: embeddings)
+    compacted = register_new('new-event')
+    assert compacted.content.n_columns == compacted.matrix.shape[1] == n_events + 1
+    np.testing.assert_array_equal(compacted.content.embeddings, vectors[:n_events + 1])
+
+    # Without embeddings to align from, the scores keep their rows and the new column gets a zero row.
+    monkeypatch.setattr(service, 'load_event_embeddings', lambda: None)
+    compacted = register_new('unembedded-event')
+    assert compacted.content.n_columns == compacted.matrix.shape[1] == n_events + 2
+    np.testing.assert_array_equal(compacted.content.embeddings[:n_events + 1], vectors[:n_events + 1])
+    assert not compacted.content.embeddings[n_events + 1].any()
+
+
+def test_compaction_keeps_cached_results_and_retrain_clears_them(service, documents, monkeypatch):
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1)
+    monkeypatch.setattr(service, 'save_model', lambda snapshot: None)
+    users = [user for user in documents['users'] if user['registeredEvents']]
+    cached, changed = users[0], users[1]
+    computed = []
+    recommend_for_user = service.recommend_for_user
+
+    def counting(*args, **kwargs):
+        computed.append(args[1])
+        return recommend_for_user(*args, **kwargs)
+
+    monkeypatch.setattr(service, 'recommend_for_user', counting)
+
+    def recommend(user):
+        payload, status, _ = service.cached_recommend_for_user(
+            service.current_model, str(user['_id']), user['registeredEvents'], 5, 'user'
+        )
+        assert status == 200
+
+    recommend(cached)
+    body, status = service.apply_interactions(register(changed, documents['events'][0]))
+    assert status == 200 and body['compacted']
+    recommend(cached)
+    assert computed == [str(cached['_id'])]
+
+    assert service.train_model()
+    assert len(service.result_cache) == 0
+    recommend(cached)
+    assert computed == [str(cached['_id'])] * 2
+
+
+def test_compaction_rematerializes_only_changed_rows(service, documents, monkeypatch):
+    import numpy as np
+    import materialized
+
+    monkeypatch.setattr(service, 'MATERIALIZE', True)
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 2)
+    monkeypatch.setattr(service, 'save_model', lambda snapshot: None)
+    monkeypatch.setattr(service, 'materialized_refresher', None)
+    snapshot = service.current_model
+    service.install_materialized(service.build_materialized())
+    before = service.materialized_recommendations
+
+    computed = []
+    top_k_for_rows = materialized.top_k_for_rows
+
+    def counting(matrix, model, rows, *args, **kwargs):
+        computed.extend(rows.tolist())
+        return top_k_for_rows(matrix, model, rows, *args, **kwargs)
+
+    monkeypatch.setattr(materialized, 'top_k_for_rows', counting)
+    user = next(user for user in documents['users'] if user['registeredEvents'])
+    event = next(event for event in documents['events'] if event['_id'] not in user['registeredEvents'])
+    body, status = service.apply_interactions([
+        register(user, event),
+        {"type": "new_user", "user_id": 'new-user'}
+    ])
+    assert status == 200 and body['compacted']
+
+    row = snapshot.user_id_to_index_map[str(user['_id'])]
+    assert computed == [row, len(snapshot.user_ids)]
+    after = service.materialized_recommendations
+    assert after is not before and after.matches(service.current_model.matrix)
+    assert after.stale_user_ids == {}
+    assert after.user_ids[-1] == 'new-user'
+    unchanged = np.arange(len(before.user_ids)) != row
+    np.testing.assert_array_equal(after.columns[:len(before.user_ids)][unchanged], before.columns[unchanged])
+    # Rebuilt from scratch, the changed row comes out the same.
+    full = service.build_materialized()
+    np.testing.assert_array_equal(after.columns[row], full.columns[row])
+
+
+def test_deltas_applied_during_a_retrain_are_replayed_into_the_new_store(service, documents, monkeypatch):
+    monkeypatch.setattr(service, 'COMPACT_EVERY', 1000)
+    monkeypatch.setattr(service, 'save_model', lambda snapshot: None)
+    user = next(user for user in documents['users'] if user['registeredEvents'])
+    event = next(event for event in documents['events'] if event['_id'] not in user['registeredEvents'])
+    responses = []
+    fit_snapshot = service.fit_snapshot
+
+    def fit_while_a_delta_arrives(store, generation, *args, **kwargs):
+        # The registration is not in the users collection the build loaded.
+        responses.append(service.apply_interactions(register(user, event)))
+        return fit_snapshot(store, generation, *args, **kwargs)
+
+    monkeypatch.setattr(service, 'fit_snapshot', fit_while_a_delta_arrives)
+    previous = service.current_model
+    job = service.retrain_worker.submit()
+    assert service.retrain_worker.wait(job['job_id'], timeout=60)['status'] == 'succeeded'
+
+    assert [status for _, status in responses] == [200]
+    snapshot = service.current_model
+    assert snapshot is not previous and snapshot.generation == previous.generation + 1
+    assert service.replay_log is None
+    row = snapshot.user_id_to_index_map[str(user['_id'])]
+    column = snapshot.event_ref_to_index_map[str(event['_id'])]
+    assert column in snapshot.store.user_columns(row)
+    assert snapshot.store.pending == 1
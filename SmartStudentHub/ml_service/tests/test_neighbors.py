@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+import pytest
+
+from neighbors import BruteForceIndex, HnswIndex, hnswlib, synthetic_matrix
+
+BACKENDS = [
+    BruteForceIndex,
+    pytest.param(
+        lambda: HnswIndex(n_components=16, ef_construction=50),
+        marks=pytest.mark.skipif(hnswlib is None, reason="hnswlib is not installed")
+    )
+]
+
+
+def register(matrix, rows, column):
+    matrix = matrix.tolil()
+    for row in rows:
+        matrix[row, column] = 1
+    return matrix.tocsr()
+
+
+@pytest.mark.parametrize('make_index', BACKENDS)
+def test_update_returns_a_new_index_and_leaves_the_old_one_alone(make_index):
+    matrix = synthetic_matrix(500, 50)
+    index = make_index().build(matrix)
+    queries = matrix[:20]
+    before = index.kneighbors(queries, 10)
+
+    updated = index.update(register(matrix, range(20), 49), np.arange(20))
+
+    assert updated is not index
+    after = index.kneighbors(queries, 10)
+    np.testing.assert_array_equal(before[1], after[1])
+    np.testing.assert_allclose(before[0], after[0])
+
+
+@pytest.mark.parametrize('make_index', BACKENDS)
+def test_updates_while_querying(make_index):
+    matrix = synthetic_matrix(500, 50)
+    current = [make_index().build(matrix)]
+    queries = matrix[:50]
+    errors = []
+    stop = threading.Event()
+
+    def query():
+        while not stop.is_set():
+            try:
+                distances, indices = current[0].kneighbors(queries, 10)
+                assert indices.shape == (50, 10)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        for step in range(20):
+            rows = np.arange(step * 10, step * 10 + 10)
+            matrix = register(matrix, rows, step)
+            current[0] = current[0].update(matrix, rows)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from content import read_vector_store
+from vector_store import EmbeddingCache, HashEmbedder, VectorStore, page_content, sync_events
+
+hnswlib = pytest.importorskip('hnswlib')
+
+DIM = 16
+ORGANIZATIONS = {'org-1': "Fixture Society"}
+
+
+def event(event_id, title=None):
+    return {'eventId': event_id, 'title': title or f"Event {event_id}", 'organization': 'org-1', 'type': 'Talk',
+            'subtype': 'Education', 'date': '01-04-2025', 'location': 'Room 1', 'summary': "A talk."}
+
+
+@pytest.fixture
+def directory(tmp_path):
+    """An empty store laid out the way the chatbot's HNSWLib store writes it."""
+    with open(tmp_path / 'args.json', 'w', encoding='utf-8') as f:
+        json.dump({'space': 'cosine', 'numDimensions': DIM}, f)
+    with open(tmp_path / 'docstore.json', 'w', encoding='utf-8') as f:
+        json.dump([], f)
+    index = hnswlib.Index(space='cosine', dim=DIM)
+    index.init_index(max_elements=2, allow_replace_deleted=True)
+    index.save_index(str(tmp_path / 'hnswlib.index'))
+    return str(tmp_path)
+
+
+def stored_vectors(directory):
+    event_ids, vectors = read_vector_store(directory)
+    return dict(zip(event_ids, vectors))
+
+
+def expected_vector(event):
+    return HashEmbedder(DIM).embed([page_content(event, ORGANIZATIONS['org-1'])])[0]
+
+
+def sync(directory, events, **kwargs):
+    store = VectorStore.load(directory)
+    stats = sync_events(store, events, ORGANIZATIONS, HashEmbedder(DIM), **kwargs)
+    store.save()
+    return stats
+
+
+def test_sync_replaces_changed_adds_new_and_deletes_removed_events(directory):
+    stats = sync(directory, [event('1'), event('2'), event('3')])
+    assert stats == {'added': 3, 'replaced': 0, 'unchanged': 0, 'deleted': 0, 'embedded': 3}
+
+    changed, unchanged, new = event('1', title="Renamed"), event('2'), event('4')
+    stats = sync(directory, [changed, unchanged, new], removed=['3'])
+    assert stats == {'added': 1, 'replaced': 1, 'unchanged': 1, 'deleted': 1, 'embedded': 2}
+
+    vectors = stored_vectors(directory)
+    assert sorted(vectors) == ['1', '2', '4']
+    for stored in (changed, unchanged, new):
+        np.testing.assert_allclose(vectors[stored['eventId']], expected_vector(stored), atol=1e-6)
+
+    store = VectorStore.load(directory)
+    assert sorted(store.label_for) == ['1', '2', '4']
+    assert store.docstore[store.label_for['1']]['metadata']['title'] == "Renamed"
+    labels, _ = store.index.knn_query(expected_vector(changed), k=1)
+    assert str(labels[0][0]) == store.label_for['1']
+
+
+def test_sync_with_prune_drops_events_missing_from_the_collection(directory):
+    sync(directory, [event('1'), event('2')])
+    stats = sync(directory, [event('2')], prune=True)
+    assert stats['deleted'] == 1 and stats['unchanged'] == 1 and stats['embedded'] == 0
+    assert sorted(stored_vectors(directory)) == ['2']
+
+
+def test_embedding_cache_serves_texts_embedded_before(directory, tmp_path):
+    cache_path = str(tmp_path / 'embedding_cache.npz')
+    cache = EmbeddingCache(cache_path)
+    sync(directory, [event('1')], cache=cache)
+    cache.save()
+
+    # Removed and restored, the event's text comes from the cache instead of the embedder.
+    sync(directory, [], removed=['1'])
+    cache = EmbeddingCache(cache_path)
+    stats = sync(directory, [event('1')], cache=cache)
+    assert stats['added'] == 1 and stats['embedded'] == 0 and cache.hits == 1
+    np.testing.assert_allclose(stored_vectors(directory)['1'], expected_vector(event('1')), atol=1e-6)
+    assert os.path.exists(cache_path)
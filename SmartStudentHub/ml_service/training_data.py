@@ -0,0 +1,152 @@
+import argparse
+import logging
+import os
+
+import bson
+from bson import json_util
+
+from interactions import InteractionMatrixBuilder
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = {'_id': 1, 'eventId': 1}
+USER_FIELDS = {'_id': 1, 'registeredEvents': 1}
+SNAPSHOT_FORMATS = ('ndjson', 'bson')
+
+
+def batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MongoTrainingSource:
+    """Streams the training fields straight from the Mongo cursors."""
+
+    def __init__(self, events_collection, users_collection, batch_size=10000):
+        self.events_collection = events_collection
+        self.users_collection = users_collection
+        self.batch_size = batch_size
+
+    def __str__(self):
+        return 'mongo'
+
+    def events(self):
+        return self.events_collection.find({}, EVENT_FIELDS, batch_size=self.batch_size)
+
+    def users(self):
+        return self.users_collection.find({}, USER_FIELDS, batch_size=self.batch_size)
+
+
+class SnapshotTrainingSource:
+    """
+    Reads events and users from an exported snapshot directory holding
+    events.ndjson / users.ndjson (MongoDB extended JSON, one document per
+    line) or events.bson / users.bson (concatenated BSON, as written by
+    mongodump or export_snapshot).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        for fmt in SNAPSHOT_FORMATS:
+            if os.path.exists(os.path.join(directory, f"events.{fmt}")):
+                self.format = fmt
+                break
+        else:
+            raise FileNotFoundError(f"No events.ndjson or events.bson in {directory}")
+
+    def __str__(self):
+        return f"snapshot {self.directory} ({self.format})"
+
+    def _read(self, name):
+        path = os.path.join(self.directory, f"{name}.{self.format}")
+        if self.format == 'bson':
+            with open(path, 'rb') as f:
+                yield from bson.decode_file_iter(f)
+        else:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json_util.loads(line)
+
+    def events(self):
+        return self._read('events')
+
+    def users(self):
+        return self._read('users')
+
+
+def load_training_data(source, batch_size=10000):
+    """
+    Builds the training inputs from a source in one streaming pass per
+    collection. Returns (event_ids, event_ref_to_index, user_ids, matrix).
+    Users are consumed batch_size documents at a time, so memory beyond the
+    final matrix and id lists is bounded by one batch.
+    """
+    event_ids = []
+    event_ref_to_index = {}
+    for event in source.events():
+        event_ref_to_index[str(event['_id'])] = len(event_ids)
+        event_ids.append(event['eventId'])
+
+    builder = InteractionMatrixBuilder(event_ref_to_index, len(event_ids))
+    for batch in batched(source.users(), batch_size):
+        builder.add_users((str(user['_id']), user.get('registeredEvents', [])) for user in batch)
+
+    return event_ids, event_ref_to_index, builder.user_ids, builder.build()
+
+
+def _write_documents(path, documents, fmt):
+    count = 0
+    tmp_path = f"{path}.tmp"
+    if fmt == 'bson':
+        with open(tmp_path, 'wb') as f:
+            for document in documents:
+                f.write(bson.encode(document))
+                count += 1
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for document in documents:
+                f.write(json_util.dumps(document))
+                f.write('\n')
+                count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def export_snapshot(events_collection, users_collection, directory, fmt='ndjson', batch_size=10000):
+    """Writes the training fields of both collections to a snapshot directory."""
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unsupported snapshot format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    source = MongoTrainingSource(events_collection, users_collection, batch_size)
+    n_events = _write_documents(os.path.join(directory, f"events.{fmt}"), source.events(), fmt)
+    n_users = _write_documents(os.path.join(directory, f"users.{fmt}"), source.users(), fmt)
+    logger.info(f"Exported {n_events} events and {n_users} users to {directory}.")
+    return n_events, n_users
+
+
+def main():
+    import dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Export the recommender's training data for offline runs.")
+    parser.add_argument('directory', help="Snapshot directory to write.")
+    parser.add_argument('--format', choices=SNAPSHOT_FORMATS, default='ndjson')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    dotenv.load_dotenv()
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    db = client[os.getenv('DATABASE_NAME', 'test')]
+    export_snapshot(db['events'], db['users'], args.directory, args.format, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
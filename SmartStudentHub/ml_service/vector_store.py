@@ -0,0 +1,324 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import urllib.request
+
+import dotenv
+import numpy as np
+
+from content import EMBEDDING_DTYPE, _index_path
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE = 'embedding_cache.npz'
+EMBED_BATCH_SIZE = 32
+
+
+def page_content(event, organization_name=None):
+    """The text the backend's chatbot embeds for an event, character for character."""
+    organization = organization_name or (str(event['organization']) if event.get('organization') else '')
+    return (
+        f"\n          Title: {event.get('title') or 'No title'}"
+        f"\n          Organization: {organization or 'No organization'}"
+        f"\n          Type: {event.get('type') or 'No type'}"
+        f"\n          Date: {event.get('date') or 'No date'} "
+        f"\n          Location: {event.get('location') or 'No location'}"
+        f"\n          Summary: {event.get('summary') or 'No summary'}"
+        f"\n        "
+    )
+
+
+def event_document(event, organization_name=None):
+    """(eventId, pageContent, metadata) for an event, with the chatbot's metadata fields."""
+    metadata = {
+        key: event.get(key) for key in ('eventId', 'title', 'date', 'type', 'subtype') if event.get(key) is not None
+    }
+    return str(event['eventId']), page_content(event, organization_name), metadata
+
+
+class HashEmbedder:
+    """Deterministic stand-in embedder: a unit vector seeded by a hash of the text. Makes no network calls."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.name = f'hash-{dim}'
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        vectors = np.empty((len(texts), self.dim), dtype=EMBEDDING_DTYPE)
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+            vectors[row] = np.random.default_rng(seed).standard_normal(self.dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeds through Ollama's /api/embed, the model the chatbot uses, batch_size texts per request."""
+
+    def __init__(self, base_url='http://localhost:11434', model='nomic-embed-text', batch_size=EMBED_BATCH_SIZE,
+                 timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.name = model
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.calls = 0
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            request = urllib.request.Request(
+                f"{self.base_url}/api/embed",
+                data=json.dumps({'model': self.model, 'input': batch}).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                vectors.extend(json.load(response)['embeddings'])
+            self.calls += len(batch)
+        return np.asarray(vectors, dtype=EMBEDDING_DTYPE)
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by a hash of the embedder's name and the text, kept in one
+    .npz file, so text that was embedded once is never sent to the embedder again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._vectors = {}
+        self.hits = 0
+        if path and os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as cached:
+                    self._vectors = dict(zip(cached['keys'].tolist(), cached['vectors']))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable embedding cache: {str(e)}")
+
+    def __len__(self):
+        return len(self._vectors)
+
+    @staticmethod
+    def key(embedder_name, text):
+        return hashlib.sha256(f"{embedder_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def embed(self, texts, embedder):
+        """Embeddings for texts, calling embedder once for all the texts not in the cache."""
+        keys = [self.key(embedder.name, text) for text in texts]
+        missing = list({key: text for key, text in zip(keys, texts) if key not in self._vectors}.items())
+        self.hits += len(texts) - len(missing)
+        if missing:
+            vectors = embedder.embed([text for _, text in missing])
+            for (key, _), vector in zip(missing, vectors):
+                self._vectors[key] = np.asarray(vector, dtype=EMBEDDING_DTYPE)
+        return np.stack([self._vectors[key] for key in keys]) if keys else None
+
+    def save(self):
+        if not self.path or not self._vectors:
+            return
+        keys = list(self._vectors)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, keys=np.asarray(keys), vectors=np.stack([self._vectors[key] for key in keys]))
+        os.replace(tmp_path, self.path)
+
+
+class VectorStore:
+    """
+    The chatbot's LangChain HNSWLib store (args.json, docstore.json and
+    hnswlib.index), edited in place by eventId.
+
+    A changed event keeps its label and has its vector replaced; a new event
+    takes the slot of a deleted one when there is one, and a deleted event is
+    mark-deleted in the index and dropped from the docstore, so searches stop
+    returning it. Documents whose pageContent did not change are not embedded.
+    """
+
+    def __init__(self, directory, args, docstore, index):
+        self.directory = directory
+        self.args = args
+        self.docstore = docstore
+        self.index = index
+        self.label_for = {}
+        for label, document in docstore.items():
+            event_id = document.get('metadata', {}).get('eventId')
+            if event_id is not None:
+                self.label_for[str(event_id)] = label
+
+    @property
+    def dim(self):
+        return int(self.args['numDimensions'])
+
+    @classmethod
+    def load(cls, directory):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required to edit the vector store.")
+        with open(os.path.join(directory, 'args.json'), encoding='utf-8') as f:
+            args = json.load(f)
+        with open(os.path.join(directory, 'docstore.json'), encoding='utf-8') as f:
+            docstore = dict(json.load(f))
+        index = hnswlib.Index(space=args.get('space', 'cosine'), dim=int(args['numDimensions']))
+        index.load_index(_index_path(directory), allow_replace_deleted=True)
+        return cls(directory, args, docstore, index)
+
+    def upsert(self, documents, embedder, cache=None):
+        """
+        Adds or replaces (eventId, pageContent, metadata) documents. Returns
+        counts of added, replaced and unchanged documents.
+        """
+        stats = {'added': 0, 'replaced': 0, 'unchanged': 0}
+        pending = []
+        for event_id, content, metadata in documents:
+            label = self.label_for.get(event_id)
+            if label is not None and self.docstore[label].get('pageContent') == content:
+                self.docstore[label]['metadata'] = metadata
+                stats['unchanged'] += 1
+                continue
+            pending.append((event_id, content, metadata, label))
+        if not pending:
+            return stats
+
+        texts = [content for _, content, _, _ in pending]
+        vectors = (cache if cache is not None else EmbeddingCache()).embed(texts, embedder)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedder {embedder.name} returns {vectors.shape[1]} dimensions, "
+                             f"the vector store has {self.dim}.")
+
+        replaced = [row for row, item in enumerate(pending) if item[3] is not None]
+        added = [row for row, item in enumerate(pending) if item[3] is None]
+        if replaced:
+            self.index.add_items(vectors[replaced], [int(pending[row][3]) for row in replaced])
+        if added:
+            labels = self.index.get_ids_list()
+            next_label = max(labels) + 1 if labels else 0
+            new_labels = list(range(next_label, next_label + len(added)))
+            needed = self.index.get_current_count() + len(added)
+            if needed > self.index.get_max_elements():
+                self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+            self.index.add_items(vectors[added], new_labels, replace_deleted=True)
+            for row, label in zip(added, new_labels):
+                self.label_for[pending[row][0]] = str(label)
+
+        for event_id, content, metadata, _ in pending:
+            self.docstore[self.label_for[event_id]] = {'pageContent': content, 'metadata': metadata}
+        stats['added'] = len(added)
+        stats['replaced'] = len(replaced)
+        return stats
+
+    def delete(self, event_ids):
+        """Mark-deletes the documents of event_ids. Returns how many were present."""
+        deleted = 0
+        for event_id in event_ids:
+            label = self.label_for.pop(str(event_id), None)
+            if label is None:
+                continue
+            self.index.mark_deleted(int(label))
+            del self.docstore[label]
+            deleted += 1
+        return deleted
+
+    def save(self):
+        """Writes the index and the docstore, each through a temporary file and a rename."""
+        index_path = _index_path(self.directory)
+        self.index.save_index(f"{index_path}.tmp")
+        docstore_path = os.path.join(self.directory, 'docstore.json')
+        with open(f"{docstore_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(list(self.docstore.items()), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(f"{docstore_path}.tmp", docstore_path)
+        # hnswlib.index goes last: its mtime is what tells the recommender to reload.
+        os.replace(f"{index_path}.tmp", index_path)
+
+
+def sync_events(store, events, organization_names, embedder, cache=None, removed=(), prune=False):
+    """
+    Brings the store in line with events (documents from the events collection)
+    and drops removed eventIds. With prune, every stored event that is not in
+    events is dropped as well. Returns counts per action and the number of
+    texts sent to the embedder.
+    """
+    calls = embedder.calls
+    events = list(events)
+    documents = [
+        event_document(event, organization_names.get(str(event.get('organization')))) for event in events
+    ]
+    removed = set(map(str, removed))
+    if prune:
+        removed |= set(store.label_for) - {event_id for event_id, _, _ in documents}
+    # Deleting first frees index slots for the events added next.
+    deleted = store.delete(sorted(removed))
+    stats = store.upsert(documents, embedder, cache)
+    stats['deleted'] = deleted
+    stats['embedded'] = embedder.calls - calls
+    return stats
+
+
+def main():
+    from pymongo import MongoClient
+
+    dotenv.load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Update the vector store in place from the events collection, re-embedding only changed events."
+    )
+    parser.add_argument('--vector-store', default=os.getenv(
+        'VECTOR_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vector_store')
+    ))
+    parser.add_argument('--changes', help="JSON file with 'changed' and optionally 'removed' eventIds, such as "
+                                          "events_sink.changed.json. Without it every event is synced and "
+                                          "events missing from the collection are removed.")
+    parser.add_argument('--embedder', choices=['ollama', 'hash'], default='ollama',
+                        help="hash is a deterministic offline stand-in for testing.")
+    parser.add_argument('--ollama-url', default=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'))
+    parser.add_argument('--model', default='nomic-embed-text')
+    parser.add_argument('--batch-size', type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument('--cache', default=EMBEDDING_CACHE, help="Embedding cache file; '' disables it.")
+    args = parser.parse_args()
+
+    store = VectorStore.load(args.vector_store)
+    if args.embedder == 'hash':
+        embedder = HashEmbedder(store.dim)
+    else:
+        embedder = OllamaEmbedder(args.ollama_url, args.model, args.batch_size)
+    cache = EmbeddingCache(args.cache or None)
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    db = client[os.getenv('DATABASE_NAME', 'test')]
+    query = {}
+    removed = []
+    if args.changes:
+        with open(args.changes, encoding='utf-8') as f:
+            changes = json.load(f)
+        query = {'eventId': {'$in': changes.get('changed', [])}}
+        removed = changes.get('removed', [])
+    events = list(db['events'].find(query, {'eventId': 1, 'title': 1, 'organization': 1, 'type': 1, 'subtype': 1,
+                                            'date': 1, 'location': 1, 'summary': 1}))
+    organization_ids = {event['organization'] for event in events if event.get('organization') is not None}
+    organization_names = {
+        str(organization['_id']): organization.get('name')
+        for organization in db['organizations'].find({'_id': {'$in': list(organization_ids)}}, {'name': 1})
+    }
+    if args.changes:
+        # Changed eventIds that are gone from the collection were deleted.
+        found = {str(event['eventId']) for event in events}
+        removed += [event_id for event_id in changes.get('changed', []) if event_id not in found]
+
+    stats = sync_events(store, events, organization_names, embedder, cache, removed, prune=not args.changes)
+    store.save()
+    cache.save()
+    client.close()
+    logger.info(f"Vector store updated: {stats['added']} added, {stats['replaced']} replaced, "
+                f"{stats['deleted']} deleted, {stats['unchanged']} unchanged; "
+                f"{stats['embedded']} texts embedded, {cache.hits} served from the embedding cache.")
+
+
+if __name__ == '__main__':
+    main()
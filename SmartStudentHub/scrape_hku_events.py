@@ -1,51 +1,367 @@
+import argparse
+import hashlib
+import os
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import json
-import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import threading
 import time
 import random
 
-def scrape_hku_events():
-    base_url = "https://www.hku.hk/event/category.html"
-    
-    categories = [
-        "category_A",
-        "category_B",
-        "category_C",
-        "category_E",
-        "category_L",
-        "category_M",
-        "category_SC",
-        "category_SO",
-        "category_SR",
-        "category_O"
-    ]
-    
-    category_names = {
-        "category_A": "Architecture & Engineering",
-        "category_B": "Business & Economics",
-        "category_C": "Culture and Arts",
-        "category_E": "Education",
-        "category_L": "Law and Politics",
-        "category_M": "Medical & Health Care",
-        "category_SC": "Science & Technology",
-        "category_SO": "Social Development & Welfare",
-        "category_SR": "Sports and Recreation",
-        "category_O": "Others"
-    }
-    
-    required_fields = ['title', 'summary', 'description', 'date', 'time', 'organization', 'type']
-    
+from hku_event_parser import CATEGORY_NAMES, parse_event_pages
+
+BASE_URL = "https://www.hku.hk/event/category.html"
+DETAIL_BASE_URL = "https://hkuems1.hku.hk/hkuems/"
+
+# Requests per second allowed against each host; other hosts get DEFAULT_RATE.
+HOST_RATES = {
+    "www.hku.hk": 1.0,
+    "hkuems1.hku.hk": 2.0
+}
+DEFAULT_RATE = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CACHE_DIR = ".scrape_cache"
+EVENTS_OUTPUT = "hku_events.ndjson"
+
+
+def canonical_url(url):
+    """The URL with a lower-case scheme and host, sorted query parameters and no fragment."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+
+def stable_event_id(url):
+    """A numeric eventId derived from the event's source URL, so it survives reruns and reordering."""
+    digest = hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=8).hexdigest()
+    return str(int(digest, 16) % 10 ** 10)
+
+
+def content_hash(listing, page):
+    """Hash of everything an event is parsed from: its listing row and its detail page."""
+    digest = hashlib.sha256()
+    for part in listing:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(page.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageCache:
+    """
+    On-disk cache of event pages keyed by canonical URL. index.json holds each
+    page's ETag and Last-Modified, and under "listings" the content hash and
+    parsed event (None when the page was skipped) of every category that
+    lists it: a page listed under two categories is parsed into two events
+    that differ in their category. The page bodies live next to it in pages/.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.entries = {}
+        self.seen = set()
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.entries = {url: self._upgrade(entry) for url, entry in json.load(f).items()}
+        os.makedirs(os.path.join(directory, "pages"), exist_ok=True)
+
+    @staticmethod
+    def _upgrade(entry):
+        """
+        Moves an entry written before listings were kept per category under
+        the category its event was parsed from. Skipped pages are re-parsed.
+        """
+        if "listings" in entry:
+            return entry
+        event = entry.pop("event", None)
+        digest = entry.pop("hash", None)
+        categories = [category for category, name in CATEGORY_NAMES.items() if event and event.get("subtype") == name]
+        entry["listings"] = {categories[0]: {"hash": digest, "event": event}} if categories else {}
+        return entry
+
+    def _page_path(self, url):
+        return os.path.join(self.directory, "pages", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def get(self, url, category):
+        self.seen.add((canonical_url(url), category))
+        return self.entries.get(canonical_url(url), {}).get("listings", {}).get(category)
+
+    def keep(self, url, category):
+        """Marks url as listed under category in this run without looking at its entry."""
+        self.seen.add((canonical_url(url), category))
+
+    def conditional_headers(self, url):
+        entry = self.entries.get(canonical_url(url))
+        if entry is None or not os.path.exists(self._page_path(canonical_url(url))):
+            return None
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers or None
+
+    def page(self, url):
+        path = self._page_path(canonical_url(url))
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def put(self, url, category, response, page, digest, event):
+        url = canonical_url(url)
+        self.seen.add((url, category))
+        entry = self.entries.setdefault(url, {"listings": {}})
+        previous = entry["listings"].get(category)
+        if response.status_code != 304 and (previous is None or previous["hash"] != digest):
+            with open(self._page_path(url), "w", encoding="utf-8") as f:
+                f.write(page)
+        entry["etag"] = response.headers.get("ETag")
+        entry["last_modified"] = response.headers.get("Last-Modified")
+        entry["listings"][category] = {"hash": digest, "event": event}
+
+    def removed_event_ids(self):
+        """
+        eventIds of cached events whose pages were not listed in this run. An
+        event still listed under another category is not removed.
+        """
+        listed = set()
+        unlisted = []
+        for url, entry in self.entries.items():
+            for category, listing in entry["listings"].items():
+                if not listing.get("event"):
+                    continue
+                if (url, category) in self.seen:
+                    listed.add(listing["event"]["eventId"])
+                else:
+                    unlisted.append(listing["event"]["eventId"])
+        return list(dict.fromkeys(event_id for event_id in unlisted if event_id not in listed))
+
+    def save(self):
+        """Writes the index, dropping listings and pages that were not listed in this run."""
+        seen_urls = {url for url, _ in self.seen}
+        for url in list(self.entries):
+            listings = self.entries[url]["listings"]
+            for category in list(listings):
+                if (url, category) not in self.seen:
+                    del listings[category]
+            if not listings and url not in seen_urls:
+                del self.entries[url]
+                if os.path.exists(self._page_path(url)):
+                    os.remove(self._page_path(url))
+        self.flush()
+
+    def flush(self):
+        """Writes the index as it is, e.g. between batches of a crawl."""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Taking the token before sleeping reserves this caller's slot, so
+            # concurrent callers queue up behind each other instead of racing.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class Fetcher:
+    """
+    Fetches pages through one pooled session from a thread pool. Every
+    attempt, retries included, first takes a token from its host's bucket,
+    so the crawl runs at the politeness rate however many workers there are.
+    """
+
+    def __init__(self, host_rates=None, default_rate=DEFAULT_RATE, workers=8, retries=3, backoff=1.0, timeout=15):
+        self.host_rates = HOST_RATES if host_rates is None else host_rates
+        self.default_rate = default_rate
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.host_rates) or 1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def bucket_for(self, url):
+        host = urlsplit(url).hostname
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.host_rates.get(host, self.default_rate))
+            return self.buckets[host]
+
+    def get(self, url):
+        return self.request(url).text
+
+    def request(self, url, headers=None):
+        """
+        Returns the response for url, retrying connection errors, timeouts and
+        retryable statuses with backoff. A 304 to a conditional request is returned as is.
+        """
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * 2 ** (attempt - 1) + random.uniform(0, self.backoff)
+                retry_after = getattr(getattr(error, "response", None), "headers", {}).get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                print(f"  Retrying {url} in {delay:.1f}s ({error})")
+                time.sleep(delay)
+
+            self.bucket_for(url).acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                continue
+            if response.status_code in RETRY_STATUSES:
+                error = requests.HTTPError(f"{response.status_code} Error for url: {url}", response=response)
+                continue
+            response.raise_for_status()
+            return response
+        raise error
+
+    def request_many(self, urls, headers=None):
+        """
+        Fetches urls concurrently, with headers[i] sent for urls[i] when given.
+        Returns each response, or the exception it failed with, in order.
+        """
+        def fetch(url, url_headers):
+            try:
+                return self.request(url, url_headers)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(fetch, urls, headers or [None] * len(urls)))
+
+    def close(self):
+        self.session.close()
+
+
+class EventSink:
+    """
+    Appends events to an NDJSON file, one JSON object per line, and after
+    every batch records in a checkpoint next to it which listing rows are done
+    and how far the file is complete. An interrupted crawl that reopens the
+    sink drops whatever was written after the last checkpoint and skips the
+    rows that were already done; finish() removes the checkpoint.
+    """
+
+    def __init__(self, path=EVENTS_OUTPUT, resume=True):
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint"
+        checkpoint = None
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        self.resumed = checkpoint is not None
+        checkpoint = checkpoint or {"done": [], "changed": [], "offset": 0, "count": 0}
+        self.done = {tuple(row) for row in checkpoint["done"]}
+        self.changed = checkpoint["changed"]
+        self.count = checkpoint["count"]
+        self.file = open(path, "ab")
+        self.file.truncate(checkpoint["offset"])
+        # tell() keeps reporting the old size after a truncate until the next write.
+        self.file.seek(0, os.SEEK_END)
+
+    def is_done(self, category, url):
+        return (category, canonical_url(url)) in self.done
+
+    def write(self, category, url, event, changed=False):
+        if event:
+            self.file.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.count += 1
+            if changed:
+                self.changed.append(event["eventId"])
+        self.done.add((category, canonical_url(url)))
+
+    def checkpoint(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "done": sorted(self.done),
+                "changed": self.changed,
+                "offset": self.file.tell(),
+                "count": self.count
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def finish(self):
+        self.file.close()
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def iter_events(path=EVENTS_OUTPUT):
+    """Yields the events of an NDJSON file one at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def unique_events(events, duplicates=None):
+    """
+    Yields the first event of every eventId. A page listed under two
+    categories gets the same stable id twice, and eventId is unique in the
+    events collection. Dropped eventIds are added to duplicates if given.
+    """
+    seen = set()
+    for event in events:
+        if event["eventId"] in seen:
+            if duplicates is not None:
+                duplicates.add(event["eventId"])
+            continue
+        seen.add(event["eventId"])
+        yield event
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def listing_rows(fetcher, base_url=BASE_URL, detail_base_url=DETAIL_BASE_URL):
+    """Yields (category, date/time text, venue, title, event URL) for every row of the category page."""
     print("Fetching main event page...")
-    response = requests.get(base_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    all_events = []
-    event_id_counter = 101
+    soup = BeautifulSoup(fetcher.get(base_url), 'html.parser')
     
-    for category in categories:
-        print(f"Processing category: {category_names[category]}...")
+    for category in CATEGORY_NAMES:
+        print(f"Processing category: {CATEGORY_NAMES[category]}...")
         category_anchor = soup.find('a', {'name': category})
         if not category_anchor:
             print(f"  Warning: Category {category} not found on page")
@@ -58,7 +374,7 @@ def scrape_hku_events():
             
         event_rows = category_table.find_all('tr')[1:]
         
-        print(f"  Found {len(event_rows)} events in category {category_names[category]}")
+        print(f"  Found {len(event_rows)} events in category {CATEGORY_NAMES[category]}")
         
         for row in event_rows:
             cells = row.find_all('td')
@@ -72,236 +388,218 @@ def scrape_hku_events():
             if not event_link:
                 continue
                 
-            event_title = event_link.text.strip()
             event_url = event_link['href']
-            
-            print(f"  Fetching details for event: {event_title}")
+            if not event_url.startswith("http"):
+                event_url = f"{detail_base_url}{event_url}"
+            yield category, date_time_text, venue, event_link.text.strip(), event_url
+
+
+def fetch_stage(fetcher, batches, cache=None):
+    """Yields each batch of rows paired with their responses, or the exceptions their fetches failed with."""
+    for batch in batches:
+        urls = [row[4] for row in batch]
+        headers = [cache.conditional_headers(url) for url in urls] if cache else None
+        started = time.monotonic()
+        responses = fetcher.request_many(urls, headers)
+        print(f"Fetched {len(urls)} event pages in {time.monotonic() - started:.1f}s")
+        yield list(zip(batch, responses))
+
+
+def parse_stage(batches, cache=None, parse_workers=1):
+    """
+    Yields each batch as (row, event, changed, cache update) results, in
+    order. Pages whose listing row and content are unchanged reuse the cached
+    event; the rest of the batch is parsed in one parse_event_pages() call.
+    """
+    for batch in batches:
+        results = []
+        jobs = []
+        pending = []
+        for row, response in batch:
+            category, date_time_text, venue, event_title, event_url = row
+            cached = cache.get(event_url, category) if cache else None
             
             try:
-                time.sleep(random.uniform(1, 3))
-                
-                if event_url.startswith("http"):
-                    full_event_url = event_url
-                else:
-                    full_event_url = f"https://hkuems1.hku.hk/hkuems/{event_url}"
-                
-                event_response = requests.get(full_event_url)
-                event_soup = BeautifulSoup(event_response.text, 'html.parser')
-                
-                event_description = ""
-                event_details_span = event_soup.find('span', class_='UEViewHeader', string='Event Details')
-                
-                if event_details_span:
-                    next_elem = event_details_span.find_next()
-                    while next_elem and next_elem.name != 'span' and 'UEViewHeader' not in next_elem.get('class', []):
-                        if next_elem.name == 'p':
-                            event_description += next_elem.text.strip() + " "
-                        next_elem = next_elem.find_next()
-                
-                event_description = re.sub(r'[^\x00-\x7F]+', '', event_description).strip()
-                
-                date_time = ""
-                date_cell = None
-                venue_cell = None
-                
-                for tr in event_soup.find_all('tr'):
-                    tds = tr.find_all('td')
-                    if len(tds) >= 2:
-                        if "Date/Time" in tds[0].text:
-                            date_cell = tds[1]
-                        elif "Venue" in tds[0].text:
-                            venue_cell = tds[1]
-                
-                formatted_date = ""
-                formatted_time = ""
-                
-                if date_cell:
-                    date_time = date_cell.text.strip()
-                    
-                    date_pattern = r'(\d{2}/\d{2}/\d{4})'
-                    time_pattern = r'(\d{1,2}:\d{2}-\d{1,2}:\d{2})'
-                    
-                    date_matches = re.findall(date_pattern, date_time)
-                    time_match = re.search(time_pattern, date_time)
-                    
-                    if date_matches:
-                        if len(date_matches) == 1:
-                            date_str = date_matches[0]
-                            day, month, year = date_str.split('/')
-                            formatted_date = f"{day}-{month}-{year}"
-                        elif len(date_matches) >= 2:
-                            start_date = date_matches[0]
-                            end_date = date_matches[1]
-                            
-                            day1, month1, year1 = start_date.split('/')
-                            day2, month2, year2 = end_date.split('/')
-                            
-                            formatted_date = f"{day1}-{month1}-{year1} to {day2}-{month2}-{year2}"
-                    
-                    elif "to" in date_time:
-                        date_parts = date_time.split("to")
-                        if len(date_parts) >= 2:
-                            start_date_match = re.search(r'(\d{2}/\d{2}/\d{4})', date_parts[0])
-                            end_date_match = re.search(r'(\d{2}/\d{2}/\d{4})', date_parts[1])
-                            
-                            if start_date_match and end_date_match:
-                                start_date = start_date_match.group(1)
-                                end_date = end_date_match.group(1)
-                                
-                                day1, month1, year1 = start_date.split('/')
-                                day2, month2, year2 = end_date.split('/')
-                                
-                                formatted_date = f"{day1}-{month1}-{year1} to {day2}-{month2}-{year2}"
-                    
-                    if time_match:
-                        time_text = time_match.group(1)
-                        if "-" in time_text:
-                            start_time, end_time = time_text.split("-")
-                            
-                            start_hours, start_minutes = map(int, start_time.split(":"))
-                            start_am_pm = "AM" if start_hours < 12 else "PM"
-                            if start_hours == 0:
-                                start_hours = 12
-                            elif start_hours > 12:
-                                start_hours -= 12
-                            start_formatted = f"{start_hours}:{start_minutes:02d} {start_am_pm}"
-                            
-                            end_hours, end_minutes = map(int, end_time.split(":"))
-                            end_am_pm = "AM" if end_hours < 12 else "PM"
-                            if end_hours == 0:
-                                end_hours = 12
-                            elif end_hours > 12:
-                                end_hours -= 12
-                            end_formatted = f"{end_hours}:{end_minutes:02d} {end_am_pm}"
-                            
-                            formatted_time = f"{start_formatted} - {end_formatted}"
-                
-                if not formatted_date or not formatted_time:
-                    print(f"  Trying to extract date/time from category page: {date_time_text}")
-                    
-                    date_range_match = re.search(r'(\d{1,2}\s+[A-Za-z]{3}\s+-\s+\d{1,2}\s+[A-Za-z]{3}\s+\d{4})', date_time_text)
-                    if date_range_match:
-                        formatted_date = date_range_match.group(1)
-                    
-                    date_match = re.search(r'(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})', date_time_text)
-                    if date_match and not formatted_date:
-                        formatted_date = date_match.group(1)
-                    
-                    time_match = re.search(r'(\d{1,2}:\d{2}-\d{1,2}:\d{2})', date_time_text)
-                    if time_match and not formatted_time:
-                        time_text = time_match.group(1)
-                        if "-" in time_text:
-                            start_time, end_time = time_text.split("-")
-                            
-                            start_hours, start_minutes = map(int, start_time.split(":"))
-                            start_am_pm = "AM" if start_hours < 12 else "PM"
-                            if start_hours == 0:
-                                start_hours = 12
-                            elif start_hours > 12:
-                                start_hours -= 12
-                            start_formatted = f"{start_hours}:{start_minutes:02d} {start_am_pm}"
-                            
-                            end_hours, end_minutes = map(int, end_time.split(":"))
-                            end_am_pm = "AM" if end_hours < 12 else "PM"
-                            if end_hours == 0:
-                                end_hours = 12
-                            elif end_hours > 12:
-                                end_hours -= 12
-                            end_formatted = f"{end_hours}:{end_minutes:02d} {end_am_pm}"
-                            
-                            formatted_time = f"{start_formatted} - {end_formatted}"
+                if isinstance(response, Exception):
+                    raise response
                 
-                organization = "HKU"
-                if category == "category_O":
-                    organizer_span = event_soup.find('span', class_='UEViewOrganizer')
-                    if organizer_span and "organized by" in organizer_span.text:
-                        org_text = organizer_span.text.strip()
-                        org_match = re.search(r'organized by\s+(.+)', org_text)
-                        if org_match:
-                            organization = org_match.group(1).strip()
-                            organization = re.sub(r'[^\x00-\x7F]+', '', organization).strip()
+                event_page = cache.page(event_url) if response.status_code == 304 else response.text
+                if event_page is None:
+                    raise ValueError(f"304 for {event_url} but the cached page is missing")
                 
-                location = venue
-                if venue_cell:
-                    location = venue_cell.text.strip()
-                
-                location = re.sub(r'[^\x00-\x7F]+', '', location).strip()
-                
-                location = re.sub(r'\.+$', '.', location.strip())
-                
-                event_title = re.sub(r'[^\x00-\x7F]+', '', event_title).strip()
-                
-                summary = event_description[:100] + "..." if len(event_description) > 100 else event_description
-                
-                event = {
-                    "eventId": str(event_id_counter),
-                    "title": event_title,
-                    "image": "https://example.com/event5.jpg",
-                    "summary": summary,
-                    "description": event_description,
-                    "date": formatted_date,
-                    "time": formatted_time,
-                    "organization": organization,
-                    "type": "University Event" if organization == "HKU" else "External Event",
-                    "subtype": category_names[category],
-                    "location": location
-                }
-                
-                missing_fields = [field for field in required_fields if not event.get(field)]
-                if missing_fields:
-                    print(f"  Skipping event ID {event_id_counter} due to missing required fields: {', '.join(missing_fields)}")
+                digest = content_hash((category, date_time_text, venue, event_title), event_page)
+                if cached is not None and cached["hash"] == digest:
+                    results.append([row, cached["event"], False, (response, event_page, digest)])
                     continue
                 
-                all_events.append(event)
-                
-                event_id_counter += 1
-                print(f"  Added event with ID: {event_id_counter-1}")
+                results.append([row, None, True, (response, event_page, digest)])
+                jobs.append((event_page, category, date_time_text, venue, event_title, stable_event_id(event_url)))
+                pending.append(len(results) - 1)
                 
             except Exception as e:
                 print(f"  Error fetching event details: {str(e)}")
-                continue
-    
-    with open('hku_events.json', 'w', encoding='utf-8') as f:
-        json.dump({"events": all_events}, f, ensure_ascii=False, indent=2)
-    
-    print(f"Scraped {len(all_events)} events and saved to hku_events.json")
-    return all_events
+                # Keep serving the last good copy rather than dropping the event.
+                results.append([row, cached.get("event") if cached else None, False, None])
+        
+        for slot, (event, missing_fields) in zip(pending, parse_event_pages(jobs, workers=parse_workers)):
+            results[slot][1] = (event, missing_fields)
+        yield results
+
 
-def convert_to_js_format(events):
-    """Convert the events to the required JavaScript format"""
+def validate_stage(batches):
+    """Drops parsed events that miss a required field."""
+    for batch in batches:
+        for result in batch:
+            if isinstance(result[1], tuple):
+                event, missing_fields = result[1]
+                if missing_fields:
+                    print(f"  Skipping event ID {event['eventId']} due to missing required fields: "
+                          f"{', '.join(missing_fields)}")
+                    event = None
+                else:
+                    print(f"  Added event with ID: {event['eventId']}")
+                result[1] = event
+        yield batch
+
+
+def scrape_hku_events(fetcher=None, base_url=BASE_URL, detail_base_url=DETAIL_BASE_URL, output=EVENTS_OUTPUT,
+                      cache=None, changes_output="hku_events.changed.json", parse_workers=1, batch_size=64,
+                      resume=True):
+    """
+    Scrapes every listed event into the NDJSON file output, as a pipeline of
+    listing → fetch → parse → validate → sink stages over batches of
+    batch_size rows. The sink checkpoints after every batch, so with resume a
+    crawl that was interrupted continues where it stopped. Returns the number
+    of events written.
     
-    events.sort(key=lambda x: int(x["eventId"]))
+    With a PageCache, pages are requested conditionally and only pages whose
+    listing row or content changed are parsed; the new and changed events,
+    and the ids of events no longer listed, are also written to
+    changes_output. parse_workers > 1 parses each batch in a process pool.
+    """
+    fetcher = fetcher or Fetcher()
+    sink = EventSink(output, resume=resume)
+    if sink.resumed:
+        print(f"Resuming an interrupted crawl: {len(sink.done)} pages already done")
     
-    js_content = "const hkuEvents = [\n"
+    rows = []
+    for category, *row in listing_rows(fetcher, base_url, detail_base_url):
+        if sink.is_done(category, row[-1]):
+            if cache:
+                cache.keep(row[-1], category)
+            continue
+        rows.append((category, *row))
+    print(f"Fetching {len(rows)} event pages with {fetcher.workers} workers...")
     
-    for event in events:
-        js_content += "  {\n"
-        for key, value in event.items():
-            if isinstance(value, str):
-                value = value.replace('"', '\\"').replace('\n', ' ').replace('\r', '')
-                js_content += f'    {key}: "{value}",\n'
-            else:
-                js_content += f"    {key}: {value},\n"
-        js_content += "  },\n"
+    unchanged = 0
+    batches = validate_stage(parse_stage(fetch_stage(fetcher, batched(rows, batch_size), cache), cache, parse_workers))
+    for batch in batches:
+        for row, event, changed, update in batch:
+            category, event_url = row[0], row[4]
+            if update is not None and cache:
+                cache.put(event_url, category, *update, event)
+            unchanged += update is not None and not changed
+            sink.write(category, event_url, event, changed)
+        # The sink's checkpoint goes first: a crash before the cache index is
+        # written then only costs a re-parse, never a lost change.
+        sink.checkpoint()
+        if cache:
+            cache.flush()
     
-    js_content += "];\n\nmodule.exports = hkuEvents;\n"
+    count = sink.count
+    changed = set(sink.changed)
+    sink.finish()
+    print(f"Scraped {count} events and saved to {output}")
     
-    with open('hkuEvents.js', 'w', encoding='utf-8') as f:
-        f.write(js_content)
+    if cache:
+        removed = cache.removed_event_ids()
+        cache.save()
+        changed_events = (event for event in unique_events(iter_events(output)) if event["eventId"] in changed)
+        export_json(changed_events, changes_output, removed=removed)
+        print(f"{len(changed)} new or changed, {unchanged} unchanged, {len(removed)} removed; "
+              f"changes saved to {changes_output}")
+    return count
+
+def export_json(events, path, **fields):
+    """
+    Writes {"events": [...], **fields} exactly as json.dump(..., indent=2)
+    would, one event at a time, so the events never have to be in memory together.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "events": [')
+        first = True
+        for event in events:
+            f.write("\n    " if first else ",\n    ")
+            f.write(json.dumps(event, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+            first = False
+        f.write("]" if first else "\n  ]")
+        for key, value in fields.items():
+            f.write(f',\n  {json.dumps(key)}: ')
+            f.write(json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        f.write("\n}")
+
+def js_value(value):
+    if isinstance(value, str):
+        # JSON string literals are valid JavaScript and escape backslashes and quotes alike.
+        return json.dumps(value.replace('\n', ' ').replace('\r', ''), ensure_ascii=False)
+    return str(value)
+
+def convert_to_js_format(events, path="hkuEvents.js"):
+    """Convert the events to the required JavaScript format, streaming them into path"""
+    
+    duplicates = set()
+    total = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("const hkuEvents = [\n")
+        for event in unique_events(events, duplicates):
+            lines = [f"    {key}: {js_value(value)},\n" for key, value in event.items()]
+            f.write("  {\n" + "".join(lines) + "  },\n")
+            total += 1
+        f.write("];\n\nmodule.exports = hkuEvents;\n")
     
-    print(f"Converted events to JavaScript format and saved to hkuEvents.js")
+    print(f"Converted events to JavaScript format and saved to {path}")
     
-    ids = [int(event["eventId"]) for event in events]
-    print(f"ID range: {min(ids)} to {max(ids)}")
-    print(f"Total events: {len(events)}")
+    print(f"Total events: {total}")
     
-    expected_ids = set(range(min(ids), max(ids) + 1))
-    actual_ids = set(ids)
-    if expected_ids != actual_ids:
-        missing = expected_ids - actual_ids
-        print(f"Warning: Missing IDs in sequence: {missing}")
+    if duplicates:
+        print(f"Warning: Kept the first of several events with IDs: {sorted(duplicates)}")
+
+def parse_rates(values):
+    rates = dict(HOST_RATES)
+    for value in values:
+        host, _, rate = value.partition("=")
+        rates[host] = float(rate)
+    return rates
 
 if __name__ == "__main__":
-    events = scrape_hku_events()
+    parser = argparse.ArgumentParser(description="Scrape HKU events into hku_events.ndjson, hku_events.json and hkuEvents.js.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page fetches.")
+    parser.add_argument("--rate", action="append", default=[], metavar="HOST=RPS",
+                        help="Requests per second for a host, e.g. www.hku.hk=1. May be repeated.")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=15.0, help="Seconds before a request times out.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the page cache: request pages conditionally and only parse changed ones.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--parse-workers", type=int, default=1, help="Processes used to parse event pages.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Event pages per checkpoint.")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint of an interrupted crawl and start over.")
+    parser.add_argument("--mongo", action="store_true",
+                        help="Also upsert the new and changed events into the events collection at $MONGO_URI.")
+    args = parser.parse_args()
+    
+    fetcher = Fetcher(parse_rates(args.rate), workers=args.workers, retries=args.retries, timeout=args.timeout)
+    cache = PageCache(args.cache_dir) if args.incremental else None
+    try:
+        scrape_hku_events(fetcher, cache=cache, parse_workers=args.parse_workers, batch_size=args.batch_size,
+                          resume=not args.restart)
+    finally:
+        fetcher.close()
+    
+    export_json(unique_events(iter_events(EVENTS_OUTPUT)), "hku_events.json")
+    convert_to_js_format(iter_events(EVENTS_OUTPUT))
     
-    convert_to_js_format(events)
\ No newline at end of file
+    if args.mongo:
+        from events_sink import sync_events
+        sync_events(iter_events(EVENTS_OUTPUT))
\ No newline at end of file
@@ -0,0 +1,116 @@
+import copy
+
+import pytest
+from bson import ObjectId
+
+from events_sink import MongoEventSink, event_hash
+
+
+class FakeCollection:
+    """
+    The parts of a pymongo collection MongoEventSink uses: equality and $in
+    filters, inclusion projections, and bulk_write of upserting UpdateOnes.
+    mongomock's bulk_write fails on the UpdateOne of current pymongo releases.
+    """
+
+    def __init__(self, documents=()):
+        self.documents = [dict(document, _id=document.get("_id", ObjectId())) for document in documents]
+        self.bulk_writes = 0
+
+    @staticmethod
+    def _matches(document, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict) and "$in" in condition:
+                if document.get(field) not in condition["$in"]:
+                    return False
+            elif document.get(field) != condition:
+                return False
+        return True
+
+    def find(self, query=None, projection=None):
+        for document in self.documents:
+            if self._matches(document, query or {}):
+                if projection:
+                    fields = [field for field, include in projection.items() if include]
+                    if projection.get("_id", 1):
+                        fields.append("_id")
+                    document = {field: document[field] for field in fields if field in document}
+                yield copy.deepcopy(document)
+
+    def find_one(self, query=None):
+        return next(self.find(query), None)
+
+    def update_one(self, query, update, upsert=False):
+        document = next((document for document in self.documents if self._matches(document, query)), None)
+        if document is None:
+            if not upsert:
+                return
+            document = dict(query, _id=ObjectId(), **update.get("$setOnInsert", {}))
+            self.documents.append(document)
+        document.update(copy.deepcopy(update.get("$set", {})))
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulk_writes += 1
+        for operation in operations:
+            self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+
+def scraped(event_id, title="Talk", organization="HKU"):
+    return {"eventId": event_id, "title": title, "image": "https://example.com/event5.jpg", "summary": "A talk.",
+            "description": "A talk.", "date": "01-04-2025", "time": "10:00 AM - 12:00 PM",
+            "organization": organization, "type": "University Event", "subtype": "Education", "location": "Room 1"}
+
+
+@pytest.fixture
+def organizations():
+    return FakeCollection([{"name": "HKU"}])
+
+
+@pytest.fixture
+def events():
+    return FakeCollection()
+
+
+def test_sync_inserts_new_events(organizations, events):
+    summary = MongoEventSink(events, organizations).sync([scraped("1"), scraped("2")])
+
+    assert summary == {"inserted": ["1", "2"], "updated": [], "unchanged": 0, "skipped": []}
+    stored = events.find_one({"eventId": "1"})
+    assert stored["organization"] == organizations.find_one({"name": "HKU"})["_id"]
+    assert stored["contentHash"] == event_hash(scraped("1"))
+    assert stored["registeredUsers"] == [] and stored["createdAt"] == stored["updatedAt"]
+
+
+def test_sync_updates_scraped_fields_and_keeps_registrations(organizations, events):
+    MongoEventSink(events, organizations).sync([scraped("1")])
+    events.update_one({"eventId": "1"}, {"$set": {"registeredUsers": ["user"], "capacity": 30}})
+    created = events.find_one({"eventId": "1"})
+
+    summary = MongoEventSink(events, organizations).sync([scraped("1", title="Talk, moved")])
+
+    assert summary == {"inserted": [], "updated": ["1"], "unchanged": 0, "skipped": []}
+    stored = events.find_one({"eventId": "1"})
+    assert stored["title"] == "Talk, moved"
+    assert stored["registeredUsers"] == ["user"] and stored["capacity"] == 30
+    assert stored["createdAt"] == created["createdAt"]
+    assert stored["updatedAt"] >= created["updatedAt"]
+
+
+def test_sync_skips_unchanged_events_without_writing(organizations, events):
+    MongoEventSink(events, organizations).sync([scraped("1")])
+    stored = events.find_one({"eventId": "1"})
+    writes = events.bulk_writes
+
+    summary = MongoEventSink(events, organizations).sync([scraped("1"), scraped("1", title="Second copy")])
+
+    assert summary == {"inserted": [], "updated": [], "unchanged": 1, "skipped": []}
+    assert events.bulk_writes == writes
+    assert events.find_one({"eventId": "1"}) == stored
+
+
+def test_sync_skips_events_of_unknown_organizations(organizations, events):
+    summary = MongoEventSink(events, organizations).sync([scraped("1", organization="Unknown Society"),
+                                                             scraped("2")])
+
+    assert summary == {"inserted": ["2"], "updated": [], "unchanged": 0, "skipped": ["1"]}
+    assert events.find_one({"eventId": "1"}) is None
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+import requests
+
+from bench_scrape_hku_events import serve_fixtures
+from scrape_hku_events import Fetcher
+
+
+@pytest.fixture
+def server():
+    server = serve_fixtures(events=4, latency=0, flaky_every=2)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def retry_after_server():
+    server = serve_fixtures(events=4, latency=0, flaky_every=2, retry_after="1")
+    yield server
+    server.shutdown()
+
+
+def event_url(server, i):
+    return f"http://127.0.0.1:{server.server_address[1]}/event.aspx?id={i}"
+
+
+def fetcher(retries):
+    return Fetcher({"127.0.0.1": 1000.0}, workers=4, retries=retries, backoff=0.01)
+
+
+def test_request_retries_pages_that_fail_once(server):
+    pages = fetcher(retries=1)
+    responses = pages.request_many([event_url(server, i) for i in range(4)])
+    pages.close()
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert all(f"fixture event {i}," in response.text for i, response in enumerate(responses))
+
+
+def test_request_gives_up_after_its_retries(server):
+    pages = fetcher(retries=0)
+    responses = pages.request_many([event_url(server, i) for i in range(4)])
+    pages.close()
+
+    # Pages 0 and 2 answer their first request with a 503.
+    assert isinstance(responses[0], requests.HTTPError) and responses[0].response.status_code == 503
+    assert isinstance(responses[2], requests.HTTPError)
+    assert [responses[1].status_code, responses[3].status_code] == [200, 200]
+
+
+def test_retry_waits_at_least_retry_after(retry_after_server):
+    pages = fetcher(retries=1)
+    started = time.monotonic()
+    response = pages.request(event_url(retry_after_server, 2))
+    elapsed = time.monotonic() - started
+    started = time.monotonic()
+    pages.request(event_url(retry_after_server, 1))
+    pages.close()
+
+    assert response.status_code == 200
+    # The backoff alone would retry after 10-20ms.
+    assert elapsed >= 1.0
+    assert time.monotonic() - started < 1.0
+
+
+def test_conditional_request_returns_not_modified(server):
+    pages = fetcher(retries=1)
+    first = pages.request(event_url(server, 1))
+    second = pages.request(event_url(server, 1), {"If-None-Match": first.headers["ETag"]})
+    pages.close()
+
+    assert second.status_code == 304 and second.headers["ETag"] == first.headers["ETag"]
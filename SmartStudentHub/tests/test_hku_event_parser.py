@@ -0,0 +1,55 @@
+import pytest
+
+from bench_scrape_hku_events import event_page
+from hku_event_parser import UnsupportedMarkup, _extract_regions_fast, parse_event_page
+
+DETAILS = '<span class="UEViewHeader">Event Details</span>'
+TABLE = ("<table><tr><td>Date/Time</td><td>01/04/2025 10:00-12:00</td></tr>"
+         "<tr><td>Venue</td><td>Room 1</td></tr></table>")
+ORGANIZER = '<span class="UEViewOrganizer">organized by Fixture Society</span>'
+
+PAGES = {
+    "plain": event_page(1),
+    "comment in details": (
+        f"<html><body>{DETAILS}<p>Shown.</p><!-- <span>old</span> --><p>Also shown.</p>"
+        f"{TABLE}{ORGANIZER}</body></html>"
+    ),
+    "p in comment": f"<html><body>{DETAILS}<!-- <p>Hidden.</p> --><p>Shown.</p>{TABLE}{ORGANIZER}</body></html>",
+    "p in script": (
+        f"<html><body>{DETAILS}<script>document.write('<p>Hidden.</p>');</script><p>Shown.</p>"
+        f"{TABLE}{ORGANIZER}</body></html>"
+    ),
+    "row in style": (
+        f"<html><body>{DETAILS}<p>Shown.</p><style>/* <tr><td>Venue</td><td>Hidden</td></tr> */</style>"
+        f"{TABLE}{ORGANIZER}</body></html>"
+    ),
+    "row in comment after table": (
+        f"<html><body>{DETAILS}<p>Shown.</p>{TABLE}"
+        "<!-- <table><tr><td>Venue</td><td>Hidden</td></tr></table> -->"
+        f"{ORGANIZER}</body></html>"
+    ),
+    "script in head": (
+        "<html><head><script>var row = '<tr><td>Venue</td><td>Hidden</td></tr>';</script></head>"
+        f"<body>{DETAILS}<p>Shown.</p>{TABLE}{ORGANIZER}</body></html>"
+    ),
+}
+
+
+@pytest.mark.parametrize("name", PAGES)
+@pytest.mark.parametrize("category", ["category_A", "category_O"])
+def test_fast_parse_matches_reference(name, category):
+    args = (PAGES[name], category, "01 Apr 2025 10:00-12:00", "Listing venue", "Fixture event", "1")
+    assert parse_event_page(*args, fast=True) == parse_event_page(*args, fast=False)
+
+
+@pytest.mark.parametrize("name", ["comment in details", "p in comment", "p in script", "row in style",
+                                  "row in comment after table"])
+def test_comments_scripts_and_styles_in_parsed_regions_use_the_reference_parse(name):
+    with pytest.raises(UnsupportedMarkup):
+        _extract_regions_fast(PAGES[name])
+
+
+def test_script_before_the_parsed_regions_keeps_the_fast_parse():
+    page = ("<html><head><script>var x = 1;</script><style>p { color: red; }</style><!-- analytics --></head>"
+            f"<body>{DETAILS}<p>Shown.</p>{TABLE}{ORGANIZER}</body></html>")
+    assert _extract_regions_fast(page)[0] == "Shown. "
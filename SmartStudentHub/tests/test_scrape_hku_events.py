@@ -0,0 +1,119 @@
+import json
+import os
+
+from bench_scrape_hku_events import event_page
+from hku_event_parser import CATEGORY_NAMES
+from scrape_hku_events import (
+    EventSink, PageCache, convert_to_js_format, export_json, iter_events, parse_stage, stable_event_id, unique_events
+)
+
+
+def event(event_id):
+    return {"eventId": event_id, "title": f"Event {event_id}"}
+
+
+def test_resume_after_empty_batch_keeps_file_valid(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    sink = EventSink(path)
+    sink.write("Talks", "https://example.com/1.html", event("1"))
+    sink.write("Talks", "https://example.com/2.html", event("2"))
+    sink.checkpoint()
+    # Crash partway through the next batch, after the checkpoint.
+    sink.write("Talks", "https://example.com/3.html", event("3"))
+    sink.file.close()
+
+    # A resumed crawl whose first batch writes nothing, e.g. every fetch failed.
+    sink = EventSink(path)
+    assert sink.resumed
+    sink.write("Talks", "https://example.com/3.html", None)
+    assert sink.file.tell() == os.path.getsize(path)
+    sink.checkpoint()
+    sink.file.close()
+
+    sink = EventSink(path)
+    sink.write("Talks", "https://example.com/4.html", event("4"))
+    sink.checkpoint()
+    sink.finish()
+
+    with open(path, "rb") as f:
+        assert b"\0" not in f.read()
+    assert [e["eventId"] for e in iter_events(path)] == ["1", "2", "4"]
+    assert not os.path.exists(f"{path}.checkpoint")
+
+
+def test_resume_drops_writes_after_last_checkpoint(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    sink = EventSink(path)
+    sink.write("Talks", "https://example.com/1.html", event("1"))
+    sink.checkpoint()
+    sink.write("Talks", "https://example.com/2.html", event("2"))
+    sink.file.close()
+
+    sink = EventSink(path)
+    assert sink.is_done("Talks", "https://example.com/1.html")
+    assert not sink.is_done("Talks", "https://example.com/2.html")
+    sink.finish()
+    assert [e["eventId"] for e in iter_events(path)] == ["1"]
+
+
+def test_exports_keep_one_event_per_id_across_categories(tmp_path):
+    url = "https://www.hku.hk/event/123.html"
+    events = [
+        {"eventId": stable_event_id(url), "title": "Talk", "subtype": "Lectures"},
+        {"eventId": stable_event_id(url), "title": "Talk", "subtype": "Seminars"},
+        {"eventId": stable_event_id("https://www.hku.hk/event/456.html"), "title": "Other", "subtype": "Seminars"},
+    ]
+
+    js_path = str(tmp_path / "hkuEvents.js")
+    convert_to_js_format(events, js_path)
+    with open(js_path, encoding="utf-8") as f:
+        js = f.read()
+    assert js.count(f'eventId: "{events[0]["eventId"]}"') == 1
+    assert 'subtype: "Lectures"' in js and 'subtype: "Seminars"' in js
+
+    json_path = str(tmp_path / "hku_events.json")
+    export_json(unique_events(events), json_path)
+    with open(json_path, encoding="utf-8") as f:
+        exported = json.load(f)["events"]
+    assert [event["subtype"] for event in exported] == ["Lectures", "Seminars"]
+
+
+class Response:
+    def __init__(self, status_code, text="", etag='"1"'):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"ETag": etag}
+
+
+def crawl_with_cache(cache, rows, status_code):
+    """Runs rows through parse_stage and stores the results the way scrape_hku_events does."""
+    results = []
+    batch = [(row, Response(status_code, event_page(1))) for row in rows]
+    for result in parse_stage([batch], cache):
+        for row, event, changed, update in result:
+            event = event[0] if isinstance(event, tuple) else event
+            cache.put(row[4], row[0], *update, event)
+            results.append((event, changed))
+    removed = cache.removed_event_ids()
+    cache.save()
+    return results, removed
+
+
+def test_page_cache_keeps_one_entry_per_category_of_a_page(tmp_path):
+    url = "https://www.hku.hk/event/event.aspx?id=1"
+    rows = [(category, "01 Apr 2025 10:00-12:00", "Room 1", "Fixture event 1", url)
+            for category in ("category_A", "category_B")]
+
+    first, _ = crawl_with_cache(PageCache(str(tmp_path)), rows, 200)
+    assert [changed for _, changed in first] == [True, True]
+
+    # Unchanged pages come back as 304s; neither category's event is re-parsed or reported.
+    second, _ = crawl_with_cache(PageCache(str(tmp_path)), rows, 304)
+    assert [changed for _, changed in second] == [False, False]
+    assert [event["subtype"] for event, _ in second] == [CATEGORY_NAMES["category_A"], CATEGORY_NAMES["category_B"]]
+
+    # Dropped from one category, the page is still listed under the other.
+    third, removed = crawl_with_cache(PageCache(str(tmp_path)), rows[:1], 304)
+    assert [changed for _, changed in third] == [False]
+    assert removed == []
+    assert list(PageCache(str(tmp_path)).entries[url]["listings"]) == ["category_A"]